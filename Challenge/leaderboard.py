@@ -0,0 +1,220 @@
+"""
+Daily challenge leaderboards.
+
+Attempts rank by score (highest first), then time taken (fastest first), then attempt id.
+Two interchangeable backends are available via the LEADERBOARD_BACKEND setting:
+
+* ``db`` (default) reads the ranking straight off the (challenge, -score, time_taken)
+  index: top-k is an index range scan and a rank is a count of the entries ahead.
+* ``local`` keeps a bisect-maintained sorted list per challenge in process memory,
+  loaded from the database on first use, so inserts and rank lookups are O(log n).
+  It is meant for tests and single-process deployments.
+
+Weekly, monthly and all-time boards are served from LeaderboardTotal rows that are
+adjusted by each scored attempt (see record_totals), optionally filtered by
+specialization or institution. rebuild_totals recomputes them from the attempts
+(manage.py rebuild_leaderboards).
+"""
+import datetime
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import LeaderboardTotal, StudentChallengeAttempt
+
+
+def entry(attempt, ranking):
+    return {
+        'ranking': ranking,
+        'student_id': attempt.student.user_name,
+        'score': attempt.score,
+        'time_taken': str(attempt.time_taken)
+    }
+
+
+def ranked_attempts(challenge_id):
+    return StudentChallengeAttempt.objects.filter(
+        daily_challenge_id=challenge_id, time_taken__isnull=False
+    ).select_related('student').order_by('-score', 'time_taken', 'leaderboardID')
+
+
+def backfill_time_taken():
+    """Set time_taken on scored attempts that predate it, so they rank; returns how many."""
+    return StudentChallengeAttempt.objects.filter(time_taken__isnull=True, end_time__isnull=False).update(
+        time_taken=F('end_time') - F('start_time')
+    )
+
+
+class DatabaseLeaderboard:
+    def record(self, attempt):
+        pass  # the attempt row itself is the index entry
+
+    def top(self, challenge_id, k=10):
+        return [entry(attempt, rank) for rank, attempt in enumerate(ranked_attempts(challenge_id)[:k], start=1)]
+
+    def rank(self, challenge_id, student_id):
+        attempt = ranked_attempts(challenge_id).filter(student__user_name=student_id).first()
+        if attempt is None:
+            return None
+        ahead = ranked_attempts(challenge_id).filter(
+            Q(score__gt=attempt.score)
+            | Q(score=attempt.score, time_taken__lt=attempt.time_taken)
+            | Q(score=attempt.score, time_taken=attempt.time_taken, leaderboardID__lt=attempt.leaderboardID)
+        ).count()
+        return entry(attempt, ahead + 1)
+
+
+class LocalLeaderboard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards = {}
+
+    @staticmethod
+    def _key(attempt):
+        return (-attempt.score, attempt.time_taken, attempt.leaderboardID)
+
+    def _board(self, challenge_id):
+        board = self._boards.get(challenge_id)
+        if board is None:
+            attempts = list(ranked_attempts(challenge_id))
+            board = {
+                'keys': [self._key(attempt) for attempt in attempts],
+                'attempts': {attempt.leaderboardID: attempt for attempt in attempts},
+                'students': {attempt.student.user_name: attempt.leaderboardID for attempt in attempts},
+            }
+            self._boards[challenge_id] = board
+        return board
+
+    def record(self, attempt):
+        with self._lock:
+            board = self._boards.get(attempt.daily_challenge_id)
+            if board is None:
+                return  # loaded with this attempt in it on first read
+            previous = board['attempts'].get(attempt.leaderboardID)
+            if previous is not None:
+                board['keys'].pop(bisect_left(board['keys'], self._key(previous)))
+            insort(board['keys'], self._key(attempt))
+            board['attempts'][attempt.leaderboardID] = attempt
+            board['students'][attempt.student.user_name] = attempt.leaderboardID
+
+    def top(self, challenge_id, k=10):
+        with self._lock:
+            board = self._board(challenge_id)
+            return [entry(board['attempts'][key[2]], rank) for rank, key in enumerate(board['keys'][:k], start=1)]
+
+    def rank(self, challenge_id, student_id):
+        with self._lock:
+            board = self._board(challenge_id)
+            attempt_id = board['students'].get(student_id)
+            if attempt_id is None:
+                return None
+            attempt = board['attempts'][attempt_id]
+            return entry(attempt, bisect_left(board['keys'], self._key(attempt)) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._boards.clear()
+
+
+BACKENDS = {
+    'db': DatabaseLeaderboard,
+    'local': LocalLeaderboard,
+}
+
+_backends = {}
+
+
+def get_leaderboard():
+    name = getattr(settings, 'LEADERBOARD_BACKEND', 'db')
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+PERIODS = [period for period, _ in LeaderboardTotal.PERIODS]
+ALL_TIME_START = datetime.date(2000, 1, 1)
+
+
+def period_start(period, day):
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return ALL_TIME_START
+
+
+def record_totals(attempt, previous_score=None, previous_time=None):
+    """
+    Fold a scored attempt into the student's weekly, monthly and all-time totals.
+
+    ``previous_score``/``previous_time`` are what the attempt counted for before it was
+    re-scored (None the first time), so only the difference is added.
+    """
+    first_time = previous_time is None
+    LeaderboardTotal.add(
+        attempt.student,
+        {period: period_start(period, attempt.daily_challenge.date) for period in PERIODS},
+        score=attempt.score - (0 if first_time else previous_score),
+        time_taken=attempt.time_taken - (datetime.timedelta() if first_time else previous_time),
+        challenges=1 if first_time else 0,
+    )
+
+
+def rebuild_totals():
+    """Recompute every LeaderboardTotal from the scored attempts; returns the number of rows written."""
+    totals = {}
+    attempts = StudentChallengeAttempt.objects.filter(time_taken__isnull=False).select_related('student', 'daily_challenge')
+    for attempt in attempts.iterator():
+        for period in PERIODS:
+            key = (attempt.student_id, period, period_start(period, attempt.daily_challenge.date))
+            total = totals.get(key)
+            if total is None:
+                total = totals[key] = LeaderboardTotal(
+                    student=attempt.student, specialization_id=attempt.student.specialization_id,
+                    institution_id=attempt.student.institution_id_id, period=period, period_start=key[2],
+                )
+            total.total_score += attempt.score
+            total.total_time += attempt.time_taken
+            total.challenges_completed += 1
+
+    with transaction.atomic():
+        LeaderboardTotal.objects.all().delete()
+        LeaderboardTotal.objects.bulk_create(totals.values(), batch_size=500)
+    return len(totals)
+
+
+def period_totals(period, day, specialization=None, institution=None):
+    totals = LeaderboardTotal.objects.filter(period=period, period_start=period_start(period, day), challenges_completed__gt=0)
+    if specialization:
+        totals = totals.filter(specialization_id=specialization)
+    if institution:
+        totals = totals.filter(institution_id=institution)
+    return totals.order_by('-total_score', 'total_time', 'id')
+
+
+def total_entry(total, ranking):
+    return {
+        'ranking': ranking,
+        'student_id': total.student_id,
+        'score': total.total_score,
+        'time_taken': str(total.total_time)
+    }
+
+
+def period_top(totals, k=10):
+    return [total_entry(total, rank) for rank, total in enumerate(totals[:k], start=1)]
+
+
+def period_rank(totals, student_id):
+    total = totals.filter(student_id=student_id).first()
+    if total is None:
+        return None
+    ahead = totals.filter(
+        Q(total_score__gt=total.total_score)
+        | Q(total_score=total.total_score, total_time__lt=total.total_time)
+        | Q(total_score=total.total_score, total_time=total.total_time, id__lt=total.id)
+    ).count()
+    return total_entry(total, ahead + 1)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from Challenge.leaderboard import backfill_time_taken, rebuild_totals
+
+
+class Command(BaseCommand):
+    help = 'Backfill time_taken on older challenge attempts and rebuild the weekly, monthly and all-time totals from them.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Backfilled time taken on {backfill_time_taken()} attempt(s)")
+        self.stdout.write(f"Rebuilt {rebuild_totals()} leaderboard total(s)")
@@ -1,4 +1,6 @@
-from django.db import models
+import datetime
+
+from django.db import connection, models
 from django.utils import timezone
 from Question.models import Question, QuestionGenerator
 
@@ -26,9 +28,88 @@ class StudentChallengeAttempt(models.Model):
     start_time = models.DateTimeField(default=timezone.now)
     end_time = models.DateTimeField(null=True, blank=True)
     total_questions = models.IntegerField()
+    time_taken = models.DurationField(null=True, blank=True)
 
     class Meta:
         unique_together = ['daily_challenge', 'student']
+        indexes = [
+            models.Index(fields=['daily_challenge', '-score', 'time_taken', 'leaderboardID'], name='challenge_leaderboard_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.daily_challenge} - {self.score}"
+
+
+class LeaderboardTotal(models.Model):
+    """
+    Running challenge totals per student for a leaderboard period (week, month or all time).
+
+    Rows are keyed by the first day of the period and only ever adjusted by the change a
+    scored attempt makes, so ranking a period never rescans the attempts in it. The
+    student's specialization and institution are copied in for filtered boards.
+    """
+    PERIODS = [
+        ('week', 'Weekly'),
+        ('month', 'Monthly'),
+        ('all', 'All time'),
+    ]
+
+    student = models.ForeignKey('User.Student', on_delete=models.CASCADE, related_name='leaderboard_totals')
+    specialization = models.ForeignKey('User.Specialization', on_delete=models.CASCADE)
+    institution = models.ForeignKey('Institution.Institution', on_delete=models.SET_NULL, null=True, blank=True)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    period_start = models.DateField()
+    total_score = models.FloatField(default=0)
+    challenges_completed = models.IntegerField(default=0)
+    total_time = models.DurationField(default=datetime.timedelta)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'period', 'period_start']
+        indexes = [
+            models.Index(fields=['period', 'period_start', '-total_score', 'total_time'], name='leaderboard_total_idx'),
+            models.Index(fields=['period', 'period_start', 'specialization', '-total_score'], name='leaderboard_spec_idx'),
+            models.Index(fields=['period', 'period_start', 'institution', '-total_score'], name='leaderboard_inst_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.period} {self.period_start} - {self.total_score}"
+
+    @classmethod
+    def add(cls, student, starts, score, time_taken, challenges):
+        """
+        Add ``score``/``time_taken``/``challenges`` to the student's total for every
+        ``{period: period_start}`` in ``starts`` with one INSERT ... ON CONFLICT DO UPDATE.
+        """
+        fields = [cls._meta.get_field(name) for name in (
+            'student', 'specialization', 'institution', 'period', 'period_start',
+            'total_score', 'challenges_completed', 'total_time', 'last_updated'
+        )]
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        column = {field.name: qn(field.column) for field in fields}
+
+        params = []
+        for period, period_start in starts.items():
+            values = [
+                student.pk, student.specialization_id, student.institution_id_id, period, period_start,
+                score, challenges, time_taken, timezone.now()
+            ]
+            params += [field.get_db_prep_value(value, connection) for field, value in zip(fields, values)]
+
+        increments = ', '.join(
+            f"{column[name]} = {table}.{column[name]} + EXCLUDED.{column[name]}"
+            for name in ('total_score', 'challenges_completed', 'total_time')
+        )
+        placeholders = '(' + ', '.join(['%s'] * len(fields)) + ')'
+        sql = (
+            f"INSERT INTO {table} ({', '.join(column.values())}) "
+            f"VALUES {', '.join([placeholders] * len(starts))} "
+            f"ON CONFLICT ({column['student']}, {column['period']}, {column['period_start']}) DO UPDATE SET "
+            f"{increments}, "
+            f"{column['specialization']} = EXCLUDED.{column['specialization']}, "
+            f"{column['institution']} = EXCLUDED.{column['institution']}, "
+            f"{column['last_updated']} = EXCLUDED.{column['last_updated']}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
@@ -1,3 +1,141 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from Institution.models import Institution
+from User.models import Student, Specialization
+from .leaderboard import get_leaderboard, period_start, record_totals
+from .models import Challenge, LeaderboardTotal, StudentChallengeAttempt
+
+
+class LeaderboardTest(TestCase):
+    def setUp(self):
+        specialization = Specialization.objects.create(name='1')
+        self.challenge = Challenge.objects.create(date=timezone.now().date())
+        self.attempts = {}
+        # (score, seconds): ranks are s1, s3, s0, s2
+        for i, (score, seconds) in enumerate([(3, 50), (5, 40), (3, 90), (5, 30)]):
+            student = Student.objects.create(user_name=f's{i}', password='x', first_name='S', last_name=str(i), email=f's{i}@t.com', specialization=specialization)
+            self.attempts[f's{i}'] = StudentChallengeAttempt.objects.create(
+                daily_challenge=self.challenge, student=student, score=score, total_questions=6, time_taken=timedelta(seconds=seconds)
+            )
+
+    def check_backend(self):
+        leaderboard = get_leaderboard()
+        self.assertEqual([row['student_id'] for row in leaderboard.top(self.challenge.challengeID, 3)], ['s3', 's1', 's0'])
+        self.assertEqual(leaderboard.rank(self.challenge.challengeID, 's2')['ranking'], 4)
+        self.assertIsNone(leaderboard.rank(self.challenge.challengeID, 'nobody'))
+
+        improved = self.attempts['s2']
+        improved.score = 6
+        improved.save()
+        leaderboard.record(improved)
+        self.assertEqual(leaderboard.rank(self.challenge.challengeID, 's2')['ranking'], 1)
+        self.assertEqual(leaderboard.rank(self.challenge.challengeID, 's1')['ranking'], 3)
+
+        response = self.client.get('/challenges/leaderboards/', {'student_id': 's0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['student'], {'ranking': 4, 'student_id': 's0', 'score': 3.0, 'time_taken': '0:00:50'})
+        self.assertEqual(len(response.json()['leaderboard']), 4)
+
+    @override_settings(LEADERBOARD_BACKEND='db')
+    def test_database_backend(self):
+        self.check_backend()
+
+    @override_settings(LEADERBOARD_BACKEND='local')
+    def test_local_backend(self):
+        get_leaderboard().clear()
+        self.check_backend()
+
+    def test_attempts_scored_before_time_taken_are_backfilled(self):
+        old = self.attempts['s0']
+        start = timezone.now() - timedelta(minutes=5)
+        StudentChallengeAttempt.objects.filter(pk=old.pk).update(time_taken=None, start_time=start, end_time=start + timedelta(seconds=20))
+        self.assertIsNone(get_leaderboard().rank(self.challenge.challengeID, 's0'))
+
+        out = StringIO()
+        call_command('rebuild_leaderboards', stdout=out)
+        self.assertIn('Backfilled time taken on 1 attempt(s)', out.getvalue())
+        self.assertEqual(get_leaderboard().rank(self.challenge.challengeID, 's0')['time_taken'], '0:00:20')
+
+
+class PeriodLeaderboardTest(TestCase):
+    def setUp(self):
+        self.civil = Specialization.objects.create(name='4')
+        self.electrical = Specialization.objects.create(name='3')
+        self.institution = Institution.objects.create(InstitutionName='School')
+        self.students = [
+            Student.objects.create(user_name='ana', password='x', first_name='A', last_name='A', email='a@t.com', specialization=self.civil, institution_id=self.institution),
+            Student.objects.create(user_name='ben', password='x', first_name='B', last_name='B', email='b@t.com', specialization=self.electrical),
+        ]
+        today = timezone.now().date()
+        self.challenges = [Challenge.objects.create(date=today), Challenge.objects.create(date=today - timedelta(days=400))]
+
+    def score(self, student, challenge, score, seconds, attempt=None):
+        if attempt is None:
+            attempt = StudentChallengeAttempt(daily_challenge=challenge, student=student, total_questions=6)
+        previous_score, previous_time = attempt.score, attempt.time_taken
+        attempt.score, attempt.time_taken = score, timedelta(seconds=seconds)
+        attempt.save()
+        record_totals(attempt, previous_score, previous_time)
+        return attempt
+
+    def test_totals_are_adjusted_incrementally(self):
+        ana, ben = self.students
+        attempt = self.score(ana, self.challenges[0], 2, 60)
+        self.score(ana, self.challenges[1], 5, 30)
+        self.score(ben, self.challenges[0], 4, 50)
+        self.score(ana, self.challenges[0], 3, 40, attempt=attempt)
+
+        all_time = LeaderboardTotal.objects.get(student=ana, period='all')
+        self.assertEqual((all_time.total_score, all_time.challenges_completed, all_time.total_time), (8, 2, timedelta(seconds=70)))
+        self.assertEqual(LeaderboardTotal.objects.get(student=ana, period='week', period_start=period_start('week', self.challenges[0].date)).total_score, 3)
+
+        weekly = self.client.get('/challenges/leaderboards/', {'student_id': 'ana', 'period': 'week'}).json()
+        self.assertEqual([row['student_id'] for row in weekly['leaderboard']], ['ben', 'ana'])
+        self.assertEqual(weekly['student'], {'ranking': 2, 'student_id': 'ana', 'score': 3.0, 'time_taken': '0:00:40'})
+
+        overall = self.client.get('/challenges/leaderboards/', {'student_id': 'ana', 'period': 'all'}).json()
+        self.assertEqual(overall['student']['ranking'], 1)
+
+        civil = self.client.get('/challenges/leaderboards/', {'student_id': 'ana', 'period': 'week', 'specialization': self.civil.id}).json()
+        self.assertEqual([row['student_id'] for row in civil['leaderboard']], ['ana'])
+        school = self.client.get('/challenges/leaderboards/', {'student_id': 'ben', 'period': 'month', 'institution': self.institution.pk}).json()
+        self.assertIsNone(school['student'])
+
+    def test_totals_are_rebuilt_from_attempts(self):
+        ana, ben = self.students
+        self.score(ana, self.challenges[0], 2, 60)
+        self.score(ana, self.challenges[1], 5, 30)
+        self.score(ben, self.challenges[0], 4, 50)
+        expected = sorted(LeaderboardTotal.objects.values_list('student_id', 'period', 'period_start', 'total_score', 'challenges_completed', 'total_time'))
+
+        LeaderboardTotal.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_leaderboards', stdout=out)
+
+        self.assertIn('Rebuilt 8 leaderboard total(s)', out.getvalue())
+        self.assertEqual(sorted(LeaderboardTotal.objects.values_list('student_id', 'period', 'period_start', 'total_score', 'challenges_completed', 'total_time')), expected)
+        self.assertEqual(LeaderboardTotal.objects.get(student=ana, period='all').institution, self.institution)
+
+    def test_scoring_and_totals_commit_together(self):
+        ana = self.students[0]
+        attempt = StudentChallengeAttempt.objects.create(daily_challenge=self.challenges[0], student=ana, score=0, total_questions=6)
+
+        with mock.patch('Challenge.views.record_totals', side_effect=RuntimeError('crash')), self.assertRaises(RuntimeError):
+            self.client.post('/studentChallengeAttempt/calculate_score/', {'attempt_id': attempt.pk}, content_type='application/json')
+        attempt.refresh_from_db()
+        self.assertIsNone(attempt.end_time)
+        self.assertIsNone(attempt.time_taken)
+
+        response = self.client.post('/studentChallengeAttempt/calculate_score/', {'attempt_id': attempt.pk}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(LeaderboardTotal.objects.get(student=ana, period='all').challenges_completed, 1)
+
+    def test_unknown_period(self):
+        response = self.client.get('/challenges/leaderboards/', {'student_id': 'ana', 'period': 'decade'})
+        self.assertEqual(response.status_code, 400)
@@ -1,20 +1,25 @@
-from django.db.models import ExpressionWrapper, F, FloatField
+from django.db import transaction
 from django.shortcuts import render
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from Question.models import StudentAnswer
-from User.models import StudentMastery
+from Question.scoring import ScoringPipeline
+from backend.pagination import StreamingListMixin
+from .leaderboard import PERIODS, get_leaderboard, period_rank, period_top, period_totals, record_totals
 from .models import Challenge, StudentChallengeAttempt
 from .serializer import ChallengeSerializer, StudentChallengeAttemptSerializer
 
 
+challenge_scoring = ScoringPipeline('challenge_attempt', lambda attempt: attempt.student)
+
+
 # Create your views here.
-class ChallengeViewSet(viewsets.ModelViewSet):
+class ChallengeViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = Challenge.objects.all()
     serializer_class = ChallengeSerializer
+    list_prefetch = ('questions__choices', 'questions__attachments')
 
     @action(detail=False, methods=['get'])
     def today(self, request):
@@ -37,45 +42,35 @@ class ChallengeViewSet(viewsets.ModelViewSet):
             return Response({"detail": "student_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
         today = timezone.now().date()
+        period = request.query_params.get('period', 'day')
+
+        if period in PERIODS:
+            totals = period_totals(
+                period, today,
+                specialization=request.query_params.get('specialization'),
+                institution=request.query_params.get('institution')
+            )
+            return Response({
+                'leaderboard': period_top(totals, 10),
+                'student': period_rank(totals, student_id)
+            }, status=status.HTTP_200_OK)
+        if period != 'day':
+            return Response({"detail": f"period must be one of: day, {', '.join(PERIODS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
         challenge = Challenge.objects.filter(date=today).first()
 
         if not challenge:
             return Response({"detail": "No challenge found for today."}, status=status.HTTP_404_NOT_FOUND)
 
-        all_attempts = StudentChallengeAttempt.objects.filter(daily_challenge=challenge).annotate(
-            time_taken=ExpressionWrapper(F('end_time') - F('start_time'), output_field=FloatField())
-        ).order_by('-score', 'time_taken')
-
-        leaderboard_data = []
-        student_data = None
-
-        for rank, attempt in enumerate(all_attempts, start=1):
-            attempt_data = {
-                'ranking': rank,
-                'student_id': attempt.student.user_name,
-                'score': attempt.score,
-                'time_taken': str(attempt.time_taken)
-            }
-
-            if str(attempt.student.user_name) == student_id:
-                student_data = attempt_data
-
-            if rank <= 10:
-                leaderboard_data.append(attempt_data)
-
-            if rank >= 10 and student_data:
-                break
+        leaderboard = get_leaderboard()
+        leaderboard_data = leaderboard.top(challenge.challengeID, 10)
+        student_data = leaderboard.rank(challenge.challengeID, student_id)
 
         return Response({
             'leaderboard': leaderboard_data,
             'student': student_data
         }, status=status.HTTP_200_OK)
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
-
 
 class StudentChallengeAttemptViewSet(viewsets.ModelViewSet):
     queryset = StudentChallengeAttempt.objects.all()
@@ -87,34 +82,22 @@ class StudentChallengeAttemptViewSet(viewsets.ModelViewSet):
         if not attempt_id:
             return Response({"detail": "attempt_id is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            attempt = StudentChallengeAttempt.objects.get(leaderboardID=attempt_id)
-        except StudentChallengeAttempt.DoesNotExist:
-            return Response({"detail": "Challenge attempt not found."}, status=status.HTTP_404_NOT_FOUND)
-
-        answers = StudentAnswer.objects.filter(challenge_attempt=attempt)
-        correct_answers_count = answers.filter(is_correct=True).count()
-
-        subtopic_answers = {}
-        for answer in answers:
-            subtopic = answer.question.learning_objective
-            if subtopic not in subtopic_answers:
-                subtopic_answers[subtopic] = []
-            subtopic_answers[subtopic].append({
-                'question': answer.question,
-                'is_correct': answer.is_correct
-            })
-
-        for subtopic, answers in subtopic_answers.items():
-            student_mastery, created = StudentMastery.objects.get_or_create(student=attempt.student, learning_objective=subtopic)
-            student_mastery.update_mastery(answers)
-
-        attempt.score = correct_answers_count
-        attempt.end_time = timezone.now()
-
-        attempt.save()
-
-        time_taken = attempt.end_time - attempt.start_time
+        # The score, time taken and period totals commit together; the row lock keeps a
+        # concurrent re-score from folding the same previous score into the totals twice.
+        with transaction.atomic():
+            try:
+                attempt = StudentChallengeAttempt.objects.select_for_update().get(leaderboardID=attempt_id)
+            except StudentChallengeAttempt.DoesNotExist:
+                return Response({"detail": "Challenge attempt not found."}, status=status.HTTP_404_NOT_FOUND)
+
+            previous_score, previous_time = attempt.score, attempt.time_taken
+            challenge_scoring.score(attempt)
+
+            time_taken = attempt.end_time - attempt.start_time
+            attempt.time_taken = time_taken
+            attempt.save(update_fields=['time_taken'])
+            record_totals(attempt, previous_score, previous_time)
+            transaction.on_commit(lambda: get_leaderboard().record(attempt))
 
         return Response({
             'score': attempt.score,
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from Class.models import Attachment
+from Class.previews import queue_preview, stale_previews
+
+
+class Command(BaseCommand):
+    help = 'Queue link preview fetches for link attachments that were never fetched or are older than LINK_PREVIEW_MAX_AGE.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refetch every link attachment.')
+        parser.add_argument('--max-age', type=int, default=None, help='Seconds after which a preview is refetched.')
+
+    def handle(self, *args, **options):
+        attachments = Attachment.objects.exclude(link='') if options['all'] else stale_previews(options['max_age'])
+        count = 0
+        for attachment_id in attachments.values_list('id', flat=True).iterator():
+            queue_preview(attachment_id)
+            count += 1
+        self.stdout.write(f"Queued {count} link preview(s)")
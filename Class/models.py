@@ -3,6 +3,7 @@ import uuid
 from django.db import models
 from django.utils import timezone
 from User.models import Teacher, Student, User
+from Media.storage import blob_storage
 
 # Create your models here.
 class Class(models.Model):
@@ -56,8 +57,13 @@ class Comment(models.Model):
 class Attachment(models.Model):
     id = models.AutoField(primary_key=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
-    file = models.FileField(upload_to='attachments/', blank=True, null=True)
+    file = models.FileField(upload_to='attachments/', storage=blob_storage, max_length=255, blank=True, null=True)
+    filename = models.CharField(max_length=255, blank=True)  # name it was uploaded with, the stored one is a hash
     link = models.URLField(blank=True)
+    # link preview, filled in by the 'attachment.link_preview' job (Class/tasks.py)
+    title = models.CharField(max_length=255, blank=True)
+    favicon = models.URLField(max_length=500, blank=True)
+    fetched_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
         return self.file.name if self.file else self.link
@@ -0,0 +1,51 @@
+from datetime import timedelta
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from Jobs.models import Job
+from Jobs.queue import enqueue
+from .models import Attachment
+
+# enough for the <head> of any sane page
+MAX_PREVIEW_BYTES = 512 * 1024
+
+
+def get_site_info(url, timeout=None):
+    timeout = settings.LINK_PREVIEW_TIMEOUT if timeout is None else timeout
+    with requests.get(url, timeout=timeout, stream=True, headers={'User-Agent': 'Mozilla/5.0 (link preview)'}) as response:
+        response.raise_for_status()
+        content = response.raw.read(MAX_PREVIEW_BYTES, decode_content=True)
+    soup = BeautifulSoup(content, 'html.parser')
+
+    title = soup.find('title').text.strip() if soup.find('title') else 'No title found'
+    favicon = soup.find('link', rel='icon') or soup.find('link', rel='shortcut icon')
+    favicon_url = urljoin(url, favicon['href']) if favicon and 'href' in favicon.attrs else ''
+
+    return {'title': title[:255], 'favicon': favicon_url[:500]}
+
+
+def stale_previews(max_age=None):
+    """Link attachments whose preview was never fetched or is older than LINK_PREVIEW_MAX_AGE."""
+    max_age = settings.LINK_PREVIEW_MAX_AGE if max_age is None else max_age
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    return Attachment.objects.exclude(link='').filter(Q(fetched_at__isnull=True) | Q(fetched_at__lt=cutoff))
+
+
+def queue_preview(attachment_id):
+    """Queue a preview fetch unless one for this attachment is already waiting or running."""
+    pending = Job.objects.filter(
+        name='attachment.link_preview', status__in=['queued', 'running'], payload__attachment_id=attachment_id
+    ).first()
+    return pending or enqueue('attachment.link_preview', attachment_id=attachment_id)
+
+
+def is_permanent(error):
+    """Failures retrying won't fix soon: 4xx answers, unresolvable or refusing hosts, bad URLs."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and 400 <= error.response.status_code < 500
+    return not isinstance(error, requests.Timeout)
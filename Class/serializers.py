@@ -1,9 +1,7 @@
 from rest_framework import serializers
-from bs4 import BeautifulSoup
-import requests
-from urllib.parse import urljoin
 from .models import Class, Post, Comment, JoinRequest, Activity, Submission, Attachment
 from Course.models import Course
+from Media.images import srcset
 
 from User.models import Teacher, Student
 from User.serializers import StudentSerializer
@@ -12,6 +10,7 @@ from User.serializers import StudentSerializer
 class ClassSerializer(serializers.ModelSerializer):
     course = serializers.PrimaryKeyRelatedField(queryset=Course.objects.all())
     image = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
     teacher_name = serializers.SerializerMethodField()
 
     class Meta:
@@ -29,6 +28,9 @@ class ClassSerializer(serializers.ModelSerializer):
     
     def get_image(self, obj):
         return obj.course.image.url if obj.course.image else None
+
+    def get_image_variants(self, obj):
+        return srcset(obj.course.image_variants, obj.course.image.name, self.context.get('request'))
     
     def get_teacher_name(self, obj):
         return f'{obj.teacher.first_name} {obj.teacher.last_name}' if obj.teacher else None
@@ -92,29 +94,21 @@ class AttachmentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Attachment
-        fields = ['id', 'user', 'file', 'link', 'title', 'favicon']
+        fields = ['id', 'user', 'file', 'filename', 'link', 'title', 'favicon']
+        read_only_fields = ['filename']
 
     def get_title(self, obj):
         if obj.link:
-            return get_site_info(obj.link)['title']
+            # stored by the link preview job; the bare link until it has run
+            return obj.title or obj.link
         if obj.file:
             return get_filename_from_path(obj.file.name)
         return None
 
     def get_favicon(self, obj):
         if obj.link:
-            return get_site_info(obj.link)['favicon']
+            return obj.favicon or None
         return None
-    
-def get_site_info(url):
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
-
-    title = soup.find('title').text if soup.find('title') else 'No title found'
-    favicon = soup.find('link', rel='icon') or soup.find('link', rel='shortcut icon')
-    favicon_url = urljoin(url, favicon['href']) if favicon and 'href' in favicon.attrs else 'No favicon found'
-
-    return {'title': title, 'favicon': favicon_url}
 
 def get_filename_from_path(path):
     return path.split('attachments/')[1]
@@ -0,0 +1,31 @@
+import os
+
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from .models import Attachment
+from Media.refs import track
+from .previews import queue_preview
+
+track(Attachment, 'file')
+
+
+@receiver(pre_save, sender=Attachment)
+def remember_file_name(sender, instance, **kwargs):
+    # a new upload is about to be stored under its hash, keep the name for downloads
+    if instance.file and not instance.file._committed:
+        instance.filename = os.path.basename(instance.file.name)
+
+
+@receiver(pre_save, sender=Attachment)
+def reset_stale_preview(sender, instance, **kwargs):
+    if instance.pk and instance.fetched_at:
+        old_link = Attachment.objects.filter(pk=instance.pk).values_list('link', flat=True).first()
+        if old_link != instance.link:
+            instance.title, instance.favicon, instance.fetched_at = '', '', None
+
+
+@receiver(post_save, sender=Attachment)
+def queue_link_preview(sender, instance, **kwargs):
+    if instance.link and instance.fetched_at is None:
+        queue_preview(instance.pk)
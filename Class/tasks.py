@@ -0,0 +1,24 @@
+import requests
+from django.utils import timezone
+
+from Jobs.queue import register
+from .models import Attachment
+from .previews import get_site_info, is_permanent
+
+
+@register('attachment.link_preview')
+def fetch_link_preview(attachment_id):
+    attachment = Attachment.objects.filter(id=attachment_id).exclude(link='').first()
+    if attachment is None:
+        return None
+    try:
+        info = get_site_info(attachment.link)
+    except requests.RequestException as e:
+        if not is_permanent(e):
+            raise  # timeouts and 5xx are retried with backoff
+        # recorded as fetched without a title, so saves and refresh_link_previews don't requeue it
+        # until LINK_PREVIEW_MAX_AGE has passed
+        info = {'title': '', 'favicon': ''}
+    # only if the link is still the one that was fetched
+    Attachment.objects.filter(id=attachment_id, link=attachment.link).update(fetched_at=timezone.now(), **info)
+    return info
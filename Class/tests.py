@@ -1,3 +1,121 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import requests
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from Jobs.models import Job
+from Jobs.queue import run_pending
+from User.models import User
+from .models import Attachment
+from .serializers import AttachmentSerializer
 
 # Create your tests here.
+
+
+class LinkPreviewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(user_name='linker', password='x', first_name='L', last_name='K', email='l@k.com')
+
+    @mock.patch('Class.tasks.get_site_info', return_value={'title': 'Example', 'favicon': 'https://example.com/favicon.ico'})
+    def test_preview_is_fetched_once_in_background(self, get_site_info):
+        attachment = Attachment.objects.create(user=self.user, link='https://example.com/')
+        self.assertEqual(Job.objects.filter(name='attachment.link_preview', status='queued').count(), 1)
+        self.assertEqual(AttachmentSerializer(attachment).data['title'], 'https://example.com/')
+
+        run_pending()
+        attachment.refresh_from_db()
+        data = AttachmentSerializer(attachment).data
+        self.assertEqual((data['title'], data['favicon']), ('Example', 'https://example.com/favicon.ico'))
+        self.assertIsNotNone(attachment.fetched_at)
+        get_site_info.assert_called_once_with('https://example.com/')
+
+        # changing the link drops the old preview and fetches again
+        attachment.link = 'https://example.org/'
+        attachment.save()
+        self.assertEqual(attachment.title, '')
+        self.assertEqual(Job.objects.filter(name='attachment.link_preview', status='queued').count(), 1)
+
+    def test_refresh_command_queues_stale_previews(self):
+        Attachment.objects.create(user=self.user, link='https://example.com/')
+        Job.objects.all().delete()
+        call_command('refresh_link_previews', stdout=StringIO())
+        self.assertEqual(Job.objects.filter(name='attachment.link_preview').count(), 1)
+
+    @mock.patch('Class.tasks.get_site_info', side_effect=requests.ConnectionError('Name or service not known'))
+    def test_failed_links_are_not_requeued(self, get_site_info):
+        attachment = Attachment.objects.create(user=self.user, link='https://nowhere.invalid/')
+        attachment.save()  # a pending fetch is not queued twice
+        self.assertEqual(Job.objects.filter(name='attachment.link_preview').count(), 1)
+
+        run_pending()
+        attachment.refresh_from_db()
+        self.assertIsNotNone(attachment.fetched_at)
+        self.assertEqual(attachment.title, '')
+
+        attachment.save()
+        call_command('refresh_link_previews', stdout=StringIO())
+        self.assertEqual(Job.objects.filter(name='attachment.link_preview').count(), 1)
+        get_site_info.assert_called_once()
+
+
+class AttachmentDownloadTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings_override = override_settings(MEDIA_ROOT=self.media, FILE_DOWNLOAD_MODE='auto')
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+        user = User.objects.create(user_name='downloader', password='x', first_name='D', last_name='L', email='d@l.com')
+        self.content = bytes(range(256)) * 40
+        self.attachment = Attachment.objects.create(user=user, file=ContentFile(self.content, name='lecture.pdf'))
+        self.url = f'/attachments/{self.attachment.pk}/download/'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download_with_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(int(response['Content-Length']), len(self.content))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('attachment; filename="lecture', response['Content-Disposition'])
+        self.assertEqual(self.body(response), self.content)
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.body(response), self.content[100:200])
+
+        etag = response['ETag']
+        tail = self.client.get(self.url, HTTP_RANGE='bytes=-10', HTTP_IF_RANGE=etag)
+        self.assertEqual(self.body(tail), self.content[-10:])
+        resumed = self.client.get(self.url, HTTP_RANGE='bytes=10000-')
+        self.assertEqual(self.body(resumed), self.content[10000:])
+
+        # a stale If-Range gets the whole file
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"').status_code, 200)
+        unsatisfiable = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(unsatisfiable.status_code, 416)
+        self.assertEqual(unsatisfiable['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_offloaded_modes(self):
+        with override_settings(FILE_DOWNLOAD_MODE='accel'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.attachment.file.name)
+
+        with override_settings(FILE_DOWNLOAD_MODE='redirect'):
+            response = self.client.get(self.url)
+            storage_url = self.attachment.file.url
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response['Location'], storage_url)
@@ -1,6 +1,6 @@
 from django.shortcuts import render
 from django.utils import timezone
-from django.http import StreamingHttpResponse
+from backend.downloads import serve_file
 from django.db.models import Case, When, Value, IntegerField, F, Exists, OuterRef
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
@@ -326,17 +326,6 @@ class AttachmentViewSet(viewsets.ModelViewSet):
     def download(self, request, pk=None):
         attachment = self.get_object()
         if attachment.file:
-            def file_iterator(file_name, chunk_size=8192):
-                with open(file_name, 'rb') as file:
-                    while True:
-                        chunk = file.read(chunk_size)
-                        if chunk:
-                            yield chunk
-                        else:
-                            break
-            response = StreamingHttpResponse(file_iterator(attachment.file.path))
-            response['Content-Type'] = 'application/octet-stream'
-            response['Content-Disposition'] = 'attachment; filename="{}"'.format(attachment.file.name)
-            return response
+            return serve_file(request, attachment.file, filename=attachment.filename or None)
         else:
             return Response({"error": "No file attached"}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
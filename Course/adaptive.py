@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, FilteredRelation, Prefetch, Q, Sum
+
+from .models import ContentBlock, LearningObjective, Page
+from .serializer import LearningObjectiveSerializer, PageSerializer
+
+# Pwede pani mamodify kung asa ka na sa mastery level
+TIERS = [
+    (50.0, 'beginner'),
+    (80.0, 'intermediate'),
+]
+TOP_TIER = 'advanced'
+
+
+def tier_for(mastery):
+    for upper, tier in TIERS:
+        if mastery < upper:
+            return tier
+    return TOP_TIER
+
+
+def subtopic_mastery(student_id, subtopic_id):
+    """
+    Average mastery of ``student_id`` over the subtopic's learning objectives, in one query.
+
+    Objectives the student has no StudentMastery row for count as 0.
+    """
+    totals = LearningObjective.objects.filter(subtopic_id=subtopic_id).annotate(
+        student_mastery=FilteredRelation('mastery', condition=Q(mastery__student_id=student_id))
+    ).aggregate(
+        objectives=Count('id'),
+        total=Sum('student_mastery__mastery_level', default=0)
+    )
+    if not totals['objectives']:
+        return 0.0
+    return float(totals['total']) / totals['objectives']
+
+
+def difficulty_tier(student_id, subtopic_id):
+    return tier_for(subtopic_mastery(student_id, subtopic_id))
+
+
+def subtopic_cache_key(subtopic_id, tier, version, request):
+    # file urls are absolute to the host that asked, so it is part of the key
+    return f"subtopic-pages:{subtopic_id}:{tier or 'all'}:{version}:{request.build_absolute_uri('/')}"
+
+
+def render_subtopic_pages(subtopic_id, tier, version, request):
+    """
+    The ``{"pages", "objectives"}`` payload of a subtopic for one difficulty tier.
+
+    Every student in the same tier gets the same payload, so it is cached per
+    (subtopic, tier) until the course's content_version changes. With no tier all
+    content blocks are included.
+    """
+    key = subtopic_cache_key(subtopic_id, tier, version, request)
+    data = cache.get(key)
+    if data is None:
+        pages = Page.objects.filter(subtopic_id=subtopic_id)
+        if tier:
+            # Filter sa pages based sa mastery level
+            blocks = ContentBlock.objects.filter(Q(difficulty=tier) | Q(difficulty__isnull=True))
+        else:
+            blocks = ContentBlock.objects.all()
+        pages = pages.prefetch_related(Prefetch('content_blocks', queryset=blocks))
+        objectives = LearningObjective.objects.filter(subtopic_id=subtopic_id)
+
+        context = {'request': request}
+        data = {
+            "pages": PageSerializer(pages, many=True, context=context).data,
+            "objectives": LearningObjectiveSerializer(objectives, many=True, context=context).data,
+        }
+        if version is not None:
+            cache.set(key, data, getattr(settings, 'COURSE_TREE_CACHE_TIMEOUT', 60 * 60 * 24))
+    return data
@@ -0,0 +1,96 @@
+from django.db import transaction
+
+from .models import Course, ContentBlock, Page
+from .serializer import ContentBlockWriteSerializer
+from .signals import content_blocks_bulk_saved, courses_of, defer_version_bumps
+
+BLOCK_FIELDS = ['block_type', 'difficulty', 'content']
+
+
+class BlockDiffError(Exception):
+    def __init__(self, detail):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class BlockDiff:
+    def __init__(self):
+        self.created = []
+        self.updated = []
+        self.deleted = []
+
+
+def diff_page_blocks(existing, blocks):
+    """
+    Compare validated ``blocks`` (the full new content of a page) with the page's ``existing`` blocks.
+
+    Blocks with a block_id are matched to the existing block and only kept in
+    ``updated`` if a field actually changed; blocks without one are new; existing
+    blocks missing from ``blocks`` are deleted. Raises BlockDiffError for a block_id
+    that is not on the page or appears twice.
+    """
+    existing = {block.id: block for block in existing}
+    diff = BlockDiff()
+    seen = set()
+
+    for data in blocks:
+        block_id = data.get('block_id')
+        if block_id is None:
+            diff.created.append(ContentBlock(**{field: data.get(field) for field in BLOCK_FIELDS}))
+            continue
+        if block_id not in existing:
+            raise BlockDiffError(f"Content block {block_id} does not belong to this page.")
+        if block_id in seen:
+            raise BlockDiffError(f"Content block {block_id} appears more than once.")
+        seen.add(block_id)
+
+        block = existing[block_id]
+        changed = False
+        for field in BLOCK_FIELDS:
+            value = data.get(field, getattr(block, field))
+            if getattr(block, field) != value:
+                setattr(block, field, value)
+                changed = True
+        if changed:
+            diff.updated.append(block)
+
+    diff.deleted = [block_id for block_id in existing if block_id not in seen]
+    return diff
+
+
+def apply_page_blocks(page_id, blocks_data):
+    """
+    Replace the content blocks of page ``page_id`` with ``blocks_data`` in one transaction.
+
+    All blocks are validated together, then the diff is written with one bulk_create,
+    one bulk_update and one delete, and the course's content version is bumped once,
+    so the query count does not grow with the number of blocks. Returns the BlockDiff.
+    Raises serializers.ValidationError or BlockDiffError when the payload is invalid and
+    Page.DoesNotExist for an unknown page.
+    """
+    serializer = ContentBlockWriteSerializer(data=blocks_data, many=True)
+    serializer.is_valid(raise_exception=True)
+
+    with transaction.atomic(), defer_version_bumps():
+        # lock the page so two editors saving at once can't interleave their diffs
+        page = Page.objects.select_for_update().get(pk=page_id)
+        existing = page.content_blocks.all()
+        diff = diff_page_blocks(existing, serializer.validated_data)
+
+        for block in diff.created + diff.updated:
+            block.page = page
+            if block.block_type == 'lesson':
+                block.difficulty = None  # same rule as ContentBlock.save
+
+        if diff.deleted:
+            ContentBlock.objects.filter(id__in=diff.deleted).delete()
+        if diff.updated:
+            ContentBlock.objects.bulk_update(diff.updated, BLOCK_FIELDS)
+        if diff.created:
+            ContentBlock.objects.bulk_create(diff.created)
+        if diff.created or diff.updated or diff.deleted:
+            Course.bump_content_version(courses_of(Page, [page.pk]))
+        if diff.created or diff.updated:
+            content_blocks_bulk_saved.send(sender=ContentBlock, ids=[block.id for block in diff.created + diff.updated])
+
+    return diff
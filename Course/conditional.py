@@ -0,0 +1,47 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import Course
+
+
+def content_etag(request, version, variant=''):
+    # strong validator: same URL + same content version (+ variant, e.g. difficulty tier) => same bytes
+    key = f"{request.path}|{version}|{variant}"
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def content_state(course_filter):
+    """``(content_version, content_updated_at)`` of the course matching ``course_filter``, or None."""
+    return Course.objects.filter(**course_filter).values_list('content_version', 'content_updated_at').first()
+
+
+def conditional_content_response(request, course_filter, render, variant='', state=None):
+    """
+    Answer a read of course content with ETag/Last-Modified validators from the course's content version.
+
+    ``course_filter`` selects the course the content belongs to (e.g.
+    ``{'syllabus__lessons': lesson_id}``); ``render`` builds the Response and is only
+    called when the client's copy is out of date. If no course matches, ``render`` is
+    called as-is so the view can answer with its own 404. Pass ``state`` when the
+    caller already looked it up with content_state.
+    """
+    if state is None:
+        state = content_state(course_filter)
+    if state is None:
+        return render()
+
+    version, updated_at = state
+    etag = content_etag(request, version, variant)
+    last_modified = int(updated_at.timestamp())
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    response = render()
+    if 200 <= response.status_code < 300:
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from Course.uploads import discard, expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned or failed upload sessions older than UPLOAD_SESSION_TTL, with their partial files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=None, help='Age in seconds after which a session is discarded.')
+
+    def handle(self, *args, **options):
+        count = 0
+        for session in expired_sessions(options['ttl']).iterator():
+            discard(session)
+            count += 1
+        self.stdout.write(f"Discarded {count} upload session(s)")
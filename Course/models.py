@@ -1,7 +1,10 @@
+import uuid
+
 from django.utils import timezone
 from django.db import models
 from django_ckeditor_5.fields import CKEditor5Field
 from User.models import Specialization
+from Media.storage import blob_storage
 
 from Exam.models import Exam
 
@@ -17,10 +20,33 @@ class Course(models.Model):
     course_title = models.CharField(max_length=200)
     short_description = models.CharField(max_length=500)
     image = models.ImageField(upload_to='images/', default='default.png')
+    image_variants = models.JSONField(default=dict, blank=True)  # filled by the 'course.image_variants' job, see Media/images.py
     is_published = models.BooleanField(default=False)  
+    content_version = models.PositiveIntegerField(default=0)  # bumped on any change to the course content tree
+    content_updated_at = models.DateTimeField(default=timezone.now)
+
     def __str__(self):
         return self.course_title
 
+    def save(self, *args, **kwargs):
+        # content_version/content_updated_at only change through bump_content_version, so a save
+        # from a stale instance can't roll it back and revive an old cached rendering; image_variants
+        # is likewise only written by its job
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in ('content_version', 'content_updated_at', 'image_variants')
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bump_content_version(cls, courses):
+        """Bump the content version of ``courses`` (a Course queryset/subquery of ids or a list of ids)."""
+        cls.objects.filter(pk__in=courses).update(
+            content_version=models.F('content_version') + 1,
+            content_updated_at=timezone.now()
+        )
+
     def get_all_objectives(self):
         objectives = []
 
@@ -111,7 +137,7 @@ class ContentBlock(models.Model):
     block_type = models.CharField(max_length=50, choices=BLOCK_TYPE_CHOICES)
     difficulty = models.CharField(max_length=50, choices=DIFFICULTY_CHOICES, null=True, blank=True)
     content = models.TextField()
-    file = models.FileField(upload_to='content_blocks/files/', null=True, blank=True)
+    file = models.FileField(upload_to='content_blocks/files/', storage=blob_storage, max_length=255, null=True, blank=True)
 
     def __str__(self):
         return f"{self.get_block_type_display()} ({self.get_difficulty_display()}) - {self.page.subtopic.subtopic_title}"
@@ -121,10 +147,41 @@ class ContentBlock(models.Model):
         super().save(*args, **kwargs)
 
 class FileUpload(models.Model):
-    file = models.FileField(upload_to='uploads/')
+    file = models.FileField(upload_to='uploads/', storage=blob_storage, max_length=255)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
 
+class UploadSession(models.Model):
+    """A chunked, resumable upload, see Course/uploads.py."""
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    TARGET_CHOICES = [
+        ('file_upload', 'FileUpload'),  # becomes a FileUpload row
+        ('media', 'Media'),  # just stored, like upload_file/ and media/uploads/
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    checksum = models.CharField(max_length=64, blank=True)  # sha256 hex, checked when finalizing
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES, default='file_upload')
+    received = models.BigIntegerField(default=0)  # bytes stored so far = offset of the next chunk
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    file_upload = models.ForeignKey(FileUpload, on_delete=models.SET_NULL, null=True, blank=True)
+    url = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    chunk_started_at = models.DateTimeField(null=True, blank=True)  # set while a chunk is being written, see append_chunk
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size}) - {self.status}"
+
+
 class StudentLessonProgress(models.Model):
     student = models.ForeignKey('User.Student', on_delete=models.CASCADE)  # Assuming you have a Student model
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
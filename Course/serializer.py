@@ -3,12 +3,13 @@ from django.conf import settings
 from rest_framework import serializers
 
 from Quiz.models import Quiz
-from .models import Course, StudentCourseProgress, StudentLessonProgress, Syllabus, Lesson, Page, Topic, Subtopic, ContentBlock,FileUpload, LearningObjective
+from .models import Course, StudentCourseProgress, StudentLessonProgress, Syllabus, Lesson, Page, Topic, Subtopic, ContentBlock,FileUpload, LearningObjective, UploadSession
 from Exam.models import Exam
 from datetime import datetime
 import time
 
 from User.models import Specialization
+from Media.images import srcset
 
 class LearningObjectiveSerializer(serializers.ModelSerializer):
     class Meta:
@@ -24,6 +25,13 @@ class ContentBlockSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         return ContentBlock.objects.create(**validated_data)
 
+class ContentBlockWriteSerializer(serializers.ModelSerializer):
+    """One block of a page-level bulk edit; blocks without a block_id are new."""
+    block_id = serializers.IntegerField(required=False, allow_null=True)
+    class Meta:
+        model = ContentBlock
+        fields = ['block_id', 'block_type', 'difficulty', 'content']
+
 class PageSerializer(serializers.ModelSerializer):
     page_id = serializers.ReadOnlyField(source='id')
     content_blocks = ContentBlockSerializer(many=True, read_only=True)
@@ -88,6 +96,28 @@ class FileUploadSerializer(serializers.ModelSerializer):
     class Meta:
         model = FileUpload
         fields = ['file', 'uploaded_at']
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunk_size = serializers.SerializerMethodField()
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'checksum', 'target', 'received', 'status', 'file_upload', 'url', 'error', 'chunk_size']
+        read_only_fields = ['received', 'status', 'file_upload', 'url', 'error']
+
+    def get_chunk_size(self, obj):
+        return settings.UPLOAD_CHUNK_SIZE
+
+    def validate_size(self, value):
+        if value < 1 or value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes.")
+        return value
+
+    def validate_filename(self, value):
+        # only the name, never a path
+        value = value.replace('\\', '/').rsplit('/', 1)[-1]
+        if value in ('', '.', '..'):
+            raise serializers.ValidationError("Invalid file name.")
+        return value
         
 class SyllabusSerializer(serializers.ModelSerializer):
     lessons = LessonSerializer(many=True, read_only=True)
@@ -109,6 +139,7 @@ def generate_syllabus_id(course):
 
 class CourseSerializer(serializers.ModelSerializer):
     syllabus = SyllabusSerializer(read_only=True)
+    image_variants = serializers.SerializerMethodField()
     specializations = serializers.PrimaryKeyRelatedField(
         queryset=Specialization.objects.all(), many=True
     )
@@ -120,6 +151,7 @@ class CourseSerializer(serializers.ModelSerializer):
             'course_title', 
             'short_description', 
             'image', 
+            'image_variants',
             'syllabus', 
             'is_published', 
             'specializations'
@@ -134,6 +166,9 @@ class CourseSerializer(serializers.ModelSerializer):
         course.specializations.set(specializations)
         return course
 
+    def get_image_variants(self, obj):
+        return srcset(obj.image_variants, obj.image.name, self.context.get('request'))
+
     def update(self, instance, validated_data):
         specializations = validated_data.pop('specializations', None)
         instance = super().update(instance, validated_data)
@@ -0,0 +1,93 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from Jobs.queue import enqueue
+from Media.refs import track, track_variants
+from .models import Course, Syllabus, Lesson, Topic, Subtopic, Page, ContentBlock, FileUpload, LearningObjective
+
+# refcounts for the content-addressed media blobs these fields point at
+track(ContentBlock, 'file')
+track(FileUpload, 'file')
+track_variants(Course, 'image_variants')
+
+# lookup from each content model to the id of the course it belongs to
+COURSE_LOOKUPS = {
+    Syllabus: 'course_id',
+    Lesson: 'syllabus__course_id',
+    Topic: 'lesson__syllabus__course_id',
+    Subtopic: 'topic__lesson__syllabus__course_id',
+    LearningObjective: 'subtopic__topic__lesson__syllabus__course_id',
+    Page: 'subtopic__topic__lesson__syllabus__course_id',
+    ContentBlock: 'page__subtopic__topic__lesson__syllabus__course_id',
+}
+
+
+_deferred = threading.local()
+
+# sent with ``ids`` after blocks are written with bulk_create/bulk_update, which skip post_save
+content_blocks_bulk_saved = Signal()
+
+
+def courses_of(model, pks):
+    return model.objects.filter(pk__in=pks).values(COURSE_LOOKUPS[model])
+
+
+@contextmanager
+def defer_version_bumps():
+    """Skip the per-row bumps inside the block; the caller bumps the affected courses once itself."""
+    previous = getattr(_deferred, 'active', False)
+    _deferred.active = True
+    try:
+        yield
+    finally:
+        _deferred.active = previous
+
+
+def _bumps_deferred():
+    return getattr(_deferred, 'active', False)
+
+
+@receiver(post_save)
+@receiver(pre_delete)
+def bump_course_content_version(sender, instance, **kwargs):
+    if _bumps_deferred():
+        return
+    if sender is Course:
+        if not kwargs.get('created') and kwargs.get('signal') is post_save:
+            Course.bump_content_version([instance.pk])
+    elif sender in COURSE_LOOKUPS:
+        Course.bump_content_version(courses_of(sender, [instance.pk]))
+
+
+@receiver(m2m_changed, sender=Course.specializations.through)
+@receiver(m2m_changed, sender=Lesson.learning_objectives.through)
+@receiver(m2m_changed, sender=Lesson.skills_to_acquire.through)
+@receiver(m2m_changed, sender=Topic.learning_objectives.through)
+@receiver(m2m_changed, sender=Topic.skills_to_acquire.through)
+def bump_course_content_version_m2m(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if not action.startswith('post_') or _bumps_deferred():
+        return
+    owner_model, owner_pks = (model, pk_set) if reverse else (type(instance), [instance.pk])
+    if reverse and action == 'post_clear':
+        return  # the cleared owners are no longer known
+    if owner_model is Course:
+        Course.bump_content_version(list(owner_pks))
+    else:
+        Course.bump_content_version(courses_of(owner_model, owner_pks))
+
+
+@receiver(post_save, sender=Course)
+def queue_image_variants(sender, instance, raw=False, **kwargs):
+    image = instance.image.name
+    if raw or instance.image_variants.get('source') == image:
+        return
+    if instance.image_variants:
+        # the variants of the previous image must not be served next to the new one
+        Course.objects.filter(pk=instance.pk).update(image_variants={})
+        instance.image_variants = {}
+    # the shared placeholder is not resized per course
+    if image and image != Course._meta.get_field('image').default:
+        enqueue('course.image_variants', course_id=instance.pk)
@@ -0,0 +1,21 @@
+from Jobs.queue import register
+from Media.images import build_variants
+from .models import Course
+from .uploads import finalize
+
+
+@register('upload.finalize')
+def finalize_upload(session_id):
+    return finalize(session_id)
+
+
+@register('course.image_variants')
+def build_course_image_variants(course_id):
+    course = Course.objects.filter(pk=course_id).only('image', 'image_variants').first()
+    if course is None or not course.image or course.image_variants.get('source') == course.image.name:
+        return None
+    variants = build_variants(course.image.name)
+    # only if the image is still the one that was resized
+    if Course.objects.filter(pk=course_id, image=course.image.name).update(image_variants=variants):
+        Course.bump_content_version([course_id])
+    return {fmt: len(sizes) for fmt, sizes in variants.items() if fmt != 'source'}
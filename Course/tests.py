@@ -1,3 +1,414 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from backend import llm
+from User.models import Specialization, Student, StudentMastery
+
+from Jobs.queue import run_pending
+from Media.models import MediaBlob
+from Media.refs import collect_garbage
+from .models import Course, Syllabus, Lesson, Topic, Subtopic, Page, ContentBlock, Objective, LearningObjective, FileUpload, UploadSession
+from .serializer import CourseSerializer
+from .uploads import part_path
+
+
+@override_settings(LLM_BACKEND='stub', LLM_STUB_RESPONSE='Short summary')
+class SummarizeLessonContentTest(TestCase):
+    def setUp(self):
+        caches['llm'].clear()
+        course = Course.objects.create(course_id='SUM101', course_title='Summary Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='SUMSYL')
+        self.lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=self.lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        page = Page.objects.create(subtopic=subtopic, page_number=1)
+        ContentBlock.objects.create(page=page, block_type='lesson', content='Ohm\'s law')
+
+    def test_summarizes_lesson_blocks(self):
+        response = self.client.post('/pages/summarize_lesson_content/', {'lesson_id': self.lesson.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'summary': 'Short summary'})
+
+    def test_lesson_without_content(self):
+        response = self.client.post('/pages/summarize_lesson_content/', {'lesson_id': self.lesson.id + 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_repeated_summary_is_served_from_cache(self):
+        hits, misses = llm.cache_stats['hits'], llm.cache_stats['misses']
+        for _ in range(3):
+            self.client.post('/pages/summarize_lesson_content/', {'lesson_id': self.lesson.id}, content_type='application/json')
+        self.assertEqual(llm.cache_stats['misses'] - misses, 1)
+        self.assertEqual(llm.cache_stats['hits'] - hits, 2)
+
+        with override_settings(LLM_STUB_RESPONSE='Fresh'):
+            self.assertEqual(llm.complete([{'role': 'user', 'content': 'Hi'}], cache=False), 'Fresh')
+            self.assertEqual(llm.complete([{'role': 'user', 'content': 'Hi'}], cache=False), 'Fresh')
+        self.assertEqual(llm.cache_stats['misses'] - misses, 1)
+
+    def test_summary_stream(self):
+        response = self.client.get('/pages/summarize_lesson_content_stream/', {'lesson_id': self.lesson.id}, HTTP_ACCEPT='text/event-stream')
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(body, 'data: {"text": "Short "}\n\ndata: {"text": "summary"}\n\nevent: done\ndata: {"summary": "Short summary"}\n\n')
+
+
+class CourseTreeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.course = Course.objects.create(course_id='TREE101', course_title='Tree Course', short_description='')
+        syllabus = Syllabus.objects.create(course=self.course, syllabus_id='TREESYL')
+        for l in range(2):
+            lesson = Lesson.objects.create(syllabus=syllabus, lesson_title=f'Lesson {l}', order=l)
+            lesson.learning_objectives.add(Objective.objects.create(text=f'Objective {l}'))
+            for t in range(2):
+                topic = Topic.objects.create(lesson=lesson, topic_title=f'Topic {t}', order=t)
+                for st in range(2):
+                    subtopic = Subtopic.objects.create(topic=topic, subtopic_title=f'Subtopic {st}', order=st)
+                    for p in range(2):
+                        page = Page.objects.create(subtopic=subtopic, page_number=p)
+                        ContentBlock.objects.create(page=page, block_type='lesson', content=f'{l}.{t}.{st}.{p}')
+        self.page = page
+
+    def version(self):
+        return Course.objects.get(pk=self.course.pk).content_version
+
+    def test_retrieve_uses_fixed_queries_then_cache(self):
+        with self.assertNumQueries(11):
+            first = self.client.get('/courses/TREE101/').json()
+        with self.assertNumQueries(1):
+            second = self.client.get('/courses/TREE101/').json()
+        self.assertEqual(first, second)
+
+        lessons = first['syllabus']['lessons']
+        self.assertEqual(len(lessons), 2)
+        self.assertEqual(len(lessons[0]['topics'][0]['subtopics'][0]['pages'][0]['content_blocks']), 1)
+
+    def test_content_writes_bump_version(self):
+        self.client.get('/courses/TREE101/')
+        version = self.version()
+
+        ContentBlock.objects.create(page=self.page, block_type='example', content='New example')
+        self.assertEqual(self.version(), version + 1)
+        response = self.client.get('/courses/TREE101/').json()
+        blocks = response['syllabus']['lessons'][1]['topics'][1]['subtopics'][1]['pages'][1]['content_blocks']
+        self.assertEqual(len(blocks), 2)
+
+        version = self.version()
+        self.page.delete()
+        self.assertGreater(self.version(), version)
+
+        version = self.version()
+        Lesson.objects.first().learning_objectives.clear()
+        self.assertEqual(self.version(), version + 1)
+
+        stale = Course.objects.get(pk=self.course.pk)
+        stale.content_version = 0
+        stale.course_title = 'Renamed'
+        stale.save()
+        self.assertEqual(self.version(), version + 2)
+
+    def test_conditional_get_skips_serialization(self):
+        lesson = Lesson.objects.first()
+        urls = [
+            '/courses/TREE101/',
+            '/syllabi/TREE101/',
+            f'/lessons/{lesson.pk}/',
+            f'/topics/{lesson.topics.first().pk}/subtopics/',
+            f'/pages/by_subtopic/{self.page.subtopic_id}/',
+        ]
+        etags = {}
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Last-Modified', response)
+            etags[url] = response['ETag']
+
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 304)
+
+        ContentBlock.objects.create(page=self.page, block_type='example', content='New example')
+        for url in urls:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etags[url])
+
+
+class AdaptivePagesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(course_id='ADP101', course_title='Adaptive Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='ADPSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        self.subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        self.first = LearningObjective.objects.create(text='First', subtopic=self.subtopic)
+        LearningObjective.objects.create(text='Second', subtopic=self.subtopic)
+        page = Page.objects.create(subtopic=self.subtopic, page_number=1)
+        for difficulty in (None, 'beginner', 'intermediate', 'advanced'):
+            ContentBlock.objects.create(page=page, block_type='example', difficulty=difficulty, content=str(difficulty))
+
+        specialization = Specialization.objects.create(name='1')
+        self.students = [
+            Student.objects.create(user_name=f'adaptive{i}', password='x', first_name='A', last_name='S', email=f'a{i}@s.com', specialization=specialization)
+            for i in range(2)
+        ]
+        self.url = f'/pages/by_subtopic/{self.subtopic.pk}/'
+
+    def blocks(self, response):
+        return [block['difficulty'] for block in response.json()['pages'][0]['content_blocks']]
+
+    def test_missing_mastery_counts_as_zero(self):
+        response = self.client.get(self.url, {'student_id': self.students[0].pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.blocks(response), [None, 'beginner'])
+
+    def test_students_in_a_tier_share_one_payload(self):
+        for student in self.students:
+            StudentMastery.objects.create(student=student, learning_objective=self.first, mastery_level=100)
+
+        first = self.client.get(self.url, {'student_id': self.students[0].pk})
+        self.assertEqual(self.blocks(first), [None, 'intermediate'])
+        # tier aggregate + content version, then the cached payload
+        with self.assertNumQueries(2):
+            second = self.client.get(self.url, {'student_id': self.students[1].pk})
+        self.assertEqual(first.json(), second.json())
+
+        self.assertEqual(len(self.blocks(self.client.get(self.url))), 4)
+
+    def test_objective_edits_change_etag(self):
+        first = self.client.get(self.url, {'student_id': self.students[0].pk})
+        self.first.text = 'First, reworded'
+        self.first.save()
+
+        response = self.client.get(self.url, {'student_id': self.students[0].pk}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_objective_edits_are_not_served_from_cache(self):
+        objectives = lambda: [objective['text'] for objective in self.client.get(self.url, {'student_id': self.students[0].pk}).json()['objectives']]
+        self.assertEqual(objectives(), ['First', 'Second'])
+
+        self.first.text = 'First, reworded'
+        self.first.save()
+        self.assertEqual(objectives(), ['First, reworded', 'Second'])
+
+        self.first.delete()
+        self.assertEqual(objectives(), ['Second'])
+
+class BulkContentBlockTest(TestCase):
+    def setUp(self):
+        course = Course.objects.create(course_id='BLK101', course_title='Bulk Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='BLKSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        self.page = Page.objects.create(subtopic=subtopic, page_number=1)
+        self.blocks = [ContentBlock.objects.create(page=self.page, block_type='example', content=f'Old {i}') for i in range(3)]
+        self.url = f'/pages/{self.page.pk}/blocks/'
+
+    def put(self, blocks):
+        return self.client.put(self.url, {'blocks': blocks}, content_type='application/json')
+
+    def test_diff_is_applied_in_constant_queries(self):
+        version = Course.objects.get(pk='BLK101').content_version
+        payload = [
+            {'block_id': self.blocks[0].id, 'block_type': 'example', 'content': 'Old 0'},
+            {'block_id': self.blocks[1].id, 'block_type': 'practice', 'difficulty': 'advanced', 'content': 'Changed'},
+        ] + [{'block_type': 'lesson', 'difficulty': 'advanced', 'content': f'New {i}'} for i in range(60)]
+
+        with self.assertNumQueries(10):
+            response = self.put(payload)
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated'], body['deleted']), (60, 1, 1))
+        self.assertEqual(len(body['blocks']), 62)
+        self.assertFalse(ContentBlock.objects.filter(id=self.blocks[2].id).exists())
+        self.assertIsNone(ContentBlock.objects.filter(content='New 0').get().difficulty)
+        self.assertEqual(ContentBlock.objects.get(id=self.blocks[1].id).content, 'Changed')
+        self.assertEqual(Course.objects.get(pk='BLK101').content_version, version + 1)
+
+    def test_malformed_body_is_rejected(self):
+        for body in ([{'block_type': 'example', 'content': 'New'}], 'blocks', 3, {'blocks': 'x'}):
+            response = self.client.put(self.url, body, content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+    def test_invalid_payload_changes_nothing(self):
+        response = self.put([{'block_type': 'example', 'content': 'New'}, {'block_type': 'bogus', 'content': 'x'}])
+        self.assertEqual(response.status_code, 400)
+
+        other_page = Page.objects.create(subtopic=self.page.subtopic, page_number=2)
+        foreign = ContentBlock.objects.create(page=other_page, block_type='example', content='Elsewhere')
+        response = self.put([{'block_type': 'example', 'content': 'New'}, {'block_id': foreign.id, 'block_type': 'example', 'content': 'x'}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ContentBlock.objects.filter(page=self.page).count(), 3)
+
+
+class UploadSessionTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmp.name, UPLOAD_TEMP_DIR=os.path.join(self.tmp.name, 'parts'), UPLOAD_CHUNK_SIZE=4)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def put_chunk(self, session_id, offset, data):
+        return self.client.put(f'/upload-sessions/{session_id}/chunk/', data, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+    def open_session(self, data, checksum):
+        response = self.client.post('/upload-sessions/', {'filename': '../notes.txt', 'size': len(data), 'checksum': checksum}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['chunk_size'], 4)
+        return response.json()['id']
+
+    def test_chunks_resume_and_finalize(self):
+        data = b'hello chunked world'
+        session_id = self.open_session(data, hashlib.sha256(data).hexdigest())
+        self.assertEqual(UploadSession.objects.get(pk=session_id).filename, 'notes.txt')
+
+        self.assertEqual(self.put_chunk(session_id, 0, data[:4]).status_code, 200)
+        response = self.put_chunk(session_id, 0, data[:4])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '4')
+        self.assertEqual(self.put_chunk(session_id, 4, data[4:12]).status_code, 413)
+        self.assertEqual(self.client.post(f'/upload-sessions/{session_id}/finalize/').status_code, 409)
+
+        for offset in range(4, len(data), 4):
+            self.assertEqual(self.put_chunk(session_id, offset, data[offset:offset + 4]).status_code, 200)
+        self.assertEqual(self.client.get(f'/upload-sessions/{session_id}/')['Upload-Offset'], str(len(data)))
+
+        self.assertEqual(self.client.post(f'/upload-sessions/{session_id}/finalize/').status_code, 202)
+        run_pending()
+
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual(session.status, 'done')
+        with session.file_upload.file.open('rb') as stored:
+            self.assertEqual(stored.read(), data)
+        self.assertEqual(FileUpload.objects.count(), 1)
+        self.assertFalse(os.path.exists(part_path(session_id)))
+
+    def test_chunk_in_progress_blocks_others_until_it_times_out(self):
+        data = b'resume me'
+        session_id = self.open_session(data, '')
+        # another request claimed offset 0 and is still receiving its bytes
+        UploadSession.objects.filter(pk=session_id).update(chunk_started_at=timezone.now())
+        response = self.put_chunk(session_id, 0, data[:4])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['detail'], 'Another chunk is being written.')
+
+        # ... until it has been silent for UPLOAD_CHUNK_TIMEOUT
+        UploadSession.objects.filter(pk=session_id).update(chunk_started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.put_chunk(session_id, 0, data[:4]).status_code, 200)
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual((session.received, session.chunk_started_at), (4, None))
+
+    def test_empty_unknown_and_stuck_sessions(self):
+        response = self.client.post('/upload-sessions/', {'filename': 'empty.txt', 'size': 0}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.put_chunk('not-a-uuid', 0, b'abc').status_code, 404)
+
+        session_id = self.open_session(b'abc', '')
+        self.put_chunk(session_id, 0, b'abc')
+        self.client.post(f'/upload-sessions/{session_id}/finalize/')
+        UploadSession.objects.filter(pk=session_id).update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('clean_upload_sessions', stdout=StringIO())
+        self.assertFalse(UploadSession.objects.filter(pk=session_id).exists())
+        self.assertFalse(os.path.exists(part_path(session_id)))
+
+        # a part file that vanished fails the session instead of retrying forever
+        session_id = self.open_session(b'abc', '')
+        self.put_chunk(session_id, 0, b'abc')
+        self.client.post(f'/upload-sessions/{session_id}/finalize/')
+        os.remove(part_path(session_id))
+        run_pending()
+        self.assertEqual(UploadSession.objects.get(pk=session_id).status, 'failed')
+
+    def test_checksum_mismatch_fails_session(self):
+        data = b'abc'
+        session_id = self.open_session(data, hashlib.sha256(b'other').hexdigest())
+        self.put_chunk(session_id, 0, data)
+        self.client.post(f'/upload-sessions/{session_id}/finalize/')
+        run_pending()
+
+        session = UploadSession.objects.get(pk=session_id)
+        self.assertEqual(session.status, 'failed')
+        self.assertIsNone(session.file_upload)
+        self.assertFalse(os.path.exists(part_path(session_id)))
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=[320, 640, 1280])
+class CourseImageVariantTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_variants_are_built_in_background(self):
+        photo = io.BytesIO()
+        Image.new('RGB', (1600, 900), 'teal').save(photo, 'PNG')
+        course = Course.objects.create(course_id='IMG101', course_title='Images', short_description='', image=ContentFile(photo.getvalue(), name='photo.png'))
+        self.assertEqual(CourseSerializer(course).data['image_variants'], {})
+        version = Course.objects.get(pk='IMG101').content_version
+
+        run_pending()
+        course = Course.objects.get(pk='IMG101')
+        self.assertGreater(course.content_version, version)
+        self.assertEqual([width for width, name in course.image_variants['webp']], [320, 640, 1280])
+        variants = course.image_variants
+        srcset = CourseSerializer(course).data['image_variants']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertTrue(srcset['jpeg'].endswith(' 1280w'))
+
+        url = srcset['webp'].split(', ')[1].split(' ')[0]
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        variant = Image.open(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual((variant.format, variant.size), ('WEBP', (640, 360)))
+
+        # saving without a new image does not resize again
+        course.course_title = 'Renamed'
+        course.save()
+        self.assertEqual(run_pending(), 0)
+
+        # a new image drops the old variants until its own are built
+        other = io.BytesIO()
+        Image.new('RGB', (1600, 900), 'navy').save(other, 'PNG')
+        course.image = ContentFile(other.getvalue(), name='other.png')
+        course.save()
+        self.assertEqual(Course.objects.get(pk='IMG101').image_variants, {})
+        self.assertEqual(CourseSerializer(course).data['image_variants'], {})
+        old_variants = [name for sizes in (variants['webp'], variants['jpeg']) for _, name in sizes]
+        run_pending()
+        course = Course.objects.get(pk='IMG101')
+        self.assertEqual(course.image_variants['source'], course.image.name)
+
+        # the previous image's variants are garbage, the current ones are kept
+        collected = collect_garbage(grace=0)
+        self.assertEqual(sorted(blob.file.name for blob in collected), sorted(old_variants))
+        self.assertEqual(MediaBlob.objects.count(), 6)
+
+        course.image = 'default.png'
+        course.save()
+        self.assertEqual(Course.objects.get(pk='IMG101').image_variants, {})
+        self.assertEqual(run_pending(), 0)
+
+    def test_srcset_ignores_variants_of_another_image(self):
+        course = Course(image='images/b.png', image_variants={'source': 'images/a.png', 'webp': [[320, 'blobs/aa/a.webp']]})
+        self.assertEqual(CourseSerializer(course).data['image_variants'], {})
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from .serializer import CourseSerializer
+
+# everything CourseSerializer walks, fetched with one query per level
+COURSE_TREE_PREFETCH = [
+    'specializations',
+    'syllabus__lessons__learning_objectives',
+    'syllabus__lessons__skills_to_acquire',
+    'syllabus__lessons__topics__learning_objectives',
+    'syllabus__lessons__topics__skills_to_acquire',
+    'syllabus__lessons__topics__subtopics__pages__content_blocks',
+]
+
+
+def load_course_tree(course):
+    """Attach the whole syllabus tree to ``course`` in a fixed number of queries (one per level)."""
+    prefetch_related_objects([course], *COURSE_TREE_PREFETCH)
+    return course
+
+
+def course_cache_key(course, request):
+    # file and image urls are absolute to the host that asked, so it is part of the key
+    return f"course-tree:{course.pk}:{course.content_version}:{request.build_absolute_uri('/')}"
+
+
+def render_course(course, request):
+    """
+    Serialized CourseSerializer data for ``course``, cached until its content_version changes.
+    """
+    key = course_cache_key(course, request)
+    data = cache.get(key)
+    if data is None:
+        tree = load_course_tree(course)
+        data = CourseSerializer(tree, context={'request': request}).data
+        cache.set(key, data, getattr(settings, 'COURSE_TREE_CACHE_TIMEOUT', 60 * 60 * 24))
+    return data
@@ -0,0 +1,177 @@
+"""
+Chunked, resumable uploads.
+
+1. ``POST /upload-sessions/`` with ``filename``, ``size`` and optionally ``checksum``
+   (sha256 hex) and ``target`` opens a session.
+2. ``PUT /upload-sessions/<id>/chunk/`` with the raw bytes and an ``Upload-Offset``
+   header appends a chunk (at most UPLOAD_CHUNK_SIZE). The offset must equal the bytes
+   received so far; otherwise the reply is 409 with the offset to resume from, which
+   ``GET /upload-sessions/<id>/`` also returns.
+3. ``POST /upload-sessions/<id>/finalize/`` once everything is received queues the
+   'upload.finalize' job: it checks the checksum and hands the file to the media blob
+   storage (a FileUpload for target ``file_upload``), then fills in ``url``.
+
+Chunks are appended to a file under UPLOAD_TEMP_DIR straight from the request stream,
+so memory per upload stays at one read block whatever the file size.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from Jobs.queue import enqueue
+from Media.storage import pinned_blob_storage
+from .models import FileUpload, UploadSession
+
+BLOCK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, detail, status, received=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.received = received
+
+
+def part_path(session_id):
+    return os.path.join(settings.UPLOAD_TEMP_DIR, f'{session_id}.part')
+
+
+def _claim(session_id, offset, length):
+    """Check ``offset`` against the session and mark a chunk as being written, in one short transaction."""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session_id)
+        if session.status != 'uploading':
+            raise UploadError(f"Upload is {session.status}.", 409, session.received)
+        if offset != session.received:
+            raise UploadError("Offset does not match the bytes received.", 409, session.received)
+        if session.received + length > session.size:
+            raise UploadError("Chunk goes past the declared size.", 400, session.received)
+        stale = timezone.now() - timedelta(seconds=settings.UPLOAD_CHUNK_TIMEOUT)
+        if session.chunk_started_at and session.chunk_started_at > stale:
+            raise UploadError("Another chunk is being written.", 409, session.received)
+        session.chunk_started_at = timezone.now()
+        session.save(update_fields=['chunk_started_at', 'updated_at'])
+    return session.chunk_started_at
+
+
+def _write(session_id, offset, stream, length):
+    os.makedirs(settings.UPLOAD_TEMP_DIR, exist_ok=True)
+    path = part_path(session_id)
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as part:
+        part.seek(offset)
+        written = 0
+        while written < length:
+            block = stream.read(min(BLOCK_SIZE, length - written))
+            if not block:
+                break
+            part.write(block)
+            written += len(block)
+        part.truncate()
+    return written
+
+
+def append_chunk(session_id, offset, stream, length):
+    """
+    Write ``length`` bytes from ``stream`` at ``offset`` of the session's part file.
+
+    The session row is only locked to claim the chunk (checking the offset) and then to
+    advance ``received``, not while the bytes arrive: a slow client holds no database
+    connection. A second chunk is refused while one is claimed, unless the claim is
+    older than UPLOAD_CHUNK_TIMEOUT. Bytes past ``received`` left by a failed earlier
+    write are overwritten.
+    """
+    if length > settings.UPLOAD_CHUNK_SIZE:
+        raise UploadError(f"Chunks can be at most {settings.UPLOAD_CHUNK_SIZE} bytes.", 413)
+
+    claim = _claim(session_id, offset, length)
+    written = None
+    try:
+        written = _write(session_id, offset, stream, length)
+    finally:
+        with transaction.atomic():
+            session = UploadSession.objects.select_for_update().get(pk=session_id)
+            if session.chunk_started_at != claim:
+                # timed out and taken over; that write decides what the part file holds
+                raise UploadError("Chunk write timed out.", 409, session.received)
+            session.chunk_started_at = None
+            if written == length:
+                session.received += written
+            session.save(update_fields=['received', 'chunk_started_at', 'updated_at'])
+
+    if written != length:
+        raise UploadError("Chunk was shorter than its Content-Length.", 400, session.received)
+    return session
+
+
+def start_finalize(session):
+    if session.status != 'uploading':
+        raise UploadError(f"Upload is {session.status}.", 409, session.received)
+    if session.received != session.size:
+        raise UploadError("Upload is not complete.", 409, session.received)
+    with transaction.atomic():
+        updated = UploadSession.objects.filter(pk=session.pk, status='uploading').update(status='processing', updated_at=timezone.now())
+        if not updated:
+            raise UploadError("Upload is already being finalized.", 409, session.received)
+        return enqueue('upload.finalize', session_id=str(session.pk))
+
+
+def sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finalize(session_id):
+    """Verify the assembled file and move it to storage (the 'upload.finalize' job)."""
+    session = UploadSession.objects.get(pk=session_id)
+    if session.status != 'processing':
+        return {'status': session.status}
+    path = part_path(session.pk)
+
+    if not os.path.exists(path):
+        # retrying can't bring it back (the temp dir was cleaned or is not shared with this worker)
+        UploadSession.objects.filter(pk=session.pk).update(status='failed', error='Uploaded data is missing.', updated_at=timezone.now())
+        return {'status': 'failed'}
+    if session.checksum and sha256_of(path) != session.checksum.lower():
+        os.remove(path)
+        UploadSession.objects.filter(pk=session.pk).update(status='failed', error='Checksum mismatch.', updated_at=timezone.now())
+        return {'status': 'failed'}
+
+    # storage errors propagate so the job is retried; the part file stays until it succeeds
+    with open(path, 'rb') as part:
+        if session.target == 'file_upload':
+            upload = FileUpload.objects.create(file=File(part, name=session.filename))
+            name, url = upload.file.name, upload.file.url
+        else:
+            upload = None
+            name = pinned_blob_storage.save(session.filename, File(part, name=session.filename))
+            url = pinned_blob_storage.url(name)
+
+    UploadSession.objects.filter(pk=session.pk).update(status='done', file_upload=upload, url=url, error='', updated_at=timezone.now())
+    os.remove(path)
+    return {'status': 'done', 'url': url}
+
+
+def expired_sessions(ttl=None):
+    """
+    Sessions untouched for ``ttl`` seconds that will never finish: abandoned uploads,
+    failed ones, and ones stuck in 'processing' after their finalize job gave up.
+    """
+    ttl = settings.UPLOAD_SESSION_TTL if ttl is None else ttl
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    return UploadSession.objects.filter(status__in=['uploading', 'processing', 'failed'], updated_at__lt=cutoff)
+
+
+def discard(session):
+    path = part_path(session.pk)
+    if os.path.exists(path):
+        os.remove(path)
+    session.delete()
@@ -1,25 +1,32 @@
 # views.py
 from django.db.models import Exists, OuterRef, F
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.views import APIView
 from rest_framework.decorators import action, parser_classes
 from rest_framework.generics import get_object_or_404
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from User.models import StudentMastery
-from .models import Course, LearningObjective, Lesson, StudentCourseProgress, StudentLessonProgress, Syllabus, Page, FileUpload, Topic, Subtopic, ContentBlock
-from Course.serializer import CourseSerializer, LearningObjectiveSerializer, StudentCourseProgressSerializer, StudentLessonProgressSerializer, SyllabusSerializer, LessonSerializer, FileUploadSerializer, PageSerializer, SubtopicSerializer, TopicSerializer, ContentBlockSerializer
+from .models import Course, LearningObjective, Lesson, StudentCourseProgress, StudentLessonProgress, Syllabus, Page, FileUpload, Topic, Subtopic, ContentBlock, UploadSession
+from .adaptive import difficulty_tier, render_subtopic_pages
+from .bulk import BlockDiffError, apply_page_blocks
+from .conditional import conditional_content_response, content_etag, content_state
+from .tree import render_course
+from .uploads import UploadError, append_chunk, start_finalize
+from Media.storage import pinned_blob_storage
+from Course.serializer import CourseSerializer, LearningObjectiveSerializer, StudentCourseProgressSerializer, StudentLessonProgressSerializer, SyllabusSerializer, LessonSerializer, FileUploadSerializer, PageSerializer, SubtopicSerializer, TopicSerializer, ContentBlockSerializer, UploadSessionSerializer
+from django.core.exceptions import ValidationError
 from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.storage import FileSystemStorage
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
-from django.db import transaction, models
-from storages.backends.azure_storage import AzureStorage
+from django.db import transaction
 
-from openai import OpenAI
-import environ
-import os
+from backend import sse
+from backend.llm import LLMError, complete
+from backend.sse import EventStreamRenderer
 
 
 
@@ -29,16 +36,28 @@ import os
 def upload_image(request):
     if request.method == 'POST' and request.FILES['upload']:
         upload = request.FILES['upload']
-        azure_storage = AzureStorage()
-        filename = azure_storage.save(upload.name, upload)
-        uploaded_file_url = azure_storage.url(filename)
+        filename = pinned_blob_storage.save(upload.name, upload)
+        uploaded_file_url = pinned_blob_storage.url(filename)
         return JsonResponse({'url': uploaded_file_url})
     return JsonResponse({'error': 'Failed to upload file'}, status=400)
 
 class CourseViewSet(viewsets.ModelViewSet):
-    queryset = Course.objects.all()
+    queryset = Course.objects.select_related('syllabus')
     serializer_class = CourseSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        course = self.get_object()
+        etag = content_etag(request, course.content_version)
+        last_modified = int(course.content_updated_at.timestamp())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        response = Response(render_course(course, request))
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
     @action(detail=False, methods=['get'], url_path='check_id/(?P<course_id>[^/.]+)')
     def check_course_id(self, request, course_id=None):
         """
@@ -59,9 +78,16 @@ class SyllabusViewSet(viewsets.ModelViewSet):
     serializer_class = SyllabusSerializer
     @action(detail=False, methods=['get'], url_path='(?P<course_id>[^/.]+)')
     def by_course(self, request, course_id=None):
-        queryset = self.get_queryset().filter(course=course_id)
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        def render():
+            queryset = self.get_queryset().filter(course=course_id).prefetch_related(
+                'lessons__learning_objectives', 'lessons__skills_to_acquire',
+                'lessons__topics__learning_objectives', 'lessons__topics__skills_to_acquire',
+                'lessons__topics__subtopics__pages__content_blocks'
+            )
+            serializer = self.get_serializer(queryset, many=True)
+            return Response(serializer.data)
+
+        return conditional_content_response(request, {'pk': course_id}, render)
 
 class LessonViewSet(viewsets.ModelViewSet):
     queryset = Lesson.objects.all().prefetch_related('topics')
@@ -80,9 +106,12 @@ class LessonViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        return Response(serializer.data)
+        def render():
+            instance = self.get_object()
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data)
+
+        return conditional_content_response(request, {'syllabus__lessons': kwargs['pk']}, render)
 
     @action(detail=True, methods=['put'], url_path='update_lesson')
     def update_lesson(self, request, pk):
@@ -99,10 +128,13 @@ class TopicViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'], url_path='subtopics')
     def get_topic_subtopics(self, request, pk=None):
-        topic = self.get_object()
-        subtopics = topic.subtopics.all()
-        serializer = SubtopicSerializer(subtopics, many=True)
-        return Response(serializer.data)
+        def render():
+            topic = self.get_object()
+            subtopics = topic.subtopics.prefetch_related('pages__content_blocks')
+            serializer = SubtopicSerializer(subtopics, many=True)
+            return Response(serializer.data)
+
+        return conditional_content_response(request, {'syllabus__lessons__topics': pk}, render)
 
 class SubtopicViewSet(viewsets.ModelViewSet):
     queryset = Subtopic.objects.all().prefetch_related('pages')
@@ -134,39 +166,15 @@ class PageViewSet(viewsets.ModelViewSet):
         student_id = request.query_params.get('student_id', None) # optional ra ni for mastery
 
         if request.method == 'GET':
-            pages = self.queryset.filter(subtopic_id=subtopic_id)
-            objectives = LearningObjective.objects.filter(subtopic_id=subtopic_id)
-
-            if student_id:
-                try:
-                    mastery = 0.0
-                    for objective in objectives:
-                        mastery += float(StudentMastery.objects.get(student_id=student_id, learning_objective_id=objective.id).mastery_level)
-                    mastery /= objectives.count()
-                    
-                    # Pwede pani mamodify kung asa ka na sa mastery level
-                    if mastery < 50.0:
-                        difficulty_level = 'beginner'
-                    elif mastery < 80.0:
-                        difficulty_level = 'intermediate'
-                    else:
-                        difficulty_level = 'advanced'
-
-                    # Filter sa pages based sa mastery level
-                    pages = pages.prefetch_related(
-                        models.Prefetch(
-                            'content_blocks',
-                            queryset=ContentBlock.objects.filter(
-                                models.Q(difficulty=difficulty_level) | models.Q(difficulty__isnull=True)
-                            )
-                        )
-                    )
-
-                except StudentMastery.DoesNotExist:
-                    return Response({"detail": "Mastery record not found for the student."}, status=status.HTTP_404_NOT_FOUND)
-
-            serializer = self.get_serializer(pages, many=True)
-            return Response({"pages": serializer.data, "objectives": LearningObjectiveSerializer(objectives, many=True).data})
+            tier = difficulty_tier(student_id, subtopic_id) if student_id else None
+            course_filter = {'syllabus__lessons__topics__subtopics': subtopic_id}
+            state = content_state(course_filter)
+            version = state[0] if state else None
+            return conditional_content_response(
+                request, course_filter,
+                lambda: Response(render_subtopic_pages(subtopic_id, tier, version, request)),
+                variant=tier or '', state=state
+            )
         elif request.method == 'POST':
             serializer = self.get_serializer(data=request.data)
             if serializer.is_valid():
@@ -184,6 +192,26 @@ class PageViewSet(viewsets.ModelViewSet):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             return Response({"detail": "Page not found."}, status=status.HTTP_404_NOT_FOUND)
         
+    @action(detail=True, methods=['put'], url_path='blocks')
+    def blocks(self, request, pk=None):
+        """Replace all content blocks of the page in one go (blocks without block_id are created, missing ones deleted)."""
+        if not isinstance(request.data, dict):
+            return Response({"detail": "Expected an object with a 'blocks' list."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            diff = apply_page_blocks(pk, request.data.get("blocks", []))
+        except Page.DoesNotExist:
+            return Response({"detail": "Page not found."}, status=status.HTTP_404_NOT_FOUND)
+        except BlockDiffError as e:
+            return Response({"detail": e.detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        blocks = ContentBlock.objects.filter(page_id=pk).order_by('id')
+        return Response({
+            "blocks": ContentBlockSerializer(blocks, many=True, context={'request': request}).data,
+            "created": len(diff.created),
+            "updated": len(diff.updated),
+            "deleted": len(diff.deleted),
+        })
+
     @action(detail=True, methods=['get'], url_path='content_blocks')
     def content_blocks(self, request, pk=None):
         try:
@@ -207,28 +235,44 @@ class PageViewSet(viewsets.ModelViewSet):
         if not lesson_id:
             return Response({"detail": "Lesson ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        lesson_content_blocks = ContentBlock.objects.filter(lesson_id=lesson_id, label="lesson-content")
+        messages = self._summary_messages(lesson_id)
+        if messages is None:
+            return Response({"detail": "No lesson content blocks found for this lesson."}, status=status.HTTP_404_NOT_FOUND)
+
+        try:
+            summary = complete(model="gpt-3.5-turbo", messages=messages)
+        except LLMError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
 
-        if not lesson_content_blocks.exists():
-            return Response({"detail": "No content blocks found with the label 'lesson-content'."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"summary": summary}, status=status.HTTP_200_OK)
 
-        full_content = " ".join([block.content for block in lesson_content_blocks])
+    @action(detail=False, methods=['get'], url_path='summarize_lesson_content_stream', renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def summarize_lesson_content_stream(self, request):
+        """Server-sent-event version of summarize_lesson_content (``?lesson_id=``)."""
+        lesson_id = request.query_params.get("lesson_id")
+
+        if not lesson_id:
+            return Response({"detail": "Lesson ID is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        env = environ.Env(DEBUG=(bool, False))
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
-        client = OpenAI(api_key=env('OPENAI_API_KEY'))
+        messages = self._summary_messages(lesson_id)
+        if messages is None:
+            return Response({"detail": "No lesson content blocks found for this lesson."}, status=status.HTTP_404_NOT_FOUND)
 
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful summarizer for educational content. Provide a concise summary for students based on the given content, highlighting key concepts and important points."},
-                {"role": "user", "content": full_content}
-            ]
-        )
-        summary = completion.choices[0].message.content.strip()
+        return sse.relay_llm(request, messages, lambda summary: {"summary": summary})
 
-        return Response({"summary": summary}, status=status.HTTP_200_OK)
+    def _summary_messages(self, lesson_id):
+        lesson_content_blocks = ContentBlock.objects.filter(
+            page__subtopic__topic__lesson_id=lesson_id, block_type='lesson'
+        ).order_by('page__subtopic__topic__order', 'page__subtopic__order', 'page__page_number', 'id')
+
+        full_content = " ".join([block.content for block in lesson_content_blocks])
+        if not full_content:
+            return None
+
+        return [
+            {"role": "system", "content": "You are a helpful summarizer for educational content. Provide a concise summary for students based on the given content, highlighting key concepts and important points."},
+            {"role": "user", "content": full_content}
+        ]
 
 class ContentBlockViewSet(viewsets.ModelViewSet):
     queryset = ContentBlock.objects.all()
@@ -329,6 +373,53 @@ class StudentCourseProgressViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response({"error": "student_id is required"}, status=400)
 
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """Resumable chunked uploads, see Course/uploads.py for the protocol."""
+    queryset = UploadSession.objects.all()
+    serializer_class = UploadSessionSerializer
+
+    def _upload_error(self, e):
+        response = Response({"detail": e.detail, "received": e.received}, status=e.status)
+        if e.received is not None:
+            response['Upload-Offset'] = e.received
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        response['Upload-Offset'] = response.data['received']
+        return response
+
+    @action(detail=True, methods=['put'], url_path='chunk')
+    def chunk(self, request, pk=None):
+        offset = request.headers.get('Upload-Offset', request.query_params.get('offset'))
+        try:
+            offset = int(offset)
+            length = int(request.headers.get('Content-Length') or 0)
+        except (TypeError, ValueError):
+            return Response({"detail": "Upload-Offset and Content-Length headers are required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = append_chunk(pk, offset, request.stream, length) if length else self.get_object()
+        except (UploadSession.DoesNotExist, ValidationError):
+            # ValidationError: the id is not a UUID
+            return Response({"detail": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+        except UploadError as e:
+            return self._upload_error(e)
+
+        response = Response({"received": session.received, "size": session.size})
+        response['Upload-Offset'] = session.received
+        return response
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        session = self.get_object()
+        try:
+            job = start_finalize(session)
+        except UploadError as e:
+            return self._upload_error(e)
+        return Response({"id": session.pk, "status": "processing", "job": job.id}, status=status.HTTP_202_ACCEPTED)
+
+
 class UploadFileView(APIView):
     def post(self, request):
         if 'upload' not in request.FILES:
@@ -336,9 +427,8 @@ class UploadFileView(APIView):
 
         upload = request.FILES['upload']
         try:
-            fs = FileSystemStorage()  
-            filename = fs.save(upload.name, upload)
-            uploaded_file_url = fs.url(filename)  
+            filename = pinned_blob_storage.save(upload.name, upload)
+            uploaded_file_url = pinned_blob_storage.url(filename)
             return Response({'url': uploaded_file_url}, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response({'error': f'Failed to upload file: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
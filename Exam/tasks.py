@@ -0,0 +1,11 @@
+from Jobs.queue import register
+from .models import StudentExamAttempt
+from .views import StudentExamAttemptViewSet
+
+
+@register('exam.feedback')
+def generate_exam_feedback(attempt_id):
+    attempt = StudentExamAttempt.objects.get(id=attempt_id)
+    feedback = StudentExamAttemptViewSet().generate_feedback(attempt)
+    StudentExamAttempt.objects.filter(id=attempt_id).update(feedback=feedback)
+    return {'feedback': feedback}
@@ -1,5 +1,4 @@
 from collections import defaultdict
-from django.utils import timezone
 from django.shortcuts import get_object_or_404, render
 from Course.models import Lesson, StudentLessonProgress
 from rest_framework import viewsets, status
@@ -7,18 +6,22 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.request import Request
 
+from Jobs.queue import enqueue
+from Question.analytics import build_attempt_analytics
+from Question.scoring import ScoringPipeline
 from Question.models import Question, StudentAnswer, Choice
 from Question.serializer import QuestionSerializer
 from Quiz.models import StudentQuizAttempt
-from User.models import Student, StudentMastery
+from User.models import Student
 from .models import Exam, ExamQuestion, StudentExamAttempt
 from .serializer import ExamSerializer, StudentExamAttemptSerializer
-from openai import OpenAI
-import os, environ
+from backend.llm import complete
 from django.db.models import Avg, Max, Min, Count
 import random
 
 
+exam_scoring = ScoringPipeline('exam_attempt', lambda attempt: attempt.exam.student)
+
 
 class ExamViewSet(viewsets.ModelViewSet):
     queryset = Exam.objects.all()
@@ -190,20 +193,15 @@ class ExamViewSet(viewsets.ModelViewSet):
         #         total_questions=attempt.total_questions
         #     )
 
-        score = self.calculate_score(request.data['answers'], exam, attempt)
-        passed = (score / attempt.total_questions) >= exam.passing_score
-
-        attempt.score = score
-        attempt.passed = passed
-        attempt.end_time = timezone.now()
+        graded = self.calculate_score(request.data['answers'], exam, attempt)
+        score = graded.correct_count
+        passed = attempt.passed
 
-        feedback = StudentExamAttemptViewSet().generate_feedback(attempt)
-        attempt.feedback = feedback
-        attempt.save()
+        feedback_job = enqueue('exam.feedback', attempt_id=attempt.id)
         analytics = StudentExamAttemptViewSet().generate_analytics(attempt)
 
         if not passed:
-            failed_learning_objectives = self.calculate_failed_subtopics(request.data['answers'])
+            failed_learning_objectives = self.calculate_failed_subtopics(graded)
             failed_learning_objective_ids = [learning_objective.id for learning_objective in failed_learning_objectives]
             attempt.failed_lessons.set(failed_learning_objective_ids)
             StudentLessonProgress.objects.filter(
@@ -217,72 +215,18 @@ class ExamViewSet(viewsets.ModelViewSet):
             "detail": "Exam submitted successfully.",
             "score": score,
             "passed": passed,
-            "feedback": feedback,
+            "feedback": None,
+            "feedback_job": feedback_job.id,
             "analytics": analytics
         })
 
     def calculate_score(self, answers, exam, attempt):
-        correct_answers = 0
-        for answer in answers:
-            question_id = answer.get('question_id')
-            selected_choice_id = answer.get('selected_choice_id')
-            try:
-                question = Question.objects.get(id=question_id)
-                correct_choice = Choice.objects.get(question=question, is_correct=True)
-                is_correct = (selected_choice_id == correct_choice.id)
-                if is_correct:
-                    correct_answers += 1
-                StudentAnswer.objects.update_or_create(
-                    exam_attempt=attempt,
-                    question=question,
-                    selected_choice_id=selected_choice_id,
-                    is_correct=is_correct,
-                    student=exam.student
-                )
-            except Question.DoesNotExist:
-                continue
-            except Choice.DoesNotExist:
-                continue
-
-        answers = StudentAnswer.objects.filter(exam_attempt=attempt)
-
-        learning_objective_answers = {}
-        for answer in answers:
-            learning_objective = answer.question.learning_objective
-            if learning_objective not in learning_objective_answers:
-                learning_objective_answers[learning_objective] = []
-            learning_objective_answers[learning_objective].append({
-                'question': answer.question,
-                'is_correct': answer.is_correct
-            })
-
-        for learning_objective, answers in learning_objective_answers.items():
-            student_mastery, created = StudentMastery.objects.get_or_create(student=attempt.exam.student, learning_objective=learning_objective)
-            student_mastery.update_mastery(answers)
-
-        return correct_answers
-
-    def calculate_failed_subtopics(self, answers):
-        learning_objective_scores = {}
-        for answer in answers:
-            question_id = answer.get('question_id')
-            if not question_id:
-                continue
-            try:
-                question = Question.objects.get(id=question_id)
-                learning_objective = question.learning_objective
-            except Question.DoesNotExist:
-                continue
-
-            if learning_objective not in learning_objective_scores:
-                learning_objective_scores[learning_objective] = {'correct': 0, 'total': 0}
-            learning_objective_scores[learning_objective]['total'] += 1
-            if answer.get('is_correct'):
-                learning_objective_scores[learning_objective]['correct'] += 1
+        return exam_scoring.score(attempt, submitted_answers=answers, passing_score=exam.passing_score)
 
+    def calculate_failed_subtopics(self, graded):
         failed_learning_objectives = [
-            learning_objective for learning_objective, scores in learning_objective_scores.items()
-            if scores['correct'] / scores['total'] < 0.75
+            learning_objective for learning_objective, objective_answers in graded.by_objective.items()
+            if sum(answer['is_correct'] for answer in objective_answers) / len(objective_answers) < 0.75
         ]
 
         return failed_learning_objectives
@@ -574,11 +518,6 @@ class StudentExamAttemptViewSet(viewsets.ModelViewSet):
     def generate_feedback(self, attempt):
         print("Starting feedback generation")
 
-        env = environ.Env(DEBUG=(bool, False))
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
-        client = OpenAI(api_key=env('OPENAI_API_KEY'))
-
         student = attempt.exam.student
         student_name = f"{student.first_name} {student.last_name}"
         specialization_name = student.specialization.name
@@ -611,7 +550,7 @@ class StudentExamAttemptViewSet(viewsets.ModelViewSet):
         else:
             score_feedback = "Invalid score. Please check the data."
 
-        completion = client.chat.completions.create(
+        ai_feedback = complete(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are Preppy, BoardPrep's Engineering Companion and an excellent and critical engineer, tasked with providing constructive feedback on exam performances of your students. In giving feedback, you don't thank the student for sharing the details, instead you congratulate the student first for finishing the exam, then you provide your feedbacks. Be critical about your feedback expecially if the student failed the exam so that they will know more where and how to improve. After providing your feedbacks, you then put your signature at the end of your response"},
@@ -619,93 +558,12 @@ class StudentExamAttemptViewSet(viewsets.ModelViewSet):
             ]
         )
 
-        print(completion)
-
-        ai_feedback = completion.choices[0].message.content.strip()
         final_feedback = f"{ai_feedback}\n\nAdditional Performance Summary:\n{score_feedback}"
         print(f"Feedback generated: {final_feedback[:100]}...")
         return final_feedback
 
     def generate_analytics(self, attempt):
-        print("Starting analytics generation")
-
-        correct_answers = StudentAnswer.objects.filter(exam_attempt=attempt, is_correct=True)
-        wrong_answers = StudentAnswer.objects.filter(exam_attempt=attempt, is_correct=False)
-
-        total_questions = attempt.total_questions
-        score_percentage = (attempt.score / total_questions) * 100 if total_questions > 0 else 0
-        passed = score_percentage >= 75
-
-        if attempt.end_time:
-            total_time = attempt.end_time - attempt.start_time
-            total_time_seconds = total_time.total_seconds()
-        else:
-            total_time_seconds = 0  # If end_time is not set yet
-        average_time_per_question = total_time_seconds / total_questions if total_questions > 0 else 0
-
-
-        # Analyze difficulty levels
-        difficulty_analysis = {
-            "correct": {},
-            "wrong": {}
-        }
-
-        for answer in correct_answers:
-            difficulty = answer.question.difficulty
-            difficulty_analysis["correct"].setdefault(difficulty, 0)
-            difficulty_analysis["correct"][difficulty] += 1
-
-        for answer in wrong_answers:
-            difficulty = answer.question.difficulty
-            difficulty_analysis["wrong"].setdefault(difficulty, 0)
-            difficulty_analysis["wrong"][difficulty] += 1
-
-        # Analyze learning objectives
-        learning_objective_analysis = {
-            "correct": {},
-            "wrong": {}
-        }
-
-        for answer in correct_answers:
-            learning_objective_text = answer.question.learning_objective.text
-            learning_objective_analysis["correct"].setdefault(learning_objective_text, 0)
-            learning_objective_analysis["correct"][learning_objective_text] += 1
-
-        for answer in wrong_answers:
-            learning_objective_text = answer.question.learning_objective.text
-            learning_objective_analysis["wrong"].setdefault(learning_objective_text, 0)
-            learning_objective_analysis["wrong"][learning_objective_text] += 1
-
-
-        # Summary of performance trends
-        performance_trends = {
-            "strong_learning_objectives": [
-                obj for obj, count in learning_objective_analysis["correct"].items() if count >= 3
-            ],
-            "weak_learning_objectives": [
-                obj for obj, count in learning_objective_analysis["wrong"].items() if count >= 3
-            ],
-            "hardest_difficulty": max(difficulty_analysis["wrong"].items(), key=lambda x: x[1], default=None),
-            "easiest_difficulty": max(difficulty_analysis["correct"].items(), key=lambda x: x[1], default=None)
-        }
-
-        # Construct analytics object
-        analytics = {
-            "total_questions": total_questions,
-            "correct_answers": correct_answers.count(),
-            "wrong_answers": wrong_answers.count(),
-            "score_percentage": round(score_percentage, 2),
-            "difficulty_analysis": difficulty_analysis,
-            "learning_objective_analysis": learning_objective_analysis,
-            "time_spent": {
-                "total_time": total_time_seconds,
-                "average_time_per_question": round(average_time_per_question, 2)
-            },
-            "performance_trends": performance_trends
-        }
-
-        print("Analytics generated:", analytics)
-        return analytics
+        return build_attempt_analytics(attempt, 'exam_attempt')
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
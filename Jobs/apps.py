@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class JobsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'Jobs'
+
+    def ready(self):
+        # every app registers its background handlers in a tasks.py module
+        autodiscover_modules('tasks')
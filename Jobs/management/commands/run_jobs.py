@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Jobs.queue import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (AI feedback, ...). Keeps polling unless --once is given.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait between polls of an empty queue.')
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending()
+            if count:
+                self.stdout.write(f"Ran {count} job(s)")
+            if options['once']:
+                break
+            if not count:
+                time.sleep(options['sleep'])
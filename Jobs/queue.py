@@ -0,0 +1,87 @@
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+handlers = {}
+
+
+def register(name):
+    """Register ``func(**payload)`` as the handler for jobs called ``name``; its return value is stored as the job result."""
+    def decorator(func):
+        handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, max_attempts=3, **payload):
+    if name not in handlers:
+        raise KeyError(f"No job handler registered for '{name}'")
+    return Job.objects.create(name=name, payload=payload, max_attempts=max_attempts)
+
+
+def claim():
+    """
+    Lock and return the next runnable job, or None.
+
+    SKIP LOCKED lets any number of workers poll the table without blocking on each
+    other. Jobs left ``running`` for longer than JOB_LOCK_TIMEOUT (a crashed worker)
+    are picked up again.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT', 600))
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='queued', run_after__lte=now) | Q(status='running', locked_at__lt=stale))
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'locked_at', 'attempts'])
+    return job
+
+
+def run(job):
+    try:
+        handler = handlers[job.name]
+        job.result = handler(**job.payload)
+    except Exception:
+        logger.exception("Job %s failed", job)
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=30 * 2 ** job.attempts)
+        else:
+            job.status = 'failed'
+            job.finished_at = timezone.now()
+    else:
+        job.status = 'done'
+        job.error = ''
+        job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'run_after', 'finished_at'])
+    return job
+
+
+def run_pending(limit=None):
+    """Run queued jobs until none are left (or ``limit`` jobs have run); returns how many ran."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim()
+        if job is None:
+            break
+        run(job)
+        count += 1
+    return count
@@ -0,0 +1,57 @@
+from django.test import TestCase
+
+from .models import Job
+from .queue import enqueue, register, run_pending
+
+calls = []
+
+
+@register('tests.echo')
+def echo(value):
+    calls.append(value)
+    if value == 'boom':
+        raise ValueError('boom')
+    return {'value': value}
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_queued_jobs_and_stores_results(self):
+        first = enqueue('tests.echo', value='a')
+        second = enqueue('tests.echo', value='b')
+
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(calls, ['a', 'b'])
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'done')
+        self.assertEqual(first.result, {'value': 'a'})
+        self.assertEqual(Job.objects.get(pk=second.pk).attempts, 1)
+        self.assertEqual(run_pending(), 0)
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = enqueue('tests.echo', max_attempts=2, value='boom')
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('ValueError', job.error)
+
+        Job.objects.filter(pk=job.pk).update(run_after=job.created_at)
+        run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.attempts, 2)
+
+    def test_status_endpoint(self):
+        job = enqueue('tests.echo', value='c')
+        run_pending()
+        response = self.client.get(f'/jobs/{job.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'done')
+        self.assertEqual(response.json()['result'], {'value': 'c'})
+        self.assertEqual(self.client.get('/jobs/').status_code, 404)
+
+    def test_unknown_job_is_rejected(self):
+        with self.assertRaises(KeyError):
+            enqueue('tests.missing')
@@ -0,0 +1,14 @@
+from rest_framework import mixins, viewsets
+
+from .models import Job
+from .serializer import JobSerializer
+
+
+class JobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Poll one background job, e.g. the ``feedback_job`` returned when an attempt is scored.
+
+    There is deliberately no list route: job payloads and results hold other students' feedback.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
@@ -0,0 +1,92 @@
+"""
+Resized WebP/JPEG copies of uploaded images, for ``srcset``.
+
+build_variants() runs in a background job ('course.image_variants' for Course.image,
+'media.image_variants' for editor uploads) and returns what to store on the row:
+``{'source': name, 'webp': [[320, name], ...], 'jpeg': [...]}``. Variants are never
+wider than the original and are saved through the content-addressed storage, so their
+URLs are immutable too. srcset() turns that into ``{'webp': 'url 320w, url 640w', ...}``,
+or ``{}`` while the stored variants belong to another image. Course and class
+serializers expose it for Course.image; editor images, which only appear as ``<img>`` in
+rich text, are looked up by their blob URL at ``/blobs/<key>/srcset``.
+"""
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .storage import variant_storage
+
+logger = logging.getLogger(__name__)
+
+# format key -> (Pillow format, extension, save options)
+VARIANT_FORMATS = {
+    'webp': ('WEBP', '.webp', {'method': 4}),
+    'jpeg': ('JPEG', '.jpg', {'optimize': True, 'progressive': True}),
+}
+
+
+def variant_widths(width):
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    return sorted({w for w in widths if w < width} | {min(width, widths[-1])})
+
+
+def _save_variant(image, fmt):
+    pillow_format, ext, options = VARIANT_FORMATS[fmt]
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if fmt == 'jpeg' and has_alpha:
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image.convert('RGBA'), mask=image.convert('RGBA').getchannel('A'))
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, quality=settings.IMAGE_VARIANT_QUALITY, **options)
+    return variant_storage.save(f'{image.width}w{ext}', ContentFile(buffer.getvalue()))
+
+
+def build_variants(name):
+    """Resize the image stored at ``name``; anything Pillow can't read gets no variants."""
+    variants = {'source': name}
+    try:
+        with default_storage.open(name, 'rb') as source:
+            image = Image.open(source)
+            # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale straight away
+            largest = max(settings.IMAGE_VARIANT_WIDTHS)
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError) as e:
+        logger.warning("No image variants for %s: %s", name, e)
+        return variants
+
+    # largest first, each one resized from the previous
+    resized = []
+    for width in reversed(variant_widths(image.width)):
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+        resized.append(image)
+
+    for fmt in VARIANT_FORMATS:
+        variants[fmt] = [
+            [image.width, _save_variant(image, fmt)]
+            for image in reversed(resized)
+        ]
+    return variants
+
+
+def srcset(variants, source, request=None):
+    """Nothing until the variants built are those of ``source``, the image currently set."""
+    result = {}
+    if not variants or variants.get('source') != source:
+        return result
+    for fmt in VARIANT_FORMATS:
+        urls = []
+        for width, name in variants.get(fmt, []):
+            url = variant_storage.url(name)
+            urls.append(f"{request.build_absolute_uri(url) if request else url} {width}w")
+        if urls:
+            result[fmt] = ', '.join(urls)
+    return result
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from Media.refs import collect_garbage, recount
+
+
+class Command(BaseCommand):
+    help = 'Delete media blobs no file field references any more (see Media/refs.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=None, help='Keep unreferenced blobs younger than this many seconds (default MEDIA_BLOB_GC_GRACE).')
+        parser.add_argument('--recount', action='store_true', help='Rebuild every refcount from the tracked fields first.')
+        parser.add_argument('--dry-run', action='store_true', help='Only list what would be deleted.')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.stdout.write(f"Corrected {recount()} refcount(s)")
+        garbage = collect_garbage(options['grace'], dry_run=options['dry_run'])
+        freed = sum(blob.size for blob in garbage)
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(f"{verb} {len(garbage)} blob(s), {freed} bytes")
@@ -0,0 +1,23 @@
+from django.db import models
+from django.utils import timezone
+
+
+class MediaBlob(models.Model):
+    """
+    One stored file, named by the SHA-256 of its bytes (see Media/storage.py).
+
+    ``refcount`` is the number of model file fields pointing at it, kept up to date by
+    Media/refs.py. ``pinned`` blobs (rich-text editor uploads, which are only referenced
+    from HTML) are never garbage collected.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    refcount = models.IntegerField(default=0)
+    pinned = models.BooleanField(default=False)
+    variants = models.JSONField(default=dict, blank=True)  # resized copies of editor images, see Media/images.py
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)  # last time a save stored or reused it, the GC grace period starts here
+
+    def __str__(self):
+        return f"{self.file.name} ({self.refcount} refs)"
@@ -0,0 +1,152 @@
+"""
+Reference counting for MediaBlob.
+
+``track(Model, 'file')`` (called from each app's signals.py) keeps ``refcount`` in step
+with the rows pointing at a blob: +1 when a row starts using a name, -1 when it stops or
+is deleted. Writes that skip signals (bulk_update, queryset.update) can leave counts off,
+so garbage collection re-checks every candidate against the tracked fields before
+deleting anything, and ``gc_media_blobs --recount`` rebuilds the counts.
+
+Resized images are listed in JSON (``track_variants(Model, 'image_variants')``, see
+Media/images.py) instead of a file field. They have no refcount; garbage collection keeps
+any candidate a tracked variants field still lists.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .models import MediaBlob
+from .storage import is_blob
+
+tracked = defaultdict(list)  # model -> file field names
+tracked_variants = defaultdict(list)  # model -> JSON fields holding build_variants() output
+
+
+def _names(instance, fields, loaded_only=False):
+    names = {}
+    for field in fields:
+        if loaded_only and field not in instance.__dict__:
+            continue  # deferred, reading it would cost a query
+        value = instance.__dict__.get(field)
+        name = getattr(value, 'name', value)
+        if is_blob(name):
+            names[field] = name
+    return names
+
+
+def _adjust(names, delta):
+    if names:
+        MediaBlob.objects.filter(file__in=names).update(refcount=F('refcount') + delta)
+
+
+def _remember(sender, instance, **kwargs):
+    instance._media_blobs = _names(instance, tracked[sender], loaded_only=True)
+
+
+def _saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before = getattr(instance, '_media_blobs', {})
+    after = _names(instance, tracked[sender])
+    _adjust([name for field, name in after.items() if before.get(field) != name], 1)
+    _adjust([name for field, name in before.items() if after.get(field) != name], -1)
+    instance._media_blobs = after
+
+
+def _deleted(sender, instance, **kwargs):
+    _adjust(list(getattr(instance, '_media_blobs', {}).values()), -1)
+
+
+def track(model, *fields):
+    tracked[model].extend(fields)
+    uid = f'media-refs-{model._meta.label}'
+    post_init.connect(_remember, sender=model, dispatch_uid=uid)
+    post_save.connect(_saved, sender=model, dispatch_uid=uid)
+    post_delete.connect(_deleted, sender=model, dispatch_uid=uid)
+
+
+def track_variants(model, *fields):
+    tracked_variants[model].extend(fields)
+
+
+def variant_references(names):
+    """The blob names among ``names`` that a tracked variants field lists."""
+    names, used = set(names), set()
+    if not names:
+        return used
+    for model, fields in tracked_variants.items():
+        for field in fields:
+            for variants in model._base_manager.exclude(**{field: {}}).values_list(field, flat=True).iterator():
+                for sizes in variants.values():
+                    if isinstance(sizes, list):
+                        used.update(name for _, name in sizes if name in names)
+    return used
+
+
+def references(names=None):
+    """Count how many tracked rows use each blob name (only ``names`` when given)."""
+    counts = Counter()
+    for model, fields in tracked.items():
+        for field in fields:
+            rows = model._base_manager.filter(**{f'{field}__startswith': 'blobs/'})
+            if names is not None:
+                rows = rows.filter(**{f'{field}__in': names})
+            counts.update(rows.values_list(field, flat=True))
+    return counts
+
+
+def recount():
+    counts = references()
+    blobs = list(MediaBlob.objects.only('sha256', 'file', 'refcount'))
+    changed = [blob for blob in blobs if blob.refcount != counts[blob.file.name]]
+    for blob in changed:
+        blob.refcount = counts[blob.file.name]
+    MediaBlob.objects.bulk_update(changed, ['refcount'], batch_size=500)
+    return len(changed)
+
+
+def collect_garbage(grace=None, dry_run=False):
+    """
+    Delete unpinned blobs nothing points at and nothing has saved for ``grace`` seconds.
+
+    The grace period covers a file saved (or reused) by an upload whose row is not
+    committed yet; a reuse after the blob was selected keeps it too.
+    Returns the deleted (or, with ``dry_run``, deletable) blobs.
+    """
+    grace = settings.MEDIA_BLOB_GC_GRACE if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    candidates = list(MediaBlob.objects.filter(refcount__lte=0, pinned=False, last_used_at__lt=cutoff))
+    still_used = references([blob.file.name for blob in candidates])
+    variants = variant_references([blob.file.name for blob in candidates])
+
+    garbage = []
+    for blob in candidates:
+        if still_used[blob.file.name]:
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=still_used[blob.file.name])
+        elif blob.file.name not in variants:
+            garbage.append(blob)
+    if dry_run:
+        return garbage
+
+    deleted = []
+    for blob in garbage:
+        # An upload may have reused the blob since it was selected: the row is only deleted
+        # if it is still unused, and the file only once the row is gone. Until this commits,
+        # a concurrent save of the same bytes waits on the deleted row and then stores the
+        # file again (ContentAddressedStorage._save).
+        with transaction.atomic():
+            removed, _ = MediaBlob.objects.filter(
+                pk=blob.pk, refcount__lte=0, pinned=False, last_used_at__lt=cutoff
+            ).delete()
+            if removed:
+                blob.file.storage.delete(blob.file.name)
+                deleted.append(blob)
+    return deleted
+
+
+track_variants(MediaBlob, 'variants')
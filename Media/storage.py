@@ -0,0 +1,136 @@
+"""
+Content-addressed storage for uploaded media.
+
+A file saved through ``blob_storage`` is stored once under ``blobs/<aa>/<sha256><ext>``
+on the default storage, whatever name it was uploaded with: saving the same bytes again
+(the same diagram on 40 pages) just returns the existing name. Because a name never
+changes content, its URL can be cached forever; ``url()`` points at the serve_blob view,
+which sends ``Cache-Control: immutable``, or straight at the storage URL when the storage
+serves files itself (Azure, see AZURE_CACHE_CONTROL in backend/deployment.py).
+
+Deleting through the storage is a no-op for blobs: other rows may share them. Unused
+blobs are removed by ``manage.py gc_media_blobs`` (Media/refs.py).
+"""
+import hashlib
+import os
+
+from django.core.files.storage import Storage, default_storage
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+from backend.downloads import download_mode, storage_url
+from Jobs.queue import enqueue
+from .models import MediaBlob
+
+BLOB_PREFIX = 'blobs/'
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff'}
+
+
+def blob_name(digest, ext=''):
+    return f'{BLOB_PREFIX}{digest[:2]}/{digest}{ext}'
+
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(BLOB_PREFIX)
+
+
+def digest_of(content):
+    digest = hashlib.sha256()
+    size = 0
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest(), size
+
+
+@deconstructible
+class ContentAddressedStorage(Storage):
+    pinned = False
+    image_variants = False  # queue resized copies of new images, see Media/images.py
+
+    @property
+    def backend(self):
+        return default_storage
+
+    def get_available_name(self, name, max_length=None):
+        # the real name is only known once the content is hashed in _save
+        return name
+
+    def _save(self, name, content):
+        digest, size = digest_of(content)
+        # Reusing restarts the GC grace period: the row that will point at it may not be
+        # committed yet. No row updated means it does not exist or was just collected.
+        changes = {'last_used_at': timezone.now()}
+        if self.pinned:
+            changes['pinned'] = True
+        if MediaBlob.objects.filter(pk=digest).update(**changes):
+            blob = MediaBlob.objects.get(pk=digest)
+            if self.image_variants and not blob.variants and is_image(blob.file.name):
+                enqueue('media.image_variants', sha256=digest)
+            return blob.file.name
+
+        ext = os.path.splitext(name)[1].lower()[:16]
+        stored = blob_name(digest, ext)
+        try:
+            with transaction.atomic():
+                blob = MediaBlob.objects.create(sha256=digest, file=stored, size=size, pinned=self.pinned)
+                # after the insert, so a file being removed by collect_garbage is stored again
+                if not self.backend.exists(stored):
+                    stored = self.backend.save(stored, content)
+        except IntegrityError:
+            # saved concurrently by another request, same bytes
+            blob = MediaBlob.objects.get(pk=digest)
+        else:
+            if self.image_variants and is_image(stored):
+                enqueue('media.image_variants', sha256=digest)
+        return blob.file.name
+
+    def _open(self, name, mode='rb'):
+        return self.backend.open(name, mode)
+
+    def delete(self, name):
+        if not is_blob(name):
+            self.backend.delete(name)
+
+    def exists(self, name):
+        return self.backend.exists(name)
+
+    def size(self, name):
+        return self.backend.size(name)
+
+    def path(self, name):
+        return self.backend.path(name)
+
+    def listdir(self, path):
+        return self.backend.listdir(path)
+
+    def get_modified_time(self, name):
+        return self.backend.get_modified_time(name)
+
+    def url(self, name, parameters=None):
+        if not is_blob(name) or download_mode(self.backend) == 'redirect':
+            return storage_url(self.backend, name, parameters)
+        return reverse('media-blob', kwargs={'key': os.path.basename(name)})
+
+
+@deconstructible
+class PinnedBlobStorage(ContentAddressedStorage):
+    """For files referenced from rich text (CKEditor), which no field tracks."""
+    pinned = True
+    image_variants = True
+
+
+blob_storage = ContentAddressedStorage()
+pinned_blob_storage = PinnedBlobStorage()
+# resized images, referenced from JSON fields (Media.refs.track_variants) rather than a file field
+variant_storage = ContentAddressedStorage()
@@ -0,0 +1,13 @@
+from Jobs.queue import register
+from .images import build_variants
+from .models import MediaBlob
+
+
+@register('media.image_variants')
+def build_blob_variants(sha256):
+    blob = MediaBlob.objects.filter(pk=sha256).first()
+    if blob is None or blob.variants:
+        return None
+    variants = build_variants(blob.file.name)
+    MediaBlob.objects.filter(pk=sha256).update(variants=variants)
+    return {fmt: len(sizes) for fmt, sizes in variants.items() if fmt != 'source'}
@@ -0,0 +1,166 @@
+import io
+import os
+from datetime import timedelta
+from io import StringIO
+import shutil
+import tempfile
+from unittest import mock
+
+from urllib.parse import urlencode
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from Class.models import Attachment
+from Course.models import FileUpload
+from Jobs.queue import run_pending
+from User.models import User
+from .models import MediaBlob
+from .refs import collect_garbage, references
+from .storage import ContentAddressedStorage, pinned_blob_storage
+
+
+class SignedStorage(FileSystemStorage):
+    """Takes SAS-style ``parameters`` like AzureStorage.url does."""
+
+    def url(self, name, parameters=None):
+        return super().url(name) + '?' + urlencode(parameters or {})
+
+
+class MediaBlobTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.content = b'%PDF-1.4 the same diagram everywhere'
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, name='diagram.pdf', content=None):
+        return FileUpload.objects.create(file=ContentFile(content or self.content, name=name))
+
+    def test_identical_uploads_share_one_blob(self):
+        first, second = self.upload('a.pdf'), self.upload('b.pdf')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('blobs/'))
+
+        blob = MediaBlob.objects.get()
+        self.assertEqual((blob.refcount, blob.size), (2, len(self.content)))
+        stored = os.listdir(os.path.dirname(blob.file.path))
+        self.assertEqual(stored, [os.path.basename(blob.file.name)])
+
+        response = self.client.get(first.file.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_unreferenced_blobs_are_collected(self):
+        first, second = self.upload(), self.upload()
+        blob = MediaBlob.objects.get()
+        first.delete()
+        self.assertEqual(collect_garbage(grace=0), [])
+
+        other = self.upload(content=b'replacement')
+        second.file = other.file.name
+        second.save()
+        self.assertEqual(MediaBlob.objects.get(pk=blob.pk).refcount, 0)
+        self.assertEqual(MediaBlob.objects.get(file=other.file.name).refcount, 2)
+
+        # the grace period protects files whose rows are not saved yet
+        self.assertEqual(collect_garbage(), [])
+        call_command('gc_media_blobs', '--grace=0', stdout=StringIO())
+        self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(os.path.exists(blob.file.path))
+
+    def test_reusing_a_blob_restarts_the_grace_period(self):
+        upload = self.upload()
+        upload.delete()
+        MediaBlob.objects.update(created_at=timezone.now() - timedelta(days=7), last_used_at=timezone.now() - timedelta(days=7))
+
+        # saved again, but the row pointing at it is not written yet
+        name = FileUpload._meta.get_field('file').storage.save('again.pdf', ContentFile(self.content))
+        self.assertEqual(collect_garbage(grace=3600), [])
+        self.assertTrue(os.path.exists(MediaBlob.objects.get(file=name).file.path))
+
+    def test_blobs_reused_during_collection_are_kept(self):
+        upload = self.upload()
+        upload.delete()
+        MediaBlob.objects.update(last_used_at=timezone.now() - timedelta(days=7))
+        storage = FileUpload._meta.get_field('file').storage
+
+        def reuse_then_check(names):
+            # an upload of the same bytes lands after the candidates were selected
+            storage.save('again.pdf', ContentFile(self.content))
+            return references(names)
+
+        with mock.patch('Media.refs.references', side_effect=reuse_then_check):
+            self.assertEqual(collect_garbage(grace=3600), [])
+        blob = MediaBlob.objects.get()
+        self.assertTrue(os.path.exists(blob.file.path))
+
+    def test_collected_blobs_are_stored_again_when_reuploaded(self):
+        upload = self.upload()
+        upload.delete()
+        blob = MediaBlob.objects.get()
+        self.assertEqual(collect_garbage(grace=0), [blob])
+        self.assertFalse(os.path.exists(blob.file.path))
+
+        again = self.upload()
+        self.assertEqual(again.file.name, blob.file.name)
+        self.assertTrue(os.path.exists(blob.file.path))
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+
+    def test_gc_rechecks_references_and_keeps_pinned(self):
+        upload = self.upload()
+        FileUpload.objects.filter(pk=upload.pk).update(file='old/elsewhere.pdf')  # no signals
+        FileUpload.objects.filter(pk=upload.pk).update(file=upload.file.name)
+        MediaBlob.objects.update(refcount=0)
+        pinned = pinned_blob_storage.save('editor.png', ContentFile(b'png bytes'))
+
+        self.assertEqual(collect_garbage(grace=0), [])
+        self.assertEqual(MediaBlob.objects.get(file=upload.file.name).refcount, 1)
+        self.assertTrue(MediaBlob.objects.get(file=pinned).pinned)
+
+    def test_attachment_downloads_keep_their_name(self):
+        user = User.objects.create(user_name='blob', password='x', first_name='B', last_name='L', email='b@l.com')
+        attachment = Attachment.objects.create(user=user, file=ContentFile(self.content, name='Week 1 notes.pdf'))
+        self.assertEqual(attachment.filename, 'Week 1 notes.pdf')
+        response = self.client.get(f'/attachments/{attachment.pk}/download/')
+        self.assertIn('Week 1 notes.pdf', response['Content-Disposition'])
+
+        with override_settings(FILE_DOWNLOAD_MODE='redirect'), \
+                mock.patch.object(ContentAddressedStorage, 'backend', SignedStorage(location=self.media_root)):
+            response = self.client.get(f'/attachments/{attachment.pk}/download/')
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(attachment.file.name, response['Location'])
+        self.assertIn(urlencode({'content_disposition': 'attachment; filename="Week 1 notes.pdf"'}), response['Location'])
+
+    @override_settings(IMAGE_VARIANT_WIDTHS=[320, 640, 1280])
+    def test_editor_images_get_variants(self):
+        logo = io.BytesIO()
+        Image.new('RGBA', (500, 200), (255, 0, 0, 128)).save(logo, 'PNG')
+        name = pinned_blob_storage.save('logo.png', ContentFile(logo.getvalue()))
+        srcset_url = pinned_blob_storage.url(name) + '/srcset'
+        self.assertEqual(self.client.get(srcset_url).json(), {})
+        self.assertEqual(run_pending(), 1)
+
+        variants = MediaBlob.objects.get(file=name).variants
+        self.assertEqual([width for width, _ in variants['webp']], [320, 500])
+        with pinned_blob_storage.open(variants['jpeg'][0][1]) as jpeg:
+            self.assertEqual(Image.open(jpeg).mode, 'RGB')
+        # the variants themselves are not resized again
+        self.assertEqual(run_pending(), 0)
+        # listed in MediaBlob.variants, so not garbage although nothing counts them
+        self.assertEqual(collect_garbage(grace=0), [])
+
+        response = self.client.get(srcset_url)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        webp = response.json()['webp'].split(', ')
+        self.assertEqual([entry.rsplit(' ', 1)[1] for entry in webp], ['320w', '500w'])
+        self.assertTrue(webp[0].startswith('http://testserver/blobs/'))
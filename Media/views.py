@@ -0,0 +1,29 @@
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from backend.downloads import serve_file
+from .images import srcset
+from .models import MediaBlob
+
+# a blob's name is its content hash, so the bytes behind a URL never change
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+@require_safe
+def serve_blob(request, key):
+    blob = get_object_or_404(MediaBlob, sha256=key.split('.', 1)[0])
+    return serve_file(request, blob.file, as_attachment=False, cache_control=IMMUTABLE_CACHE_CONTROL)
+
+
+@require_safe
+def blob_srcset(request, key):
+    """
+    ``{'webp': 'url 320w, ...', 'jpeg': ...}`` for an editor image, so pages can turn the
+    ``<img src>`` of rich-text content into a responsive one; ``{}`` until its variants exist.
+    """
+    blob = get_object_or_404(MediaBlob, sha256=key.split('.', 1)[0])
+    response = JsonResponse(srcset(blob.variants, blob.file.name, request))
+    # the variants of given bytes never change once built
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if blob.variants else 'no-cache'
+    return response
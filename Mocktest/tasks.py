@@ -0,0 +1,11 @@
+from Jobs.queue import register
+from .models import StudentMocktestAttempt
+from .views import StudentMocktestAttemptViewSet
+
+
+@register('mocktest.feedback')
+def generate_mocktest_feedback(attempt_id):
+    attempt = StudentMocktestAttempt.objects.get(mocktestID=attempt_id)
+    feedback = StudentMocktestAttemptViewSet().generate_feedback(attempt)
+    StudentMocktestAttempt.objects.filter(mocktestID=attempt_id).update(feedback=feedback)
+    return {'feedback': feedback}
@@ -27,6 +27,7 @@ class StudentPreassessmentAttempt(models.Model):
     start_time = models.DateTimeField(default=timezone.now)
     end_time = models.DateTimeField(null=True, blank=True)
     total_questions = models.IntegerField()
+    feedback = models.TextField(null=True, blank=True)
 
     class Meta:
         unique_together = ['preassessment', 'student']
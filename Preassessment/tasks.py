@@ -0,0 +1,11 @@
+from Jobs.queue import register
+from .models import StudentPreassessmentAttempt
+from .views import StudentPreassessmentAttemptViewSet
+
+
+@register('preassessment.feedback')
+def generate_preassessment_feedback(attempt_id):
+    attempt = StudentPreassessmentAttempt.objects.get(preassessmentID=attempt_id)
+    feedback = StudentPreassessmentAttemptViewSet().generate_feedback(attempt)
+    StudentPreassessmentAttempt.objects.filter(preassessmentID=attempt_id).update(feedback=feedback)
+    return {'feedback': feedback}
@@ -6,12 +6,16 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from Question.models import StudentAnswer, Choice
-from User.models import StudentMastery
+from Jobs.queue import enqueue
+from Question.analytics import build_attempt_analytics
+from Question.scoring import ScoringPipeline
 from Course.models import Course
 from .models import Preassessment, StudentPreassessmentAttempt
 from .serializer import PreassessmentSerializer, StudentPreassessmentAttemptSerializer
-import os, environ
-from openai import OpenAI
+from backend.llm import complete
+
+
+preassessment_scoring = ScoringPipeline('preassessment_attempt', lambda attempt: attempt.student)
 
 
 # Create your views here.
@@ -65,40 +69,19 @@ class StudentPreassessmentAttemptViewSet(viewsets.ModelViewSet):
         except StudentPreassessmentAttempt.DoesNotExist:
             return Response({"detail": "Preassessment attempt not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        answers = StudentAnswer.objects.filter(preassessment_attempt=attempt)
-        correct_answers_count = answers.filter(is_correct=True).count()
-
-        subtopic_answers = {}
-        for answer in answers:
-            subtopic = answer.question.learning_objective
-            if subtopic not in subtopic_answers:
-                subtopic_answers[subtopic] = []
-            subtopic_answers[subtopic].append({
-                'question': answer.question,
-                'is_correct': answer.is_correct
-            })
-
-        for subtopic, answers in subtopic_answers.items():
-            student_mastery, created = StudentMastery.objects.get_or_create(student=attempt.student, learning_objective=subtopic)
-            student_mastery.update_mastery(answers)
-
-        attempt.score = correct_answers_count
-        attempt.end_time = timezone.now()
-
-        attempt.save()
+        preassessment_scoring.score(attempt)
 
         time_taken = attempt.end_time - attempt.start_time
 
-        feedback = StudentPreassessmentAttemptViewSet().generate_feedback(attempt)
-        attempt.feedback = feedback
-        attempt.save()
+        feedback_job = enqueue('preassessment.feedback', attempt_id=attempt.preassessmentID)
         analytics = StudentPreassessmentAttemptViewSet().generate_analytics(attempt)
 
         return Response({
             'score': attempt.score,
             'total_questions': attempt.total_questions,
             'time_taken': str(time_taken),
-            'feedback': feedback,
+            'feedback': None,
+            'feedback_job': feedback_job.id,
             'analytics': analytics
         }, status=status.HTTP_200_OK)
 
@@ -160,11 +143,6 @@ class StudentPreassessmentAttemptViewSet(viewsets.ModelViewSet):
     def generate_feedback(self, attempt):
         print("Starting feedback generation")
 
-        env = environ.Env(DEBUG=(bool, False))
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
-        client = OpenAI(api_key=env('OPENAI_API_KEY'))
-
         student = attempt.student
         student_name = f"{student.first_name} {student.last_name}"
         specialization_name = "Computer Science"  # Placeholder for specialization name
@@ -199,7 +177,7 @@ class StudentPreassessmentAttemptViewSet(viewsets.ModelViewSet):
         else:
             score_feedback = "Invalid score. Please check the data."
 
-        completion = client.chat.completions.create(
+        ai_feedback = complete(
             model="gpt-3.5-turbo",
             messages=[
                 {"role": "system", "content": "You are Preppy, BoardPrep's Engineering Companion and an excellent and critical engineer, tasked with providing constructive feedback on preassessment performances of your students. In giving feedback, you don't thank the student for sharing the details, instead you congratulate the student first for finishing the preassessment, then you provide your feedbacks. Be critical about your feedback expecially if the student failed the preassessment so that they will know more where and how to improve. After providing your feedbacks, you then put your signature at the end of your response"},
@@ -207,93 +185,12 @@ class StudentPreassessmentAttemptViewSet(viewsets.ModelViewSet):
             ]
         )
 
-        print(completion)
-
-        ai_feedback = completion.choices[0].message.content.strip()
         final_feedback = f"{ai_feedback}\n\nAdditional Performance Summary:\n{score_feedback}"
         print(f"Feedback generated: {final_feedback[:100]}...")
         return final_feedback
 
     def generate_analytics(self, attempt):
-        print("Starting analytics generation")
-
-        correct_answers = StudentAnswer.objects.filter(preassessment_attempt=attempt, is_correct=True)
-        wrong_answers = StudentAnswer.objects.filter(preassessment_attempt=attempt, is_correct=False)
-
-        total_questions = attempt.total_questions
-        score_percentage = (attempt.score / total_questions) * 100 if total_questions > 0 else 0
-        passed = score_percentage >= 75
-
-        if attempt.end_time:
-            total_time = attempt.end_time - attempt.start_time
-            total_time_seconds = total_time.total_seconds()
-        else:
-            total_time_seconds = 0  # If end_time is not set yet
-        average_time_per_question = total_time_seconds / total_questions if total_questions > 0 else 0
-
-
-        # Analyze difficulty levels
-        difficulty_analysis = {
-            "correct": {},
-            "wrong": {}
-        }
-
-        for answer in correct_answers:
-            difficulty = answer.question.difficulty
-            difficulty_analysis["correct"].setdefault(difficulty, 0)
-            difficulty_analysis["correct"][difficulty] += 1
-
-        for answer in wrong_answers:
-            difficulty = answer.question.difficulty
-            difficulty_analysis["wrong"].setdefault(difficulty, 0)
-            difficulty_analysis["wrong"][difficulty] += 1
-
-        # Analyze learning objectives
-        learning_objective_analysis = {
-            "correct": {},
-            "wrong": {}
-        }
-
-        for answer in correct_answers:
-            learning_objective_text = answer.question.learning_objective.text
-            learning_objective_analysis["correct"].setdefault(learning_objective_text, 0)
-            learning_objective_analysis["correct"][learning_objective_text] += 1
-
-        for answer in wrong_answers:
-            learning_objective_text = answer.question.learning_objective.text
-            learning_objective_analysis["wrong"].setdefault(learning_objective_text, 0)
-            learning_objective_analysis["wrong"][learning_objective_text] += 1
-
-
-        # Summary of performance trends
-        performance_trends = {
-            "strong_learning_objectives": [
-                obj for obj, count in learning_objective_analysis["correct"].items() if count >= 3
-            ],
-            "weak_learning_objectives": [
-                obj for obj, count in learning_objective_analysis["wrong"].items() if count >= 3
-            ],
-            "hardest_difficulty": max(difficulty_analysis["wrong"].items(), key=lambda x: x[1], default=None),
-            "easiest_difficulty": max(difficulty_analysis["correct"].items(), key=lambda x: x[1], default=None)
-        }
-
-        # Construct analytics object
-        analytics = {
-            "total_questions": total_questions,
-            "correct_answers": correct_answers.count(),
-            "wrong_answers": wrong_answers.count(),
-            "score_percentage": round(score_percentage, 2),
-            "difficulty_analysis": difficulty_analysis,
-            "learning_objective_analysis": learning_objective_analysis,
-            "time_spent": {
-                "total_time": total_time_seconds,
-                "average_time_per_question": round(average_time_per_question, 2)
-            },
-            "performance_trends": performance_trends
-        }
-
-        print("Analytics generated:", analytics)
-        return analytics
+        return build_attempt_analytics(attempt, 'preassessment_attempt')
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -0,0 +1,72 @@
+from django.db.models import Count, Min
+
+from .models import StudentAnswer
+
+
+def build_attempt_analytics(attempt, attempt_field):
+    """
+    Analytics payload returned when a quiz/exam/preassessment/mocktest attempt is scored.
+
+    The difficulty and learning objective breakdowns come from a single GROUP BY over
+    the attempt's answers. Groups are read in the order their first answer was stored so
+    the breakdowns (and the tie-breaks in performance_trends) list items in answer order.
+    """
+    groups = (
+        StudentAnswer.objects.filter(**{attempt_field: attempt})
+        .values('is_correct', 'question__difficulty', 'question__learning_objective__text')
+        .annotate(count=Count('id'), first_answer=Min('id'))
+        .order_by('first_answer')
+    )
+
+    difficulty_analysis = {
+        "correct": {},
+        "wrong": {}
+    }
+    learning_objective_analysis = {
+        "correct": {},
+        "wrong": {}
+    }
+    answer_counts = {"correct": 0, "wrong": 0}
+
+    for group in groups:
+        outcome = "correct" if group['is_correct'] else "wrong"
+        difficulty = group['question__difficulty']
+        learning_objective_text = group['question__learning_objective__text']
+
+        difficulty_analysis[outcome][difficulty] = difficulty_analysis[outcome].get(difficulty, 0) + group['count']
+        learning_objective_analysis[outcome][learning_objective_text] = learning_objective_analysis[outcome].get(learning_objective_text, 0) + group['count']
+        answer_counts[outcome] += group['count']
+
+    total_questions = attempt.total_questions
+    score_percentage = (attempt.score / total_questions) * 100 if total_questions > 0 else 0
+
+    if attempt.end_time:
+        total_time_seconds = (attempt.end_time - attempt.start_time).total_seconds()
+    else:
+        total_time_seconds = 0  # If end_time is not set yet
+    average_time_per_question = total_time_seconds / total_questions if total_questions > 0 else 0
+
+    performance_trends = {
+        "strong_learning_objectives": [
+            obj for obj, count in learning_objective_analysis["correct"].items() if count >= 3
+        ],
+        "weak_learning_objectives": [
+            obj for obj, count in learning_objective_analysis["wrong"].items() if count >= 3
+        ],
+        "hardest_difficulty": max(difficulty_analysis["wrong"].items(), key=lambda x: x[1], default=None),
+        "easiest_difficulty": max(difficulty_analysis["correct"].items(), key=lambda x: x[1], default=None)
+    }
+
+    return {
+        "total_questions": total_questions,
+        "correct_answers": answer_counts["correct"],
+        "wrong_answers": answer_counts["wrong"],
+        "score_percentage": round(score_percentage, 2),
+        "difficulty_analysis": difficulty_analysis,
+        "learning_objective_analysis": learning_objective_analysis,
+        "time_spent": {
+            "total_time": total_time_seconds,
+            "average_time_per_question": round(average_time_per_question, 2)
+        },
+        "performance_trends": performance_trends
+    }
@@ -0,0 +1,115 @@
+"""
+Near-duplicate detection for questions with MinHash + locality-sensitive hashing.
+
+A question is reduced to a set of shingles (word bigrams of its text plus each
+normalised choice) and a MinHash signature of NUM_PERM values; the fraction of equal
+values between two signatures estimates the Jaccard similarity of the shingle sets.
+The signature is cut into BANDS bands of ROWS values and each band is hashed to a
+QuestionLSHBucket row, so finding candidates is one indexed ``bucket IN (...)``
+lookup instead of a scan of the bank. With 32 bands of 4 rows, pairs above ~0.45
+similarity almost always share a bucket; candidates are then checked against
+QUESTION_DUPLICATE_THRESHOLD.
+"""
+import hashlib
+import random
+import re
+import struct
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import strip_tags
+
+from .models import QuestionFingerprint, QuestionLSHBucket
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 2
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# fixed seed: signatures are stored, so the permutations must never change between runs
+_rng = random.Random(20240601)
+PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def _words(text):
+    return re.findall(r'\w+', strip_tags(text or '').lower())
+
+
+def shingles(text, choices=()):
+    words = _words(text)
+    if len(words) < SHINGLE_SIZE:
+        result = {' '.join(words)}
+    else:
+        result = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    result.update('choice:' + ' '.join(_words(choice)) for choice in choices)
+    return result
+
+
+def _hash(value):
+    return struct.unpack('<I', hashlib.blake2b(value.encode('utf-8'), digest_size=4).digest())[0]
+
+
+def signature(text, choices=()):
+    hashes = [_hash(shingle) for shingle in shingles(text, choices)]
+    return [min((a * h + b) % _PRIME for h in hashes) & _MAX_HASH for a, b in PERMUTATIONS]
+
+
+def band_buckets(sig):
+    buckets = []
+    for band in range(BANDS):
+        rows = sig[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<I{ROWS}I', band, *rows), digest_size=8).digest()
+        buckets.append(struct.unpack('<q', digest)[0])
+    return buckets
+
+
+def similarity(first, second):
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+def describe(matches):
+    return [{'id': question_id, 'similarity': round(score, 3)} for question_id, score in matches]
+
+
+def question_signature(question, choices=None):
+    if choices is None:
+        choices = [choice.text for choice in question.choices.all()]
+    return signature(question.text, choices)
+
+
+def find_duplicates(sig, threshold=None, before=None):
+    """
+    Stored questions whose fingerprint is at least ``threshold`` similar to ``sig``, as
+    ``(question_id, similarity)`` pairs, best first. ``before`` limits the search to
+    questions with a lower id, so a duplicate always points at the older question.
+    """
+    if threshold is None:
+        threshold = settings.QUESTION_DUPLICATE_THRESHOLD
+    candidates = QuestionFingerprint.objects.filter(question__lsh_buckets__bucket__in=band_buckets(sig)).distinct()
+    if before is not None:
+        candidates = candidates.filter(question_id__lt=before)
+
+    matches = [(fingerprint.question_id, similarity(sig, fingerprint.signature)) for fingerprint in candidates]
+    return sorted([match for match in matches if match[1] >= threshold], key=lambda match: (-match[1], match[0]))
+
+
+def save_fingerprint(question, sig, duplicate_of=None, score=None):
+    with transaction.atomic():
+        QuestionFingerprint.objects.update_or_create(question=question, defaults={
+            'signature': sig, 'duplicate_of_id': duplicate_of, 'similarity': score,
+        })
+        QuestionLSHBucket.objects.filter(question=question).delete()
+        QuestionLSHBucket.objects.bulk_create([
+            QuestionLSHBucket(question=question, bucket=bucket) for bucket in band_buckets(sig)
+        ])
+
+
+def fingerprint_question(question, choices=None):
+    """(Re)compute and store the fingerprint of a saved question; returns its duplicate matches."""
+    sig = question_signature(question, choices)
+    matches = find_duplicates(sig, before=question.pk)
+    best = matches[0] if matches else (None, None)
+    save_fingerprint(question, sig, *best)
+    return matches
@@ -0,0 +1,76 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Choice, StudentAnswer
+
+
+class GradedSubmission:
+    """Result of grading one submission: the written answers plus per-objective tallies."""
+
+    def __init__(self):
+        self.answers = []
+        self.correct_count = 0
+        self.by_objective = defaultdict(list)
+
+    @property
+    def total(self):
+        return len(self.answers)
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_submission(submitted_answers, student, attempt_field, attempt):
+    """
+    Grade submitted ``{'question_id', 'selected_choice_id'}`` dicts and store them as StudentAnswer rows.
+
+    The answer key for every submitted question is loaded in one query, grading happens
+    in memory and the answers are written with a single bulk_create (replacing any earlier
+    answers to the same questions on this attempt). ``by_objective`` maps each
+    LearningObjective to the ``{'question', 'is_correct'}`` dicts StudentMastery.update_mastery expects.
+    Questions that do not exist or have no correct choice are skipped.
+    """
+    question_ids = {_as_id(answer.get('question_id')) for answer in submitted_answers}
+    question_ids.discard(None)
+
+    answer_key = {
+        choice.question_id: choice
+        for choice in Choice.objects.filter(
+            question_id__in=question_ids, is_correct=True
+        ).select_related('question__learning_objective')
+    }
+
+    graded = GradedSubmission()
+    for answer in submitted_answers:
+        correct_choice = answer_key.get(_as_id(answer.get('question_id')))
+        if correct_choice is None:
+            continue
+
+        selected_choice_id = _as_id(answer.get('selected_choice_id'))
+        is_correct = selected_choice_id == correct_choice.id
+        question = correct_choice.question
+
+        graded.answers.append(StudentAnswer(
+            student=student,
+            question=question,
+            selected_choice_id=selected_choice_id,
+            is_correct=is_correct,
+            **{attempt_field: attempt}
+        ))
+        graded.by_objective[question.learning_objective].append({
+            'question': question,
+            'is_correct': is_correct
+        })
+        if is_correct:
+            graded.correct_count += 1
+
+    with transaction.atomic():
+        StudentAnswer.objects.filter(question_id__in=answer_key.keys(), **{attempt_field: attempt}).delete()
+        StudentAnswer.objects.bulk_create(graded.answers)
+
+    return graded
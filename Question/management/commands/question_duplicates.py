@@ -0,0 +1,99 @@
+from itertools import combinations
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from Question.dedup import band_buckets, question_signature, similarity
+from Question.models import Question, QuestionFingerprint, QuestionLSHBucket
+
+
+class Command(BaseCommand):
+    help = 'Report clusters of near-duplicate questions using the LSH fingerprint index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every fingerprint, not only the missing ones.')
+        parser.add_argument('--threshold', type=float, default=None, help='Minimum estimated similarity (default QUESTION_DUPLICATE_THRESHOLD).')
+        parser.add_argument('--isai', action='store_true', help='Only report clusters containing AI-generated questions.')
+        parser.add_argument('--flag', action='store_true', help='Store duplicate_of on the reported duplicates.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        threshold = options['threshold'] if options['threshold'] is not None else settings.QUESTION_DUPLICATE_THRESHOLD
+        indexed = self.index(options['rebuild'], options['batch_size'])
+        if indexed:
+            self.stdout.write(f"Fingerprinted {indexed} question(s)")
+
+        clusters = self.clusters(threshold)
+        texts = Question.objects.in_bulk({question_id for cluster in clusters for question_id, _ in cluster})
+        reported = 0
+        for cluster in clusters:
+            if options['isai'] and not any(texts[question_id].isai for question_id, _ in cluster):
+                continue
+            (original, _), duplicates = cluster[0], cluster[1:]
+            self.stdout.write(f"#{original} {texts[original].text[:80]}")
+            for question_id, score in duplicates:
+                self.stdout.write(f"    #{question_id} ({score:.2f}) {texts[question_id].text[:80]}")
+            if options['flag']:
+                for question_id, score in duplicates:
+                    QuestionFingerprint.objects.filter(question_id=question_id).update(duplicate_of_id=original, similarity=score)
+            reported += len(duplicates)
+        self.stdout.write(f"{reported} near-duplicate question(s) in {len(clusters)} cluster(s)")
+
+    def index(self, rebuild, batch_size):
+        questions = Question.objects.order_by('id')
+        if not rebuild:
+            questions = questions.filter(fingerprint__isnull=True)
+        ids = list(questions.values_list('id', flat=True))
+
+        for start in range(0, len(ids), batch_size):
+            batch = list(Question.objects.filter(id__in=ids[start:start + batch_size]).prefetch_related('choices'))
+            signatures = {question.id: question_signature(question) for question in batch}
+            with transaction.atomic():
+                QuestionFingerprint.objects.filter(question_id__in=signatures).delete()
+                QuestionLSHBucket.objects.filter(question_id__in=signatures).delete()
+                QuestionFingerprint.objects.bulk_create([
+                    QuestionFingerprint(question_id=question_id, signature=sig) for question_id, sig in signatures.items()
+                ])
+                QuestionLSHBucket.objects.bulk_create([
+                    QuestionLSHBucket(question_id=question_id, bucket=bucket)
+                    for question_id, sig in signatures.items() for bucket in band_buckets(sig)
+                ])
+        return len(ids)
+
+    def clusters(self, threshold):
+        """Groups of questions sharing an LSH bucket and verified above ``threshold``, oldest question first."""
+        shared = QuestionLSHBucket.objects.values('bucket').annotate(count=Count('id')).filter(count__gt=1).values('bucket')
+        members = {}
+        for bucket, question_id in QuestionLSHBucket.objects.filter(bucket__in=shared).values_list('bucket', 'question_id'):
+            members.setdefault(bucket, set()).add(question_id)
+
+        pairs = {pair for question_ids in members.values() for pair in combinations(sorted(question_ids), 2)}
+        signatures = dict(QuestionFingerprint.objects.filter(
+            question_id__in={question_id for pair in pairs for question_id in pair}
+        ).values_list('question_id', 'signature'))
+
+        parent = {}
+
+        def root(question_id):
+            while parent.get(question_id, question_id) != question_id:
+                question_id = parent[question_id]
+            return question_id
+
+        scores = {}
+        for first, second in sorted(pairs):
+            score = similarity(signatures[first], signatures[second])
+            if score >= threshold:
+                scores[second] = max(scores.get(second, 0), score)
+                a, b = root(first), root(second)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+
+        grouped = {}
+        for question_id in scores:
+            grouped.setdefault(root(question_id), []).append(question_id)
+        return [
+            [(original, 1.0)] + [(question_id, scores[question_id]) for question_id in sorted(question_ids) if question_id != original]
+            for original, question_ids in sorted(grouped.items())
+        ]
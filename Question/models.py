@@ -2,6 +2,7 @@ from django.db import models
 import random
 
 from Class.models import Attachment
+from .pool import question_pool
 
 
 # Create your models here.
@@ -12,6 +13,7 @@ class Question(models.Model):
     difficulty = models.IntegerField(choices=[(1, 'Beginner'), (2, 'Intermediate'), (3, 'Advanced')])
     attachments = models.ManyToManyField(Attachment, blank=True, related_name='questions')
     isai = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # the question pool's watermark, see pool.py
 
     def __str__(self):
         difficulty_label = dict(self._meta.get_field('difficulty').choices).get(self.difficulty, 'Unknown')
@@ -55,14 +57,22 @@ class QuestionGenerator(models.Model):
         abstract = True
 
     def generate_questions(self, num_easy, num_medium, num_hard, filter_by=None):
-        if filter_by:
-            easy_questions = Question.objects.filter(difficulty=1, **filter_by).order_by('?')[:num_easy]
-            medium_questions = Question.objects.filter(difficulty=2, **filter_by).order_by('?')[:num_medium]
-            hard_questions = Question.objects.filter(difficulty=3, **filter_by).order_by('?')[:num_hard]
-        else:
-            easy_questions = Question.objects.filter(difficulty=1).order_by('?')[:num_easy]
-            medium_questions = Question.objects.filter(difficulty=2).order_by('?')[:num_medium]
-            hard_questions = Question.objects.filter(difficulty=3).order_by('?')[:num_hard]
+        pool_filter = question_pool.translate_filter(filter_by)
+
+        if pool_filter is not None:
+            question_ids = (
+                question_pool.sample(num_easy, 1, **pool_filter)
+                + question_pool.sample(num_medium, 2, **pool_filter)
+                + question_pool.sample(num_hard, 3, **pool_filter)
+            )
+            questions_by_id = Question.objects.in_bulk(question_ids)
+            questions = [questions_by_id[question_id] for question_id in question_ids if question_id in questions_by_id]
+            random.shuffle(questions)
+            return questions
+
+        easy_questions = Question.objects.filter(difficulty=1, **filter_by).order_by('?')[:num_easy]
+        medium_questions = Question.objects.filter(difficulty=2, **filter_by).order_by('?')[:num_medium]
+        hard_questions = Question.objects.filter(difficulty=3, **filter_by).order_by('?')[:num_hard]
 
         questions = list(easy_questions) + list(medium_questions) + list(hard_questions)
 
@@ -71,3 +81,24 @@ class QuestionGenerator(models.Model):
 
         random.shuffle(questions)
         return questions
+
+
+class QuestionFingerprint(models.Model):
+    """MinHash signature of a question's text and choices, see Question/dedup.py."""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    signature = models.JSONField()
+    duplicate_of = models.ForeignKey(Question, on_delete=models.SET_NULL, null=True, blank=True, related_name='near_duplicates')
+    similarity = models.FloatField(null=True, blank=True)  # estimated Jaccard similarity to duplicate_of
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Fingerprint of question {self.question_id}"
+
+
+class QuestionLSHBucket(models.Model):
+    """One locality-sensitive-hashing band of a question's signature; questions sharing a bucket are duplicate candidates."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='lsh_buckets')
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        indexes = [models.Index(fields=['bucket'], name='question_lsh_bucket_idx')]
@@ -0,0 +1,141 @@
+import random
+import threading
+import time
+from bisect import bisect_right
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Count, Max
+
+# filter_by keys that the pool can answer without going to the database
+POOL_FILTER_KEYS = {
+    'learning_objective': 'learning_objective_ids',
+    'learning_objective_id': 'learning_objective_ids',
+    'learning_objective__in': 'learning_objective_ids',
+    'learning_objective_id__in': 'learning_objective_ids',
+    'isai': 'isai',
+}
+
+
+class QuestionPool:
+    """
+    In-memory index of question ids grouped by difficulty and (learning_objective_id, isai).
+
+    The index is built with one scan of the question table the first time it is
+    sampled. After that each process compares a watermark read from the table itself
+    (question count and latest ``updated_at``) at most every QUESTION_POOL_CHECK_INTERVAL
+    seconds, so every worker sees changes made by the others. Added or edited
+    questions are applied incrementally; only a drop in the count (deletes) rebuilds.
+    Question saves in this process skip the wait (Question/signals.py).
+
+    bulk_create sets ``updated_at`` and is picked up like a save. ``queryset.update()``
+    does not touch ``updated_at``, so pass ``updated_at=timezone.now()`` along with it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = None
+        self._where = {}  # question id -> (difficulty, (learning_objective_id, isai))
+        self._watermark = None
+        self._checked = 0.0
+
+    def invalidate(self):
+        """Re-check the watermark on the next sample instead of waiting for the interval."""
+        self._checked = 0.0
+
+    def _rows(self, queryset):
+        return queryset.values_list('id', 'learning_objective_id', 'difficulty', 'isai').iterator(chunk_size=5000)
+
+    def _add(self, question_id, learning_objective_id, difficulty, isai):
+        key = (learning_objective_id, isai)
+        old = self._where.get(question_id)
+        if old == (difficulty, key):
+            return
+        if old is not None:
+            self._buckets[old[0]][old[1]].remove(question_id)
+        self._buckets.setdefault(difficulty, {}).setdefault(key, []).append(question_id)
+        self._where[question_id] = (difficulty, key)
+
+    def _build(self, Question):
+        self._buckets = {1: {}, 2: {}, 3: {}}
+        self._where = {}
+        for row in self._rows(Question.objects.all()):
+            self._add(*row)
+
+    def _refresh(self):
+        """Bring the index up to date if the check interval has passed; the caller holds ``_lock``."""
+        now = time.monotonic()
+        if self._buckets is not None and now - self._checked < settings.QUESTION_POOL_CHECK_INTERVAL:
+            return
+        self._checked = now
+
+        Question = apps.get_model('Question', 'Question')
+        watermark = Question.objects.aggregate(count=Count('id'), latest=Max('updated_at'))
+        if self._buckets is None or watermark['count'] < len(self._where):
+            self._build(Question)
+        elif watermark != self._watermark:
+            latest = self._watermark['latest']
+            changed = Question.objects.all() if latest is None else Question.objects.filter(updated_at__gte=latest)
+            for row in self._rows(changed):
+                self._add(*row)
+            if len(self._where) != watermark['count']:
+                self._build(Question)  # deleted and added since the last check
+        self._watermark = watermark
+
+    def sample(self, k, difficulty, learning_objective_ids=None, isai=None):
+        """
+        Return up to k distinct random question ids of the given difficulty.
+
+        Sampling picks k positions across the matching buckets, so the cost is
+        O(k log buckets) no matter how many questions the pool holds. It runs under
+        the lock, as refreshes change the buckets in place; copying them out instead
+        would cost O(questions) per call.
+        """
+        if k <= 0:
+            return []
+
+        with self._lock:
+            self._refresh()
+            by_key = self._buckets.get(difficulty, {})
+            isai_values = (True, False) if isai is None else (isai,)
+            if learning_objective_ids is None:
+                pools = [ids for (_, ai), ids in by_key.items() if ai in isai_values]
+            else:
+                pools = [by_key[(lo, ai)] for lo in learning_objective_ids for ai in isai_values if (lo, ai) in by_key]
+
+            offsets = []
+            total = 0
+            for ids in pools:
+                total += len(ids)
+                offsets.append(total)
+
+            picked = []
+            for position in random.sample(range(total), min(k, total)):
+                index = bisect_right(offsets, position)
+                start = offsets[index - 1] if index else 0
+                picked.append(pools[index][position - start])
+        return picked
+
+    def translate_filter(self, filter_by):
+        """
+        Map a QuestionGenerator ``filter_by`` dict onto sample() keyword arguments.
+
+        Returns None when the filter uses lookups the pool does not index, in which
+        case callers should fall back to querying the table.
+        """
+        kwargs = {}
+        for key, value in (filter_by or {}).items():
+            if key not in POOL_FILTER_KEYS:
+                return None
+            if key == 'isai':
+                kwargs['isai'] = bool(value)
+                continue
+            values = value if key.endswith('__in') else [value]
+            ids = {getattr(v, 'pk', v) for v in values}
+            if 'learning_objective_ids' in kwargs:
+                ids &= kwargs['learning_objective_ids']
+            kwargs['learning_objective_ids'] = ids
+        return kwargs
+
+
+question_pool = QuestionPool()
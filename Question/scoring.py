@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from User.models import StudentMastery, StudentMasteryRollup
+from .grading import grade_submission
+from .models import StudentAnswer
+
+
+class AttemptScore:
+    def __init__(self, correct_count, answered_count, by_objective):
+        self.correct_count = correct_count
+        self.answered_count = answered_count
+        self.by_objective = by_objective
+
+
+def tally_answers(answers):
+    """Count correct answers and group them by learning objective in a single pass."""
+    by_objective = defaultdict(list)
+    correct_count = 0
+    for answer in answers:
+        by_objective[answer.question.learning_objective].append({
+            'question': answer.question,
+            'is_correct': answer.is_correct
+        })
+        correct_count += answer.is_correct
+    return AttemptScore(correct_count, len(answers), by_objective)
+
+
+def apply_mastery_updates(student, by_objective):
+    """Write the per-objective answers to the student's StudentMastery rows in one upsert and refresh their rollups."""
+    levels = StudentMastery.bulk_update_mastery(student, {
+        learning_objective: [(answer['question'].difficulty, answer['is_correct']) for answer in answers]
+        for learning_objective, answers in by_objective.items()
+    })
+    StudentMasteryRollup.refresh(student.pk, list(levels))
+    return levels
+
+
+class ScoringPipeline:
+    """
+    Shared grade -> group by objective -> mastery -> persist flow for every attempt type.
+
+    ``attempt_field`` is the StudentAnswer foreign key pointing at the attempt model
+    (``quiz_attempt``, ``exam_attempt``, ...) and ``get_student`` returns the student
+    who owns an attempt.
+    """
+
+    def __init__(self, attempt_field, get_student):
+        self.attempt_field = attempt_field
+        self.get_student = get_student
+
+    def load_answers(self, attempt):
+        return list(
+            StudentAnswer.objects.filter(**{self.attempt_field: attempt}).select_related('question__learning_objective')
+        )
+
+    def score(self, attempt, submitted_answers=None, passing_score=None):
+        """
+        Score ``attempt`` and persist the score, end time and mastery changes in one transaction.
+
+        When ``submitted_answers`` is given the answers are graded and written first (see
+        grade_submission); otherwise the StudentAnswer rows already stored for the attempt are used.
+        ``passed`` is only set on the attempt when a ``passing_score`` ratio is given.
+        """
+        student = self.get_student(attempt)
+
+        with transaction.atomic():
+            if submitted_answers is not None:
+                graded = grade_submission(submitted_answers, student, self.attempt_field, attempt)
+                result = AttemptScore(graded.correct_count, graded.total, graded.by_objective)
+            else:
+                result = tally_answers(self.load_answers(attempt))
+
+            attempt.score = result.correct_count
+            attempt.end_time = timezone.now()
+            if passing_score is not None:
+                attempt.passed = attempt.total_questions > 0 and (result.correct_count / attempt.total_questions) >= passing_score
+            attempt.save()
+
+            apply_mastery_updates(student, result.by_objective)
+
+        return result
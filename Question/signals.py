@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Question
+from .pool import question_pool
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question_pool(sender, **kwargs):
+    # wait for the commit so the pool never indexes a half-written transaction
+    transaction.on_commit(question_pool.invalidate)
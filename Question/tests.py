@@ -1,3 +1,273 @@
-from django.test import TestCase
+import datetime
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from Course.models import Course, Syllabus, Lesson, Topic, Subtopic, LearningObjective
+from Challenge.models import Challenge
+from Mocktest.models import Mocktest
+from Preassessment.models import Preassessment, StudentPreassessmentAttempt
+from User.models import Student, Specialization, StudentMastery
+from .analytics import build_attempt_analytics
+from .grading import grade_submission
+from .dedup import question_signature
+from .models import Question, Choice, StudentAnswer, QuestionFingerprint
+from .pool import question_pool
+from .scoring import ScoringPipeline
+from .views import ChoiceViewSet
+
+
+class QuestionPoolTest(TestCase):
+    def setUp(self):
+        course = Course.objects.create(course_id='POOL101', course_title='Pool Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='POOLSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        self.objective = LearningObjective.objects.create(text='Objective A', subtopic=subtopic)
+        self.other_objective = LearningObjective.objects.create(text='Objective B', subtopic=subtopic)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for difficulty in (1, 2, 3):
+                for i in range(10):
+                    Question.objects.create(learning_objective=self.objective, text=f'A{difficulty}-{i}', difficulty=difficulty)
+                    Question.objects.create(learning_objective=self.other_objective, text=f'B{difficulty}-{i}', difficulty=difficulty, isai=True)
+
+    def test_sample_returns_distinct_ids_matching_filter(self):
+        ids = question_pool.sample(5, 2, learning_objective_ids={self.objective.id})
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5)
+        questions = Question.objects.filter(id__in=ids)
+        self.assertTrue(all(q.difficulty == 2 and q.learning_objective_id == self.objective.id for q in questions))
+
+        ai_ids = question_pool.sample(30, 1, isai=True)
+        self.assertEqual(len(ai_ids), 10)
+        self.assertFalse(Question.objects.filter(id__in=ai_ids, isai=False).exists())
+
+    def test_pool_is_rebuilt_after_question_changes(self):
+        self.assertEqual(len(question_pool.sample(50, 3)), 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_question = Question.objects.create(learning_objective=self.objective, text='New', difficulty=3)
+        self.assertIn(new_question.id, question_pool.sample(50, 3))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_question.delete()
+        self.assertEqual(len(question_pool.sample(50, 3)), 20)
+
+    @override_settings(QUESTION_POOL_CHECK_INTERVAL=0)
+    def test_pool_sees_writes_from_other_processes(self):
+        self.assertEqual(len(question_pool.sample(50, 3)), 20)
+        # no signals fire for these, like a save made by another worker
+        moved = Question.objects.filter(difficulty=1).first()
+        Question.objects.filter(pk=moved.pk).update(difficulty=3, updated_at=timezone.now())
+        added, = Question.objects.bulk_create([Question(learning_objective=self.objective, text='Bulk', difficulty=3)])
+
+        # the watermark and the changed rows only, no full rebuild
+        with self.assertNumQueries(2):
+            ids = question_pool.sample(50, 3)
+        self.assertEqual(len(ids), 22)
+        self.assertIn(moved.pk, ids)
+        self.assertNotIn(moved.pk, question_pool.sample(50, 1))
+
+    def test_generate_questions_uses_requested_counts(self):
+        challenge = Challenge.objects.create()
+        questions = challenge.generate_questions(num_easy=3, num_medium=2, num_hard=1)
+        difficulties = sorted(q.difficulty for q in questions)
+        self.assertEqual(difficulties, [1, 1, 1, 2, 2, 3])
+
+
+class GradeSubmissionTest(TestCase):
+    def setUp(self):
+        specialization = Specialization.objects.create(name='1')
+        self.student = Student.objects.create(user_name='grader', password='x', first_name='G', last_name='S', email='g@s.com', specialization=specialization)
+        course = Course.objects.create(course_id='GRD101', course_title='Grading Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='GRDSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        self.objectives = [LearningObjective.objects.create(text=f'Objective {i}', subtopic=subtopic) for i in range(2)]
+        preassessment = Preassessment.objects.create(course=course)
+        self.attempt = StudentPreassessmentAttempt.objects.create(preassessment=preassessment, student=self.student, score=0, total_questions=20)
+
+        self.submission = []
+        for i in range(20):
+            question = Question.objects.create(learning_objective=self.objectives[i % 2], text=f'Q{i}', difficulty=(i % 3) + 1)
+            correct = Choice.objects.create(question=question, text='Right', is_correct=True)
+            wrong = Choice.objects.create(question=question, text='Wrong', is_correct=False)
+            selected = correct if i < 15 else wrong
+            self.submission.append({'question_id': question.id, 'selected_choice_id': selected.id})
+
+    def test_grades_in_bounded_queries(self):
+        self.submission.append({'question_id': 999999, 'selected_choice_id': 1})
+        with self.assertNumQueries(5):
+            graded = grade_submission(self.submission, self.student, 'preassessment_attempt', self.attempt)
+
+        self.assertEqual(graded.correct_count, 15)
+        self.assertEqual(graded.total, 20)
+        self.assertEqual(sum(len(answers) for answers in graded.by_objective.values()), 20)
+        self.assertEqual(set(graded.by_objective), set(self.objectives))
+        self.assertEqual(StudentAnswer.objects.filter(preassessment_attempt=self.attempt, is_correct=True).count(), 15)
+
+    def test_resubmission_replaces_previous_answers(self):
+        grade_submission(self.submission, self.student, 'preassessment_attempt', self.attempt)
+        grade_submission(self.submission, self.student, 'preassessment_attempt', self.attempt)
+        self.assertEqual(StudentAnswer.objects.filter(preassessment_attempt=self.attempt).count(), 20)
+
+    def test_scoring_pipeline_updates_attempt_and_mastery(self):
+        pipeline = ScoringPipeline('preassessment_attempt', lambda attempt: attempt.student)
+        result = pipeline.score(self.attempt, submitted_answers=self.submission)
+
+        self.attempt.refresh_from_db()
+        self.assertEqual(self.attempt.score, 15)
+        self.assertIsNotNone(self.attempt.end_time)
+        self.assertEqual(result.answered_count, 20)
+        self.assertEqual(StudentMastery.objects.filter(student=self.student).count(), 2)
+        self.assertTrue(all(m.questions_attempted == 10 for m in StudentMastery.objects.filter(student=self.student)))
+
+        rescored = pipeline.score(self.attempt)
+        self.assertEqual(rescored.correct_count, 15)
+        self.assertTrue(all(m.questions_attempted == 20 for m in StudentMastery.objects.filter(student=self.student)))
+
+    def test_analytics_in_one_query(self):
+        grade_submission(self.submission, self.student, 'preassessment_attempt', self.attempt)
+        self.attempt.score = 15
+
+        with self.assertNumQueries(1):
+            analytics = build_attempt_analytics(self.attempt, 'preassessment_attempt')
+
+        self.assertEqual(analytics['correct_answers'], 15)
+        self.assertEqual(analytics['wrong_answers'], 5)
+        self.assertEqual(analytics['score_percentage'], 75.0)
+        self.assertEqual(analytics['difficulty_analysis'], {'correct': {1: 5, 2: 5, 3: 5}, 'wrong': {1: 2, 2: 2, 3: 1}})
+        self.assertEqual(analytics['learning_objective_analysis'], {
+            'correct': {'Objective 0': 8, 'Objective 1': 7},
+            'wrong': {'Objective 1': 3, 'Objective 0': 2},
+        })
+        self.assertEqual(analytics['performance_trends']['weak_learning_objectives'], ['Objective 1'])
+        self.assertEqual(analytics['performance_trends']['hardest_difficulty'], (1, 2))
+
+
+class DuplicateDetectionTest(TestCase):
+    def setUp(self):
+        course = Course.objects.create(course_id='DUP101', course_title='Dedup Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='DUPSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        self.objective = LearningObjective.objects.create(text='Objective', subtopic=subtopic)
+
+    def question(self, text, choices=('Ohm\'s law', 'Faraday\'s law', 'Lenz\'s law', 'Snell\'s law')):
+        return {
+            'learning_objective': self.objective.id, 'text': text, 'difficulty': 1, 'isai': True,
+            'choices': [{'text': choice, 'is_correct': i == 0} for i, choice in enumerate(choices)],
+        }
+
+    def batch(self):
+        return [
+            self.question('Which law relates the voltage across a resistor to the current flowing through it?'),
+            self.question('What is the SI unit of electrical capacitance?', ('Farad', 'Henry', 'Ohm', 'Tesla')),
+            self.question('which LAW relates the voltage across a resistor, to the current flowing through it'),
+            self.question('Which law relates the voltage across a resistor to the current flowing through it?',
+                          ('Ohm\'s law', 'Faraday\'s law', 'Lenz\'s law', 'Coulomb\'s law')),
+        ]
+
+    def test_bulk_flags_near_duplicates(self):
+        response = self.client.post('/questions/bulk/', self.batch(), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        first, other, reworded, new_choice = response.json()
+        self.assertEqual(first['duplicate_of'], [])
+        self.assertEqual(other['duplicate_of'], [])
+        self.assertEqual(reworded['duplicate_of'], [{'id': first['id'], 'similarity': 1.0}])
+        self.assertEqual(new_choice['duplicate_of'][0]['id'], first['id'])
+        self.assertEqual(QuestionFingerprint.objects.get(question_id=reworded['id']).duplicate_of_id, first['id'])
+
+    def test_bulk_rejects_near_duplicates(self):
+        response = self.client.post('/questions/bulk/?duplicates=reject', self.batch(), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['created']), 2)
+        self.assertEqual([item['index'] for item in response.json()['rejected']], [2, 3])
+        self.assertEqual(Question.objects.count(), 2)
+
+        response = self.client.post('/questions/?duplicates=reject', self.batch()[0], content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_added_choices_refresh_the_fingerprint(self):
+        created = self.client.post('/questions/bulk/', [self.batch()[1]], content_type='application/json').json()[0]
+        question = Question.objects.get(pk=created['id'])
+        before = QuestionFingerprint.objects.get(question=question).signature
+
+        # ChoiceSerializer has no question field; attach the new choice to this question
+        with mock.patch.object(ChoiceViewSet, 'perform_create', lambda view, serializer: serializer.save(question=question)):
+            response = self.client.post('/choices/', {'text': 'Weber', 'is_correct': False}, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+        after = QuestionFingerprint.objects.get(question=question).signature
+        self.assertNotEqual(after, before)
+        self.assertEqual(after, question_signature(question))
+
+    def test_report_command(self):
+        for item in self.batch():
+            question = Question.objects.create(learning_objective=self.objective, text=item['text'], difficulty=1)
+            for choice in item['choices']:
+                Choice.objects.create(question=question, **choice)
+        out = StringIO()
+        call_command('question_duplicates', '--flag', stdout=out)
+        self.assertIn('2 near-duplicate question(s) in 1 cluster(s)', out.getvalue())
+        self.assertEqual(QuestionFingerprint.objects.exclude(duplicate_of=None).count(), 2)
+
+
+class PaginatedListTest(TestCase):
+    def setUp(self):
+        course = Course.objects.create(course_id='PAG101', course_title='Paging Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='PAGSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        objective = LearningObjective.objects.create(text='Objective', subtopic=subtopic)
+        for i in range(7):
+            question = Question.objects.create(learning_objective=objective, text=f'Q{i}', difficulty=1)
+            Choice.objects.create(question=question, text='Right', is_correct=True)
+            Choice.objects.create(question=question, text='Wrong')
+
+    def test_cursor_pages(self):
+        with self.assertNumQueries(3):
+            first = self.client.get('/questions/', {'page_size': 3}).json()
+        self.assertEqual([q['text'] for q in first['results']], ['Q0', 'Q1', 'Q2'])
+        self.assertEqual(len(first['results'][0]['choices']), 2)
+        self.assertIsNone(first['previous'])
+
+        second = self.client.get(first['next']).json()
+        third = self.client.get(second['next']).json()
+        self.assertEqual([q['text'] for q in second['results'] + third['results']], ['Q3', 'Q4', 'Q5', 'Q6'])
+        self.assertIsNone(third['next'])
+
+        self.assertEqual(len(self.client.get('/choices/').json()['results']), 14)
+
+    def test_ndjson_export_streams_every_row(self):
+        response = self.client.get('/questions/', {'format': 'ndjson'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 7)
+        self.assertEqual([len(json.loads(line)['choices']) for line in lines], [2] * 7)
+
+    def test_generator_lists_are_paginated(self):
+        course = Course.objects.get(pk='PAG101')
+        questions = list(Question.objects.all())
+        for i in range(3):
+            Mocktest.objects.create(course=course).questions.set(questions)
+            Challenge.objects.create(date=datetime.date(2024, 1, 1 + i)).questions.set(questions)
+
+        for url in ['/mocktest/', '/challenges/']:
+            first = self.client.get(url, {'page_size': 2}).json()
+            self.assertEqual(len(first['results']), 2)
+            self.assertEqual(len(self.client.get(first['next']).json()['results']), 1)
+
+            response = self.client.get(url, {'format': 'ndjson'})
+            self.assertTrue(response.streaming)
+            self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 3)
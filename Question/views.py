@@ -3,40 +3,86 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Question, Choice, StudentAnswer
 from .serializer import QuestionSerializer, ChoiceSerializer, StudentAnswerSerializer
-from openai import OpenAI
-import os, environ
+from .dedup import describe, find_duplicates, fingerprint_question, save_fingerprint, signature
+from backend.llm import complete
+from backend.pagination import StreamingListMixin
+from django.conf import settings
+from django.db import transaction
 import json
 
+DUPLICATE_MODES = ('flag', 'reject')
 
-class QuestionViewSet(viewsets.ModelViewSet):
+
+class QuestionViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = Question.objects.all()
     serializer_class = QuestionSerializer
-
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    list_prefetch = ('choices', 'attachments')
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
+    def _duplicate_mode(self, request):
+        mode = request.query_params.get('duplicates', settings.QUESTION_DUPLICATE_MODE)
+        return mode if mode in DUPLICATE_MODES else None
+
+    def _ingest(self, items, mode):
+        """
+        Create the validated ``items`` one by one, checking each against the fingerprint
+        index first (which includes the items created before it in the same batch).
+        Returns ``(created, rejected)``: created is a list of ``(question, matches)``.
+        """
+        created, rejected = [], []
+        with transaction.atomic():
+            for position, item in enumerate(items):
+                sig = signature(item['text'], [choice['text'] for choice in item.get('choices', [])])
+                matches = find_duplicates(sig)
+                if matches and mode == 'reject':
+                    rejected.append({'index': position, 'text': item['text'], 'duplicate_of': describe(matches)})
+                    continue
+                question = QuestionSerializer().create(item)
+                save_fingerprint(question, sig, *(matches[0] if matches else (None, None)))
+                created.append((question, matches))
+        return created, rejected
+
+    def _created_data(self, created):
+        data = self.get_serializer([question for question, _ in created], many=True).data
+        for item, (_, matches) in zip(data, created):
+            item['duplicate_of'] = describe(matches)
+        return data
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            self.perform_create(serializer)
-            headers = self.get_success_headers(serializer.data)
-            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+            mode = self._duplicate_mode(request)
+            if mode is None:
+                return Response({"detail": "duplicates must be 'flag' or 'reject'."}, status=status.HTTP_400_BAD_REQUEST)
+            created, rejected = self._ingest([serializer.validated_data], mode)
+            if rejected:
+                return Response({"detail": "Near-duplicate of an existing question.", "duplicate_of": rejected[0]['duplicate_of']}, status=status.HTTP_409_CONFLICT)
+            data = self._created_data(created)[0]
+            headers = self.get_success_headers(data)
+            return Response(data, status=status.HTTP_201_CREATED, headers=headers)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['post'])
     def bulk(self, request, *args, **kwargs):
+        """
+        Create many questions (e.g. a generate_question batch). Near-duplicates of the bank or
+        of earlier items in the batch are flagged with ``duplicate_of``, or with
+        ``?duplicates=reject`` left out and listed under ``rejected``.
+        """
         serializer = self.get_serializer(data=request.data, many=True)
         if serializer.is_valid():
-            self.perform_create(serializer)
-            headers = self.get_success_headers(serializer.data)
-            return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+            mode = self._duplicate_mode(request)
+            if mode is None:
+                return Response({"detail": "duplicates must be 'flag' or 'reject'."}, status=status.HTTP_400_BAD_REQUEST)
+            created, rejected = self._ingest(serializer.validated_data, mode)
+            data = self._created_data(created)
+            if mode == 'reject':
+                return Response({"created": data, "rejected": rejected}, status=status.HTTP_201_CREATED)
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def update(self, request, *args, **kwargs):
@@ -45,6 +91,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         if serializer.is_valid():
             self.perform_update(serializer)
+            fingerprint_question(serializer.instance)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -60,11 +107,6 @@ class QuestionViewSet(viewsets.ModelViewSet):
         learning_objective = request.data.get('learning_objective')
         difficulty = request.data.get('difficulty')
 
-        env = environ.Env(DEBUG=(bool, False))
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
-        client = OpenAI(api_key=env('OPENAI_API_KEY'))
-
         if not learning_objective or not difficulty:
             return Response(
                 {"error": "Both 'learning_objective' and 'difficulty' are required."},
@@ -73,7 +115,8 @@ class QuestionViewSet(viewsets.ModelViewSet):
 
         # GPT API call to generate the questions
         try:
-            completion = client.chat.completions.create(
+            generated_questions = complete(
+                cache=False,
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You are an AI designed to create educational questions."},
@@ -88,9 +131,6 @@ class QuestionViewSet(viewsets.ModelViewSet):
                 ]
             )
 
-            # Extract the generated questions
-            generated_questions = completion.choices[0].message.content.strip()
-
             return Response({
                 "question": generated_questions
                 },
@@ -103,15 +143,10 @@ class QuestionViewSet(viewsets.ModelViewSet):
             )
 
 
-class ChoiceViewSet(viewsets.ModelViewSet):
+class ChoiceViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = Choice.objects.all()
     serializer_class = ChoiceSerializer
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
-
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
@@ -121,6 +156,7 @@ class ChoiceViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
             self.perform_create(serializer)
+            fingerprint_question(serializer.instance.question)
             headers = self.get_success_headers(serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -131,24 +167,22 @@ class ChoiceViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         if serializer.is_valid():
             self.perform_update(serializer)
+            fingerprint_question(serializer.instance.question)
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
+        question = instance.question
         self.perform_destroy(instance)
+        fingerprint_question(question)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class StudentAnswerViewSet(viewsets.ModelViewSet):
+class StudentAnswerViewSet(StreamingListMixin, viewsets.ModelViewSet):
     queryset = StudentAnswer.objects.all()
     serializer_class = StudentAnswerSerializer
 
-    def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
-
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = self.get_serializer(instance)
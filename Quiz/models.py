@@ -1,11 +1,13 @@
 from collections import defaultdict
 import random
 from django.db import models
+from django.db.models import Case, F, IntegerField, Value, When, Window
+from django.db.models.functions import Random, RowNumber
 from django.utils import timezone
 
 from Question.models import QuestionGenerator, Question
 
-from Course.models import LearningObjective, StudentLessonProgress
+from Course.models import StudentLessonProgress
 from Question.models import StudentAnswer
 
 # Create your models here.
@@ -23,23 +25,29 @@ class Quiz(QuestionGenerator):
         return self.title
 
     def generate_questions(self, num_easy, num_medium, num_hard):
-        # Gather all learning objectives associated with the lesson through its topics and subtopics
-        learning_objectives = LearningObjective.objects.filter(
-            subtopic__topic__lesson=self.lesson
+        # Keep at most num_easy/num_medium/num_hard random candidates per (learning objective, difficulty)
+        # for the lesson, ranking each partition with ROW_NUMBER() so everything comes back in one query.
+        per_objective_limit = Case(
+            When(difficulty=1, then=Value(num_easy)),
+            When(difficulty=2, then=Value(num_medium)),
+            When(difficulty=3, then=Value(num_hard)),
+            default=Value(0),
+            output_field=IntegerField(),
         )
+        candidates = Question.objects.filter(
+            learning_objective__subtopic__topic__lesson=self.lesson
+        ).annotate(
+            objective_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('learning_objective_id'), F('difficulty')],
+                order_by=Random().asc(),
+            ),
+            per_objective_limit=per_objective_limit,
+        ).filter(objective_rank__lte=F('per_objective_limit'))
 
         questions_by_difficulty = defaultdict(list)
-
-        # For each learning objective, gather questions by difficulty level
-        for objective in learning_objectives:
-            easy_questions = Question.objects.filter(learning_objective=objective, difficulty=1).order_by('?')[:num_easy]
-            medium_questions = Question.objects.filter(learning_objective=objective, difficulty=2).order_by('?')[:num_medium]
-            hard_questions = Question.objects.filter(learning_objective=objective, difficulty=3).order_by('?')[:num_hard]
-
-            # Add questions to the grouped lists
-            questions_by_difficulty[1].extend(easy_questions)
-            questions_by_difficulty[2].extend(medium_questions)
-            questions_by_difficulty[3].extend(hard_questions)
+        for question in candidates:
+            questions_by_difficulty[question.difficulty].append(question)
 
         # Consolidate all questions, ensuring they’re shuffled
         selected_easy_questions = random.sample(questions_by_difficulty[1], min(5, len(questions_by_difficulty[1])))
@@ -61,6 +69,7 @@ class StudentQuizAttempt(models.Model):
     start_time = models.DateTimeField(default=timezone.now)
     end_time = models.DateTimeField(null=True, blank=True)
     passed = models.BooleanField(default=False)
+    feedback = models.TextField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.quiz} - {self.score}"
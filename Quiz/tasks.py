@@ -0,0 +1,11 @@
+from Jobs.queue import register
+from .models import StudentQuizAttempt
+from .views import StudentQuizAttemptViewSet
+
+
+@register('quiz.feedback')
+def generate_quiz_feedback(attempt_id):
+    attempt = StudentQuizAttempt.objects.get(id=attempt_id)
+    feedback = StudentQuizAttemptViewSet().generate_feedback(attempt)
+    StudentQuizAttempt.objects.filter(id=attempt_id).update(feedback=feedback)
+    return {'feedback': feedback}
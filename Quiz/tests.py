@@ -1,3 +1,128 @@
-from django.test import TestCase
+from collections import Counter
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from Class.models import Class
+from Course.models import Course, Syllabus, Lesson, Topic, Subtopic, LearningObjective
+from Jobs.queue import run_pending
+from Question.models import Question, Choice, StudentAnswer
+from User.models import Student, Specialization, Teacher
+from backend.llm import StubBackend
+from .models import Quiz, StudentQuizAttempt
+
+
+class FailingBackend(StubBackend):
+    """Fails mid-stream with an error that is not an LLMError."""
+
+    def stream(self, messages, model):
+        yield 'Partial '
+        raise RuntimeError('connection reset')
+
+
+class QuizTestCase(TestCase):
+    def setUp(self):
+        specialization = Specialization.objects.create(name='1')
+        student = Student.objects.create(user_name='student', password='x', first_name='S', last_name='T', email='s@t.com', specialization=specialization)
+        teacher = Teacher.objects.create(user_name='teacher', password='x', first_name='T', last_name='R', email='t@r.com', name='T', specialization=specialization)
+        course = Course.objects.create(course_id='QZ101', course_title='Quiz Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='QZSYL')
+        self.lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=self.lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        class_instance = Class.objects.create(className='Class', classDescription='', course=course, teacher=teacher)
+        self.quiz = Quiz.objects.create(lesson=self.lesson, student=student, class_instance=class_instance, title='Quiz')
+
+        for i in range(6):
+            objective = LearningObjective.objects.create(text=f'Objective {i}', subtopic=subtopic)
+            for difficulty in (1, 2, 3):
+                for j in range(4):
+                    Question.objects.create(learning_objective=objective, text=f'{i}-{difficulty}-{j}', difficulty=difficulty)
+
+        other_lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Other', order=2)
+        other_topic = Topic.objects.create(lesson=other_lesson, topic_title='Other', order=1)
+        other_subtopic = Subtopic.objects.create(topic=other_topic, subtopic_title='Other', order=1)
+        other_objective = LearningObjective.objects.create(text='Other objective', subtopic=other_subtopic)
+        Question.objects.create(learning_objective=other_objective, text='Elsewhere', difficulty=1)
+
+
+
+class QuizGenerateQuestionsTest(QuizTestCase):
+    def test_selects_five_three_two_in_one_query(self):
+        with self.assertNumQueries(1):
+            questions = self.quiz.generate_questions(1, 1, 1)
+
+        self.assertEqual(Counter(q.difficulty for q in questions), {1: 5, 2: 3, 3: 2})
+        self.assertTrue(all(q.learning_objective.subtopic.topic.lesson_id == self.lesson.id for q in questions))
+
+    def test_respects_per_objective_caps(self):
+        questions = self.quiz.generate_questions(0, 1, 0)
+        self.assertEqual(Counter(q.difficulty for q in questions), {2: 3})
+
+
+@override_settings(LLM_BACKEND='stub', LLM_STUB_RESPONSE='Stub feedback')
+class QuizFeedbackJobTest(QuizTestCase):
+    def test_submit_enqueues_feedback(self):
+        caches['llm'].clear()
+        attempt = StudentQuizAttempt.objects.create(quiz=self.quiz, total_questions=2)
+        for question in Question.objects.filter(learning_objective__subtopic__topic__lesson=self.lesson)[:2]:
+            choice = Choice.objects.create(question=question, text='Right', is_correct=True)
+            StudentAnswer.objects.create(student=self.quiz.student, question=question, selected_choice=choice, is_correct=True, quiz_attempt=attempt)
+
+        response = self.client.post('/studentQuizAttempt/calculate_score/', {'attempt_id': attempt.id}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['score'], 2)
+        self.assertIsNone(response.json()['feedback'])
+
+        self.assertEqual(run_pending(), 1)
+
+        job = self.client.get(f"/jobs/{response.json()['feedback_job']}/").json()
+        self.assertEqual(job['status'], 'done')
+        self.assertTrue(job['result']['feedback'].startswith('Stub feedback'))
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.feedback, job['result']['feedback'])
+
+    def test_feedback_stream_relays_tokens_and_saves_feedback(self):
+        caches['llm'].clear()
+        attempt = StudentQuizAttempt.objects.create(quiz=self.quiz, total_questions=2, score=0)
+
+        response = self.client.get(f'/studentQuizAttempt/{attempt.id}/feedback_stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertTrue(response['Content-Type'].startswith('text/event-stream'))
+        body = b''.join(response.streaming_content).decode()
+
+        self.assertIn('data: {"text": "Stub "}', body)
+        self.assertIn('event: done', body)
+        attempt.refresh_from_db()
+        self.assertTrue(attempt.feedback.startswith('Stub feedback'))
+
+    async def test_feedback_stream_under_asgi_is_async(self):
+        await caches['llm'].aclear()
+        attempt = await StudentQuizAttempt.objects.acreate(quiz=self.quiz, total_questions=2, score=0)
+
+        response = await self.async_client.get(f'/studentQuizAttempt/{attempt.id}/feedback_stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertIn('data: {"text": "Stub "}', body)
+        self.assertIn('event: done', body)
+        await attempt.arefresh_from_db()
+        self.assertTrue(attempt.feedback.startswith('Stub feedback'))
+
+    def test_feedback_stream_reports_backend_failures(self):
+        caches['llm'].clear()
+        attempt = StudentQuizAttempt.objects.create(quiz=self.quiz, total_questions=2, score=0)
+
+        with override_settings(LLM_BACKEND='Quiz.tests.FailingBackend'), self.assertLogs('backend.sse', 'ERROR'):
+            response = self.client.get(f'/studentQuizAttempt/{attempt.id}/feedback_stream/', HTTP_ACCEPT='text/event-stream')
+            body = b''.join(response.streaming_content).decode()
+
+        self.assertIn('data: {"text": "Partial "}', body)
+        self.assertTrue(body.endswith('event: error\ndata: {"detail": "The AI service failed, please try again."}\n\n'))
+        attempt.refresh_from_db()
+        self.assertIsNone(attempt.feedback)
+
+    def test_feedback_stream_requires_scored_attempt(self):
+        attempt = StudentQuizAttempt.objects.create(quiz=self.quiz, total_questions=2)
+        response = self.client.get(f'/studentQuizAttempt/{attempt.id}/feedback_stream/', HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.content.startswith(b'event: error'))
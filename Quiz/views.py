@@ -1,19 +1,25 @@
 from django.shortcuts import render
-from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
 from Question.models import StudentAnswer
 from Quiz.models import Quiz, StudentQuizAttempt
 from Quiz.serializer import QuizSerializer, StudentQuizAttemptSerializer
-from User.models import StudentMastery
 from Course.models import LearningObjective
 from Question.models import Question
 from Question.models import Choice
 from Course.models import Subtopic
-import os, environ
-from openai import OpenAI
+from Jobs.queue import enqueue
+from Question.analytics import build_attempt_analytics
+from Question.scoring import ScoringPipeline
+from backend import sse
+from backend.llm import complete
+from backend.sse import EventStreamRenderer
+
+quiz_scoring = ScoringPipeline('quiz_attempt', lambda attempt: attempt.quiz.student)
+
 
 # Create your views here.
 class QuizViewSet(viewsets.ModelViewSet):
@@ -159,38 +165,11 @@ class StudentQuizAttemptViewSet(viewsets.ModelViewSet):
         except StudentQuizAttempt.DoesNotExist:
             return Response({"detail": "Quiz attempt not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        answers = StudentAnswer.objects.filter(quiz_attempt=attempt)
-        correct_answers_count = answers.filter(is_correct=True).count()
-
-        learning_objective_answers = {}
-        for answer in answers:
-            learning_objective = answer.question.learning_objective
-            if learning_objective not in learning_objective_answers:
-                learning_objective_answers[learning_objective] = []
-            learning_objective_answers[learning_objective].append({
-                'question': answer.question,
-                'is_correct': answer.is_correct
-            })
-
-        for learning_objective, answers in learning_objective_answers.items():
-            student_mastery, created = StudentMastery.objects.get_or_create(student=attempt.quiz.student, learning_objective=learning_objective)
-            student_mastery.update_mastery(answers)
-
-        attempt.score = correct_answers_count
-        attempt.end_time = timezone.now()
-
-        total_questions = attempt.total_questions
-        passing_score = attempt.quiz.passing_score
-        passed = (correct_answers_count / total_questions) >= passing_score
-        attempt.passed = passed
-
-        attempt.save()
+        quiz_scoring.score(attempt, passing_score=attempt.quiz.passing_score)
 
         time_taken = attempt.end_time - attempt.start_time
 
-        feedback = StudentQuizAttemptViewSet().generate_feedback(attempt)
-        attempt.feedback = feedback
-        attempt.save()
+        feedback_job = enqueue('quiz.feedback', attempt_id=attempt.id)
         analytics = StudentQuizAttemptViewSet().generate_analytics(attempt)
 
         return Response({
@@ -198,7 +177,8 @@ class StudentQuizAttemptViewSet(viewsets.ModelViewSet):
             'total_questions': attempt.total_questions,
             'passed': attempt.passed,
             'time_taken': str(time_taken),
-            'feedback': feedback,
+            'feedback': None,
+            'feedback_job': feedback_job.id,
             'analytics': analytics
         }, status=status.HTTP_200_OK)
 
@@ -246,11 +226,37 @@ class StudentQuizAttemptViewSet(viewsets.ModelViewSet):
     def generate_feedback(self, attempt):
         print("Starting feedback generation")
 
-        env = environ.Env(DEBUG=(bool, False))
-        BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
-        client = OpenAI(api_key=env('OPENAI_API_KEY'))
+        messages, score_feedback = self.feedback_prompt(attempt)
+        ai_feedback = complete(model="gpt-3.5-turbo", messages=messages)
+
+        final_feedback = self.final_feedback(ai_feedback, score_feedback)
+        print(f"Feedback generated: {final_feedback[:100]}...")
+        return final_feedback
+
+    @action(detail=True, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def feedback_stream(self, request, pk=None):
+        """Stream the AI feedback for a scored attempt as server-sent events and store it once complete."""
+        try:
+            attempt = StudentQuizAttempt.objects.select_related('quiz__student').get(id=pk)
+        except StudentQuizAttempt.DoesNotExist:
+            return Response({"detail": "Quiz attempt not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        if attempt.score is None:
+            return Response({"detail": "Quiz attempt has not been scored yet."}, status=status.HTTP_400_BAD_REQUEST)
+
+        messages, score_feedback = self.feedback_prompt(attempt)
 
+        def finish(ai_feedback):
+            feedback = self.final_feedback(ai_feedback, score_feedback)
+            StudentQuizAttempt.objects.filter(id=attempt.id).update(feedback=feedback)
+            return {"feedback": feedback}
+
+        return sse.relay_llm(request, messages, finish)
+
+    def final_feedback(self, ai_feedback, score_feedback):
+        return f"{ai_feedback}\n\nAdditional Performance Summary:\n{score_feedback}"
+
+    def feedback_prompt(self, attempt):
         student = attempt.quiz.student
         student_name = f"{student.first_name} {student.last_name}"
         specialization_name = "Computer Science"  # Placeholder for specialization name
@@ -285,101 +291,14 @@ class StudentQuizAttemptViewSet(viewsets.ModelViewSet):
         else:
             score_feedback = "Invalid score. Please check the data."
 
-        completion = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are Preppy, BoardPrep's Engineering Companion and an excellent and critical engineer, tasked with providing constructive feedback on quiz performances of your students. In giving feedback, you don't thank the student for sharing the details, instead you congratulate the student first for finishing the quiz, then you provide your feedbacks. Be critical about your feedback expecially if the student failed the quiz so that they will know more where and how to improve. After providing your feedbacks, you then put your signature at the end of your response"},
-                {"role": "user", "content": f"I am {student_name}, a {specialization_name} major, and here are the details of my test. Score: {attempt.score}, Total Questions: {total_questions}, Perecentage: {score_percentage:.2f}%), Passed: {attempt.passed}\n\n{answers_paragraph}\n\nHere's an initial assessment of your performance:\n\n{score_feedback}\n\nBased on these results, can you provide some detailed feedback and suggestions for improvement if needed, like what subjects to focus on, which field I excel in, and some strategies? Address me directly, and don't put any placeholders as this will be displayed directly in unformatted text form."}
-            ]
-        )
-
-        print(completion)
-
-        ai_feedback = completion.choices[0].message.content.strip()
-        final_feedback = f"{ai_feedback}\n\nAdditional Performance Summary:\n{score_feedback}"
-        print(f"Feedback generated: {final_feedback[:100]}...")
-        return final_feedback
+        messages = [
+            {"role": "system", "content": "You are Preppy, BoardPrep's Engineering Companion and an excellent and critical engineer, tasked with providing constructive feedback on quiz performances of your students. In giving feedback, you don't thank the student for sharing the details, instead you congratulate the student first for finishing the quiz, then you provide your feedbacks. Be critical about your feedback expecially if the student failed the quiz so that they will know more where and how to improve. After providing your feedbacks, you then put your signature at the end of your response"},
+            {"role": "user", "content": f"I am {student_name}, a {specialization_name} major, and here are the details of my test. Score: {attempt.score}, Total Questions: {total_questions}, Perecentage: {score_percentage:.2f}%), Passed: {attempt.passed}\n\n{answers_paragraph}\n\nHere's an initial assessment of your performance:\n\n{score_feedback}\n\nBased on these results, can you provide some detailed feedback and suggestions for improvement if needed, like what subjects to focus on, which field I excel in, and some strategies? Address me directly, and don't put any placeholders as this will be displayed directly in unformatted text form."}
+        ]
+        return messages, score_feedback
 
     def generate_analytics(self, attempt):
-        print("Starting analytics generation")
-
-        correct_answers = StudentAnswer.objects.filter(quiz_attempt=attempt, is_correct=True)
-        wrong_answers = StudentAnswer.objects.filter(quiz_attempt=attempt, is_correct=False)
-
-        total_questions = attempt.total_questions
-        score_percentage = (attempt.score / total_questions) * 100 if total_questions > 0 else 0
-        passed = score_percentage >= 75
-
-        if attempt.end_time:
-            total_time = attempt.end_time - attempt.start_time
-            total_time_seconds = total_time.total_seconds()
-        else:
-            total_time_seconds = 0  # If end_time is not set yet
-        average_time_per_question = total_time_seconds / total_questions if total_questions > 0 else 0
-
-
-        # Analyze difficulty levels
-        difficulty_analysis = {
-            "correct": {},
-            "wrong": {}
-        }
-
-        for answer in correct_answers:
-            difficulty = answer.question.difficulty
-            difficulty_analysis["correct"].setdefault(difficulty, 0)
-            difficulty_analysis["correct"][difficulty] += 1
-
-        for answer in wrong_answers:
-            difficulty = answer.question.difficulty
-            difficulty_analysis["wrong"].setdefault(difficulty, 0)
-            difficulty_analysis["wrong"][difficulty] += 1
-
-        # Analyze learning objectives
-        learning_objective_analysis = {
-            "correct": {},
-            "wrong": {}
-        }
-
-        for answer in correct_answers:
-            learning_objective_text = answer.question.learning_objective.text
-            learning_objective_analysis["correct"].setdefault(learning_objective_text, 0)
-            learning_objective_analysis["correct"][learning_objective_text] += 1
-
-        for answer in wrong_answers:
-            learning_objective_text = answer.question.learning_objective.text
-            learning_objective_analysis["wrong"].setdefault(learning_objective_text, 0)
-            learning_objective_analysis["wrong"][learning_objective_text] += 1
-
-
-        # Summary of performance trends
-        performance_trends = {
-            "strong_learning_objectives": [
-                obj for obj, count in learning_objective_analysis["correct"].items() if count >= 3
-            ],
-            "weak_learning_objectives": [
-                obj for obj, count in learning_objective_analysis["wrong"].items() if count >= 3
-            ],
-            "hardest_difficulty": max(difficulty_analysis["wrong"].items(), key=lambda x: x[1], default=None),
-            "easiest_difficulty": max(difficulty_analysis["correct"].items(), key=lambda x: x[1], default=None)
-        }
-
-        # Construct analytics object
-        analytics = {
-            "total_questions": total_questions,
-            "correct_answers": correct_answers.count(),
-            "wrong_answers": wrong_answers.count(),
-            "score_percentage": round(score_percentage, 2),
-            "difficulty_analysis": difficulty_analysis,
-            "learning_objective_analysis": learning_objective_analysis,
-            "time_spent": {
-                "total_time": total_time_seconds,
-                "average_time_per_question": round(average_time_per_question, 2)
-            },
-            "performance_trends": performance_trends
-        }
-
-        print("Analytics generated:", analytics)
-        return analytics
+        return build_attempt_analytics(attempt, 'quiz_attempt')
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'Search'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .backends import setup_search_index
+        # the full-text column/table is not a model field, so it is added after migrate
+        post_migrate.connect(setup_search_index, sender=self)
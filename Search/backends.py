@@ -0,0 +1,153 @@
+"""
+Full-text search over SearchDocument.
+
+Postgres: a generated ``search_vector`` tsvector column (title weighted above body)
+with a GIN index, queried with websearch_to_tsquery and ranked by ts_rank_cd.
+SQLite (local work and tests): an external-content FTS5 table kept in sync by
+triggers, ranked by bm25. Both are created by setup_search_index after migrate.
+"""
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections
+
+from .models import SearchDocument
+
+FTS_TABLE = 'search_document_fts'
+
+
+class SearchResults:
+    def __init__(self, rows, total):
+        self.rows = rows
+        self.total = total
+
+
+def _filters(kinds, course_id, params):
+    sql = ''
+    if kinds:
+        sql += ' AND d.kind IN (%s)' % ', '.join(['%s'] * len(kinds))
+        params.extend(kinds)
+    if course_id:
+        sql += ' AND d.course_id = %s'
+        params.append(course_id)
+    return sql
+
+
+def _fetch(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    total = rows[0].pop('total') if rows else 0
+    for row in rows[1:]:
+        row.pop('total')
+    return SearchResults(rows, total)
+
+
+class PostgresSearch:
+    def setup(self, db):
+        table = db.ops.quote_name(SearchDocument._meta.db_table)
+        with db.cursor() as cursor:
+            cursor.execute(f"""
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+                    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('english', coalesce(body, '')), 'B')
+                ) STORED
+            """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS search_document_vector_idx ON {table} USING gin (search_vector)")
+
+    def search(self, query, kinds=None, course_id=None, limit=20, offset=0):
+        table = connection.ops.quote_name(SearchDocument._meta.db_table)
+        params = [query]
+        where = _filters(kinds, course_id, params)
+        params += [limit, offset]
+        return _fetch(f"""
+            SELECT d.kind, d.object_id, d.course_id, d.title,
+                   ts_headline('english', d.body, q, 'MaxFragments=2, MaxWords=20, MinWords=5') AS snippet,
+                   ts_rank_cd(d.search_vector, q) AS rank,
+                   count(*) OVER () AS total
+            FROM {table} d, websearch_to_tsquery('english', %s) q
+            WHERE d.search_vector @@ q{where}
+            ORDER BY rank DESC, d.id
+            LIMIT %s OFFSET %s
+        """, params)
+
+
+class SQLiteSearch:
+    def setup(self, db):
+        table = db.ops.quote_name(SearchDocument._meta.db_table)
+        with db.cursor() as cursor:
+            cursor.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                    title, body, content={table}, content_rowid='id', tokenize='porter unicode61'
+                )
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body);
+                    INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+                END
+            """)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    def match_expression(self, query):
+        # every word must match; the last one as a prefix so partial words still find something
+        terms = [f'"{term}"' for term in re.findall(r'\w+', query)]
+        if terms:
+            terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, query, kinds=None, course_id=None, limit=20, offset=0):
+        match = self.match_expression(query)
+        if not match:
+            return SearchResults([], 0)
+        table = connection.ops.quote_name(SearchDocument._meta.db_table)
+        params = [match]
+        where = _filters(kinds, course_id, params)
+        params += [limit, offset]
+        # FTS5 ranking functions can't be mixed with window functions, hence the subquery
+        return _fetch(f"""
+            SELECT d.kind, d.object_id, d.course_id, d.title, m.snippet, m.rank,
+                   count(*) OVER () AS total
+            FROM (
+                SELECT rowid, snippet({FTS_TABLE}, 1, '<b>', '</b>', '...', 20) AS snippet,
+                       -bm25({FTS_TABLE}, 10.0, 1.0) AS rank
+                FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+            ) m JOIN {table} d ON d.id = m.rowid
+            WHERE 1 = 1{where}
+            ORDER BY m.rank DESC, d.id
+            LIMIT %s OFFSET %s
+        """, params)
+
+
+BACKENDS = {
+    'postgresql': PostgresSearch,
+    'sqlite': SQLiteSearch,
+}
+
+
+def get_backend(vendor=None):
+    vendor = vendor or connection.vendor
+    if vendor not in BACKENDS:
+        raise ImproperlyConfigured(f"Full-text search is not supported on {vendor}.")
+    return BACKENDS[vendor]()
+
+
+def setup_search_index(using='default', **kwargs):
+    db = connections[using]
+    if db.vendor in BACKENDS:
+        get_backend(db.vendor).setup(db)
+
+
+def search(query, kinds=None, course_id=None, limit=20, offset=0):
+    return get_backend().search(query, kinds=kinds, course_id=course_id, limit=limit, offset=offset)
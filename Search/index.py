@@ -0,0 +1,106 @@
+import threading
+
+from bs4 import BeautifulSoup
+from django.db import transaction
+from django.db.models import F
+
+from Course.models import ContentBlock
+from Discussion.models import Post
+from Question.models import Question
+from .models import SearchDocument
+
+COURSE_OF_QUESTION = 'learning_objective__subtopic__topic__lesson__syllabus__course_id'
+COURSE_OF_BLOCK = 'page__subtopic__topic__lesson__syllabus__course_id'
+
+
+def strip_html(html):
+    return BeautifulSoup(html or '', 'html.parser').get_text(' ', strip=True)
+
+
+def question_documents(ids):
+    questions = Question.objects.filter(id__in=ids).annotate(course_key=F(COURSE_OF_QUESTION)).prefetch_related('choices')
+    for question in questions:
+        text = strip_html(question.text)
+        yield SearchDocument(
+            kind='question', object_id=question.id, course_id=question.course_key,
+            title=text[:255], body='\n'.join([text] + [choice.text for choice in question.choices.all()])
+        )
+
+
+def content_block_documents(ids):
+    blocks = ContentBlock.objects.filter(id__in=ids).annotate(
+        course_key=F(COURSE_OF_BLOCK), subtopic_title=F('page__subtopic__subtopic_title')
+    )
+    for block in blocks:
+        yield SearchDocument(
+            kind='content_block', object_id=block.id, course_id=block.course_key,
+            title=(block.subtopic_title or '')[:255], body=strip_html(block.content)
+        )
+
+
+def post_documents(ids):
+    for post in Post.objects.filter(id__in=ids):
+        yield SearchDocument(
+            kind='post', object_id=post.id, title=post.title,
+            body='\n'.join([strip_html(post.content), post.tags])
+        )
+
+
+# kind -> (source model, builder of SearchDocuments for a list of source ids)
+SOURCES = {
+    'question': (Question, question_documents),
+    'content_block': (ContentBlock, content_block_documents),
+    'post': (Post, post_documents),
+}
+
+
+def index_objects(kind, ids):
+    """(Re)index the ``kind`` objects with ``ids``; ids that no longer exist are dropped from the index."""
+    ids = set(ids)
+    documents = list(SOURCES[kind][1](ids))
+    SearchDocument.objects.bulk_create(
+        documents, update_conflicts=True,
+        unique_fields=['kind', 'object_id'], update_fields=['course', 'title', 'body', 'updated_at']
+    )
+    missing = ids - {document.object_id for document in documents}
+    if missing:
+        SearchDocument.objects.filter(kind=kind, object_id__in=missing).delete()
+    return len(documents)
+
+
+class IndexBatch:
+    def __init__(self):
+        self.pending = {}
+        self.flushed = False
+
+    def add(self, kind, ids):
+        self.pending.setdefault(kind, set()).update(ids)
+
+    def flush(self):
+        self.flushed = True
+        for kind, ids in self.pending.items():
+            index_objects(kind, ids)
+
+
+_local = threading.local()
+
+
+def queue_index(kind, ids):
+    """
+    Reindex ``ids`` once the current transaction commits.
+
+    Everything queued during one transaction is indexed in a single batch per kind,
+    so saving a page of blocks or deleting a question with its choices costs a
+    constant number of queries. Outside a transaction the index is updated right away.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        index_objects(kind, ids)
+        return
+
+    batch = getattr(_local, 'batch', None)
+    # a batch whose transaction was rolled back is no longer waiting on a commit
+    if batch is None or batch.flushed or not any(entry[1] == batch.flush for entry in connection.run_on_commit):
+        batch = _local.batch = IndexBatch()
+        transaction.on_commit(batch.flush)
+    batch.add(kind, ids)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Search.backends import setup_search_index
+from Search.index import SOURCES, index_objects
+from Search.models import SearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from questions, content blocks and discussion posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=list(SOURCES), action='append', help='Only rebuild these kinds (repeatable).')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        setup_search_index()
+        batch_size = options['batch_size']
+        for kind in options['kind'] or SOURCES:
+            model = SOURCES[kind][0]
+            ids = list(model.objects.order_by('pk').values_list('pk', flat=True))
+            with transaction.atomic():
+                SearchDocument.objects.filter(kind=kind).exclude(object_id__in=ids).delete()
+            count = 0
+            for start in range(0, len(ids), batch_size):
+                with transaction.atomic():
+                    count += index_objects(kind, ids[start:start + batch_size])
+            self.stdout.write(f"Indexed {count} {kind} document(s)")
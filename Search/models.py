@@ -0,0 +1,29 @@
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable text of one question, content block or discussion post.
+
+    Rows are kept in sync by Search/signals.py. The full-text index itself lives
+    outside the model (a generated tsvector column with a GIN index on Postgres, an
+    FTS5 table on SQLite), see Search/backends.py.
+    """
+    KIND_CHOICES = [
+        ('question', 'Question'),
+        ('content_block', 'Content Block'),
+        ('post', 'Discussion Post'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    course = models.ForeignKey('Course.Course', on_delete=models.CASCADE, null=True, blank=True, related_name='search_documents')
+    title = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} - {self.title}"
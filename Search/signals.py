@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from Course.models import ContentBlock
+from Course.signals import content_blocks_bulk_saved
+from Discussion.models import Post
+from Question.models import Choice, Question
+from .index import queue_index
+
+
+@receiver([post_save, post_delete], sender=Question)
+def index_question(sender, instance, **kwargs):
+    queue_index('question', [instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def index_choice_question(sender, instance, **kwargs):
+    # choices are searched as part of their question
+    queue_index('question', [instance.question_id])
+
+
+@receiver([post_save, post_delete], sender=ContentBlock)
+def index_content_block(sender, instance, **kwargs):
+    queue_index('content_block', [instance.pk])
+
+
+@receiver(content_blocks_bulk_saved)
+def index_bulk_content_blocks(sender, ids, **kwargs):
+    queue_index('content_block', ids)
+
+
+@receiver([post_save, post_delete], sender=Post)
+def index_post(sender, instance, **kwargs):
+    queue_index('post', [instance.pk])
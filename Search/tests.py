@@ -0,0 +1,82 @@
+from django.core.management import call_command
+from django.test import TestCase
+
+from Course.models import Course, Syllabus, Lesson, Topic, Subtopic, Page, ContentBlock, LearningObjective
+from Discussion.models import Post
+from Question.models import Choice, Question
+from User.models import User
+from .models import SearchDocument
+
+
+class SearchTest(TestCase):
+    def setUp(self):
+        course = Course.objects.create(course_id='SRC101', course_title='Search Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='SRCSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Circuits', order=1)
+        objective = LearningObjective.objects.create(text='Objective', subtopic=subtopic)
+        self.page = Page.objects.create(subtopic=subtopic, page_number=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question = Question.objects.create(learning_objective=objective, text='What does Ohm\'s law relate?', difficulty=1)
+            Choice.objects.create(question=self.question, text='Voltage, current and resistance', is_correct=True)
+            self.block = ContentBlock.objects.create(page=self.page, block_type='lesson', content='<p>Resistors <b>limit</b> current in a circuit.</p>')
+            for i in range(25):
+                ContentBlock.objects.create(page=self.page, block_type='example', content=f'<p>Capacitor example {i}</p>')
+            author = User.objects.create(user_name='poster', password='x', first_name='P', last_name='S', email='p@s.com')
+            Post.objects.create(author=author, title='Help with resistance', content='How do I compute total resistance?')
+
+    def search(self, **params):
+        response = self.client.get('/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranked_results_across_kinds(self):
+        results = self.search(q='resistance')['results']
+        self.assertEqual({(r['kind'], r['object_id']) for r in results}, {
+            ('question', self.question.id), ('post', Post.objects.get().id), ('content_block', self.block.id)
+        })
+        # the post has the word in its title too
+        self.assertEqual(results[0]['kind'], 'post')
+
+        blocks = self.search(q='limit', kind='content_block', course_id='SRC101')['results']
+        self.assertEqual([r['object_id'] for r in blocks], [self.block.id])
+        self.assertNotIn('<p>', blocks[0]['snippet'])
+        self.assertIn('<b>limit</b>', blocks[0]['snippet'])
+
+    def test_paginated(self):
+        first = self.search(q='capacitor')
+        self.assertEqual(first['count'], 25)
+        self.assertEqual(len(first['results']), 20)
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertIsNone(second['next'])
+
+        self.assertEqual(self.client.get('/search/').status_code, 400)
+        self.assertEqual(self.client.get('/search/', {'q': 'x', 'kind': 'bogus'}).status_code, 400)
+
+    def test_index_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Choice.objects.create(question=self.question, text='Inductance only')
+        self.assertEqual(len(self.search(q='inductance')['results']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.question.delete()
+        self.assertEqual(self.search(q='inductance')['count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/pages/{self.page.pk}/blocks/', {'blocks': [
+                {'block_id': self.block.id, 'block_type': 'lesson', 'content': 'Diodes'},
+                {'block_type': 'example', 'content': 'Transistors'},
+            ]}, content_type='application/json')
+        self.assertEqual(self.search(q='capacitor')['count'], 0)
+        self.assertEqual(self.search(q='diodes')['count'], 1)
+        self.assertEqual(self.search(q='transistors')['count'], 1)
+
+    def test_rebuild_command(self):
+        SearchDocument.objects.all().delete()
+        call_command('rebuild_search_index', stdout=open('/dev/null', 'w'))
+        self.assertEqual(SearchDocument.objects.count(), 28)
+        self.assertEqual(self.search(q='ohm')['results'][0]['object_id'], self.question.id)
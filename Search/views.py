@@ -0,0 +1,55 @@
+from rest_framework import status, viewsets
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .backends import search
+from .models import SearchDocument
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def _positive_int(value, default):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+class SearchViewSet(viewsets.ViewSet):
+    """
+    Ranked full-text search: ``/search/?q=...&kind=question,content_block&course_id=...&page=2``.
+
+    Results are SearchDocument hits (kind + object_id + a highlighted snippet), not the
+    full objects, so a page of results stays small.
+    """
+
+    def list(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Missing search query (q)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+        valid_kinds = dict(SearchDocument.KIND_CHOICES)
+        if any(kind not in valid_kinds for kind in kinds):
+            return Response({"detail": f"kind must be one of {', '.join(valid_kinds)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = _positive_int(request.query_params.get('page'), 1)
+        page_size = min(_positive_int(request.query_params.get('page_size'), PAGE_SIZE), MAX_PAGE_SIZE)
+        results = search(
+            query, kinds=kinds, course_id=request.query_params.get('course_id'),
+            limit=page_size, offset=(page - 1) * page_size
+        )
+
+        url = request.build_absolute_uri()
+        has_next = page * page_size < results.total
+        previous = None
+        if page > 1:
+            previous = replace_query_param(url, 'page', page - 1) if page > 2 else remove_query_param(url, 'page')
+        return Response({
+            "count": results.total,
+            "next": replace_query_param(url, 'page', page + 1) if has_next else None,
+            "previous": previous,
+            "results": results.rows,
+        })
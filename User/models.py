@@ -1,4 +1,9 @@
-from django.db import models
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import connection, models
+from django.db.models import Count, Sum
+from django.utils import timezone
 
 from Subscription.models import Subscription
 
@@ -50,6 +55,13 @@ class Student(User):
         self.user_type = 'S'
         super(Student, self).save(*args, **kwargs)
 
+MASTERY_WEIGHTS = { # weights for each difficulty pwede pa ma adjust
+    1: 0.75,
+    2: 0.85,
+    3: 1
+}
+
+
 class StudentMastery(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
     learning_objective = models.ForeignKey("Course.LearningObjective", on_delete=models.CASCADE, related_name='mastery')
@@ -62,12 +74,11 @@ class StudentMastery(models.Model):
     def __str__(self):
         return f"{self.student.user_name} - {self.objective} - Mastery: {self.mastery_level}%"
 
+    class Meta:
+        unique_together = ('student', 'learning_objective')
+
     def update_mastery(self, answers):
-        weights = { # weights for each difficulty pwede pa ma adjust
-            1: 0.75,
-            2: 0.85,
-            3: 1
-        }
+        weights = MASTERY_WEIGHTS
 
         current_total_weights_attempted = 0
         current_total_weights_correct = 0
@@ -84,6 +95,174 @@ class StudentMastery(models.Model):
 
         self.save()
 
+    @classmethod
+    def bulk_update_mastery(cls, student, answers_by_objective):
+        """
+        Apply ``{objective: [(difficulty, is_correct), ...]}`` for one student in a single statement.
+
+        Every objective becomes one row of an ``INSERT ... ON CONFLICT DO UPDATE``; the running
+        totals are incremented by the database so concurrent submits cannot overwrite each
+        other, and mastery_level is set to this batch's weighted ratio like update_mastery does.
+        Returns ``{learning_objective_id: mastery_level}``.
+        """
+        rows = []
+        for objective, answers in answers_by_objective.items():
+            if not answers:
+                continue
+            attempted = sum(Decimal(str(MASTERY_WEIGHTS[difficulty])) for difficulty, _ in answers)
+            correct = sum((Decimal(str(MASTERY_WEIGHTS[difficulty])) for difficulty, is_correct in answers if is_correct), Decimal(0))
+            rows.append((getattr(objective, 'pk', objective), len(answers), attempted, correct))
+        if not rows:
+            return {}
+        rows.sort()  # same lock order for every writer
+
+        ops = connection.ops
+        qn = ops.quote_name
+        table = qn(cls._meta.db_table)
+        column = {name: qn(cls._meta.get_field(name).column) for name in (
+            'student', 'learning_objective', 'mastery_level', 'questions_attempted',
+            'total_weights_attempted', 'total_weight_correct', 'last_updated'
+        )}
+        cent = Decimal('0.01')
+        now = ops.adapt_datetimefield_value(timezone.now())
+
+        params = []
+        for objective_id, count, attempted, correct in rows:
+            params += [
+                student.pk, objective_id,
+                ops.adapt_decimalfield_value((correct / attempted * 100).quantize(cent), 5, 2),
+                count,
+                ops.adapt_decimalfield_value(attempted.quantize(cent), 10, 2),
+                ops.adapt_decimalfield_value(correct.quantize(cent), 10, 2),
+                now,
+            ]
+
+        sql = (
+            f"INSERT INTO {table} ({', '.join(column.values())}) "
+            f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s, %s)'] * len(rows))} "
+            f"ON CONFLICT ({column['student']}, {column['learning_objective']}) DO UPDATE SET "
+            f"{column['mastery_level']} = EXCLUDED.{column['mastery_level']}, "
+            f"{column['questions_attempted']} = {table}.{column['questions_attempted']} + EXCLUDED.{column['questions_attempted']}, "
+            f"{column['total_weights_attempted']} = {table}.{column['total_weights_attempted']} + EXCLUDED.{column['total_weights_attempted']}, "
+            f"{column['total_weight_correct']} = {table}.{column['total_weight_correct']} + EXCLUDED.{column['total_weight_correct']}, "
+            f"{column['last_updated']} = EXCLUDED.{column['last_updated']} "
+            f"RETURNING {column['learning_objective']}, {column['mastery_level']}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return {objective_id: Decimal(str(level)).quantize(cent) for objective_id, level in cursor.fetchall()}
+
+
+class StudentMasteryRollup(models.Model):
+    """
+    Per-student average mastery for every node of a course tree, kept in sync with StudentMastery.
+
+    Saving or deleting a StudentMastery refreshes its rollups (User/signals.py); the
+    bulk upsert in bulk_update_mastery skips signals, so apply_mastery_updates refreshes
+    explicitly. Other writes that skip signals (queryset.update) are only corrected by
+    rebuild().
+
+    ``node_id`` is the objective/subtopic/topic/lesson id; course rows use node_id 0 and
+    are identified by ``course``. Every row carries its course so a whole dashboard tree
+    is one indexed read.
+    """
+    LEVELS = [
+        ('objective', 'Learning objective'),
+        ('subtopic', 'Subtopic'),
+        ('topic', 'Topic'),
+        ('lesson', 'Lesson'),
+        ('course', 'Course'),
+    ]
+    LEVEL_LOOKUPS = {
+        'objective': 'learning_objective_id',
+        'subtopic': 'learning_objective__subtopic_id',
+        'topic': 'learning_objective__subtopic__topic_id',
+        'lesson': 'learning_objective__subtopic__topic__lesson_id',
+        'course': 'learning_objective__subtopic__topic__lesson__syllabus__course_id',
+    }
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='mastery_rollups')
+    course = models.ForeignKey("Course.Course", on_delete=models.CASCADE, related_name='mastery_rollups')
+    level = models.CharField(max_length=10, choices=LEVELS)
+    node_id = models.IntegerField()
+    mastery_total = models.DecimalField(max_digits=12, decimal_places=2, default=0.0)
+    objective_count = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('student', 'course', 'level', 'node_id')
+
+    def __str__(self):
+        return f"{self.student_id} - {self.level} {self.node_id} - Mastery: {self.mastery}%"
+
+    @property
+    def mastery(self):
+        if not self.objective_count:
+            return 0.0
+        return self.mastery_total / self.objective_count
+
+    @classmethod
+    def refresh(cls, student_id, objective_ids):
+        """Recompute the rollups of the given objectives and all of their ancestors for one student."""
+        LearningObjective = apps.get_model('Course', 'LearningObjective')
+        paths = LearningObjective.objects.filter(id__in=objective_ids).values_list(
+            'id', 'subtopic_id', 'subtopic__topic_id', 'subtopic__topic__lesson_id', 'subtopic__topic__lesson__syllabus__course_id'
+        )
+
+        nodes = {level: {} for level, _ in cls.LEVELS}
+        for objective_id, subtopic_id, topic_id, lesson_id, course_id in paths:
+            nodes['objective'][objective_id] = course_id
+            nodes['subtopic'][subtopic_id] = course_id
+            nodes['topic'][topic_id] = course_id
+            nodes['lesson'][lesson_id] = course_id
+            nodes['course'][course_id] = course_id
+        if not nodes['course']:
+            return
+
+        masteries = StudentMastery.objects.filter(student_id=student_id)
+        now = timezone.now()
+        rollups = []
+        seen = set()
+        for level, lookup in cls.LEVEL_LOOKUPS.items():
+            totals = masteries.filter(**{f'{lookup}__in': nodes[level].keys()}).values(lookup).annotate(
+                total=Sum('mastery_level'), count=Count('id')
+            )
+            for row in totals:
+                node = row[lookup]
+                seen.add((level, node))
+                rollups.append(cls(
+                    student_id=student_id,
+                    course_id=nodes[level][node],
+                    level=level,
+                    node_id=0 if level == 'course' else node,
+                    mastery_total=row['total'],
+                    objective_count=row['count'],
+                    last_updated=now,
+                ))
+
+        cls.objects.bulk_create(
+            rollups,
+            update_conflicts=True,
+            unique_fields=['student', 'course', 'level', 'node_id'],
+            update_fields=['mastery_total', 'objective_count', 'last_updated'],
+        )
+
+        # nodes left without any mastery row (deleted masteries) lose their rollup
+        for level, course_by_node in nodes.items():
+            missing = [node for node in course_by_node if (level, node) not in seen]
+            if missing:
+                lookup = {'course_id__in': missing} if level == 'course' else {'node_id__in': missing}
+                cls.objects.filter(student_id=student_id, level=level, **lookup).delete()
+
+    @classmethod
+    def rebuild(cls, student_id, course):
+        """Build the rollups for a course from scratch, e.g. for masteries recorded before rollups existed."""
+        objective_ids = StudentMastery.objects.filter(
+            student_id=student_id, learning_objective__subtopic__topic__lesson__syllabus__course=course
+        ).values_list('learning_objective_id', flat=True)
+        cls.refresh(student_id, list(objective_ids))
+
+
 class Teacher(User):
     name = models.CharField(null=False, max_length=255, blank=False)
     specialization = models.ForeignKey(Specialization, on_delete=models.CASCADE)
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Student, StudentMastery, StudentMasteryRollup
+
+
+@receiver(post_save, sender=StudentMastery)
+@receiver(post_delete, sender=StudentMastery)
+def refresh_mastery_rollups(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or isinstance(origin, Student):
+        return  # a deleted student's rollups are deleted with them
+    StudentMasteryRollup.refresh(instance.student_id, [instance.learning_objective_id])
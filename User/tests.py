@@ -1,3 +1,73 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from Course.models import Course, Syllabus, Lesson, Topic, Subtopic, LearningObjective
+from Question.models import Question
+from Question.scoring import apply_mastery_updates
+from .models import Student, Specialization, StudentMastery, StudentMasteryRollup
+
+
+class StudentMasteryTest(TestCase):
+    def setUp(self):
+        specialization = Specialization.objects.create(name='1')
+        self.student = Student.objects.create(user_name='mastery', password='x', first_name='M', last_name='S', email='m@s.com', specialization=specialization)
+        course = Course.objects.create(course_id='MST101', course_title='Mastery Course', short_description='')
+        syllabus = Syllabus.objects.create(course=course, syllabus_id='MSTSYL')
+        lesson = Lesson.objects.create(syllabus=syllabus, lesson_title='Lesson', order=1)
+        topic = Topic.objects.create(lesson=lesson, topic_title='Topic', order=1)
+        subtopic = Subtopic.objects.create(topic=topic, subtopic_title='Subtopic', order=1)
+        self.first = LearningObjective.objects.create(text='First', subtopic=subtopic)
+        self.second = LearningObjective.objects.create(text='Second', subtopic=subtopic)
+
+    def test_inserts_and_increments_in_one_statement(self):
+        with self.assertNumQueries(1):
+            levels = StudentMastery.bulk_update_mastery(self.student, {
+                self.first: [(1, True), (3, False)],
+                self.second.id: [(2, True)],
+            })
+        self.assertEqual(levels, {self.first.id: Decimal('42.86'), self.second.id: Decimal('100.00')})
+
+        levels = StudentMastery.bulk_update_mastery(self.student, {self.first: [(3, True)]})
+        self.assertEqual(levels, {self.first.id: Decimal('100.00')})
+
+        mastery = StudentMastery.objects.get(student=self.student, learning_objective=self.first)
+        self.assertEqual(mastery.questions_attempted, 3)
+        self.assertEqual(mastery.total_weights_attempted, Decimal('2.75'))
+        self.assertEqual(mastery.total_weight_correct, Decimal('1.75'))
+        self.assertEqual(StudentMastery.objects.filter(student=self.student).count(), 2)
+
+    def test_course_tree_is_served_from_rollups(self):
+        easy = Question.objects.create(learning_objective=self.first, text='Easy', difficulty=1)
+        hard = Question.objects.create(learning_objective=self.second, text='Hard', difficulty=3)
+        apply_mastery_updates(self.student, {
+            self.first: [{'question': easy, 'is_correct': True}],
+            self.second: [{'question': hard, 'is_correct': False}],
+        })
+
+        response = self.client.get('/mastery/', {'student_id': self.student.pk, 'course_id': 'MST101'})
+        self.assertEqual(response.status_code, 200)
+        masteries = response.json()['masteries']
+        self.assertEqual(masteries['course_mastery'], 50.0)
+        subtopic = masteries['syllabus'][0]['topics'][0]['subtopics'][0]
+        self.assertEqual(subtopic['mastery'], 50.0)
+        self.assertEqual([lo['mastery'] for lo in subtopic['learning_objectives']], [100.0, 0.0])
+
+    def test_rollups_are_rebuilt_when_missing(self):
+        StudentMastery.bulk_update_mastery(self.student, {self.first: [(2, True)]})
+        response = self.client.get('/mastery/', {'student_id': self.student.pk, 'course_id': 'MST101'})
+        self.assertEqual(response.json()['masteries']['course_mastery'], 100.0)
+
+    def test_deleting_masteries_refreshes_rollups(self):
+        StudentMastery.bulk_update_mastery(self.student, {self.first: [(1, True)], self.second: [(1, False)]})
+        StudentMasteryRollup.refresh(self.student.pk, [self.first.id, self.second.id])
+        course = StudentMasteryRollup.objects.get(student=self.student, level='course')
+        self.assertEqual(course.mastery, 50)
+
+        StudentMastery.objects.filter(learning_objective=self.second).delete()
+        course.refresh_from_db()
+        self.assertEqual(course.mastery, 100)
+        self.assertFalse(StudentMasteryRollup.objects.filter(student=self.student, level='objective', node_id=self.second.id).exists())
+
+        StudentMastery.objects.all().delete()
+        self.assertFalse(StudentMasteryRollup.objects.filter(student=self.student).exists())
@@ -10,9 +10,9 @@ from rest_framework.views import APIView
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
-from Course.models import Course, LearningObjective
+from Course.models import Course
 from .serializers import StudentSerializer, TeacherSerializer, UserSerializer, ContentCreatorSerializer, SpecializationSerializer, StudentMasterySerializer
-from .models import Student, Teacher, User, Specialization, ContentCreator, StudentMastery
+from .models import Student, Teacher, User, Specialization, ContentCreator, StudentMastery, StudentMasteryRollup
 import jwt, datetime
 
 class StudentViewSet(viewsets.ModelViewSet):
@@ -261,11 +261,12 @@ class StudentMasteryView(viewsets.ModelViewSet):
             if not syllabus:
                 return Response({'error': 'No syllabus found for this course'}, status=status.HTTP_404_NOT_FOUND)
 
-            syllabus_data = self._build_syllabus_data(syllabus, masteries)
+            rollups = self._load_rollups(student_id, course)
+            syllabus_data = self._build_syllabus_data(syllabus, rollups)
             return Response({
                 "masteries": {
                     "course_id": course.course_id,
-                    "course_mastery": self._calculate_mastery_for_course(course, masteries),
+                    "course_mastery": rollups.get(('course', 0), 0.0),
                     "course_title": course.course_title,
                     "syllabus": syllabus_data
                 }
@@ -274,13 +275,22 @@ class StudentMasteryView(viewsets.ModelViewSet):
         serializer = self.get_serializer(masteries, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
         
-    def _build_syllabus_data(self, syllabus, masteries):
+    def _load_rollups(self, student_id, course):
+        rollups = StudentMasteryRollup.objects.filter(student_id=student_id, course=course)
+        loaded = list(rollups)
+        if not loaded:
+            StudentMasteryRollup.rebuild(student_id, course)
+            loaded = list(rollups.all())
+        return {(rollup.level, rollup.node_id): rollup.mastery for rollup in loaded}
+
+    def _build_syllabus_data(self, syllabus, rollups):
+        lessons = syllabus.lessons.prefetch_related('topics__subtopics__learning_objectives')
         syllabus_data = []
-        for lesson in syllabus.lessons.all():
+        for lesson in lessons:
             lesson_data = {
                 "lesson_id": lesson.id,
                 "lesson_title": lesson.lesson_title,
-                "mastery": self._calculate_mastery_for_lesson(lesson, masteries),
+                "mastery": rollups.get(('lesson', lesson.id), 0.0),
                 "topics": []
             }
 
@@ -288,7 +298,7 @@ class StudentMasteryView(viewsets.ModelViewSet):
                 topic_data = {
                     "topic_id": topic.id,
                     "topic_title": topic.topic_title,
-                    "mastery": self._calculate_mastery_for_topic(topic, masteries),
+                    "mastery": rollups.get(('topic', topic.id), 0.0),
                     "subtopics": []
                 }
 
@@ -296,45 +306,18 @@ class StudentMasteryView(viewsets.ModelViewSet):
                     subtopic_data = {
                         "subtopic_id": subtopic.id,
                         "subtopic_title": subtopic.subtopic_title,
-                        "mastery": self._calculate_mastery_for_subtopic(subtopic, masteries),
+                        "mastery": rollups.get(('subtopic', subtopic.id), 0.0),
                         "learning_objectives": []
                     }
 
                     for learning_objective in subtopic.learning_objectives.all():
-                        mastery = masteries.filter(learning_objective=learning_objective).first()
-                        lo_mastery = mastery.mastery_level if mastery else 0.0
-
                         learning_objective_data = {
                             "objective_id": learning_objective.id,
                             "objective_text": learning_objective.text,
-                            "mastery": lo_mastery
+                            "mastery": rollups.get(('objective', learning_objective.id), 0.0)
                         }
                         subtopic_data['learning_objectives'].append(learning_objective_data)
                     topic_data['subtopics'].append(subtopic_data)
                 lesson_data['topics'].append(topic_data)
             syllabus_data.append(lesson_data)
         return syllabus_data
-
-        
-    def _calculate_mastery_for_course(self, course, masteries):
-        objectives = LearningObjective.objects.filter(subtopic__topic__lesson__syllabus__course=course)
-        return self._calculate_mastery(objectives, masteries)
-
-    def _calculate_mastery_for_lesson(self, lesson, masteries):
-        objectives = LearningObjective.objects.filter(subtopic__topic__lesson=lesson)
-        return self._calculate_mastery(objectives, masteries)
-
-    def _calculate_mastery_for_topic(self, topic, masteries):
-        objectives = LearningObjective.objects.filter(subtopic__topic=topic)
-        return self._calculate_mastery(objectives, masteries)
-
-    def _calculate_mastery_for_subtopic(self, subtopic, masteries):
-        objectives = LearningObjective.objects.filter(subtopic=subtopic)
-        return self._calculate_mastery(objectives, masteries)
-
-    def _calculate_mastery(self, objectives, masteries):
-        relevant_masteries = masteries.filter(learning_objective__in=objectives)
-        if not relevant_masteries.exists():
-            return 0.0
-        total_mastery = sum(mastery.mastery_level for mastery in relevant_masteries)
-        return total_mastery / relevant_masteries.count()
\ No newline at end of file
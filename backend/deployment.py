@@ -96,6 +96,8 @@ SITE_URL = 'https://' + os.environ.get('WEBSITE_HOSTNAME', 'localhost:8000')
 AZURE_ACCOUNT_NAME = os.environ.get('AZURE_ACCOUNT_NAME')
 AZURE_ACCOUNT_KEY = os.environ.get('AZURE_ACCOUNT_KEY')
 AZURE_CONTAINER = os.environ.get('AZURE_CONTAINER')
+# media blobs are named by their hash (Media/storage.py) and files are never overwritten, so they can be cached forever
+AZURE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
 
 DEFAULT_FILE_STORAGE = 'storages.backends.azure_storage.AzureStorage'
 
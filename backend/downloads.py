@@ -0,0 +1,168 @@
+"""
+Serving stored files (attachments, uploads) without pushing the bytes through Python.
+
+FILE_DOWNLOAD_MODE picks how:
+
+* ``direct``: a FileResponse over the open file, so the WSGI server can use
+  ``wsgi.file_wrapper``/sendfile. Supports ``Range`` (single range, 206/416),
+  ``If-Range``, ``ETag``/``Last-Modified`` conditional requests and ``Content-Length``.
+* ``redirect``: 302 to the storage URL (a signed blob URL on Azure), the storage
+  service then handles ranges and caching. Storages whose ``url()`` takes
+  ``parameters`` (Azure) are asked to send the download name as Content-Disposition.
+* ``accel``: an empty response with ``X-Accel-Redirect`` under
+  FILE_DOWNLOAD_ACCEL_PREFIX for an nginx ``internal`` location to serve.
+* ``auto`` (default): ``direct`` when the storage has local paths, else ``redirect``.
+"""
+import hashlib
+import inspect
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class RangeFile:
+    """Read-only window ``[start, start + length)`` of an open file; keeps fileno() so sendfile still works."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) for a single ``bytes=`` range, or None to send the whole
+    file (no header, several ranges or a malformed one). Raises RangeNotSatisfiable.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = size - 1 if last == '' else min(int(last), size - 1)
+    if start >= size:
+        raise RangeNotSatisfiable
+    if end < start:
+        return None
+    return start, end
+
+
+def file_validators(storage, name, size):
+    try:
+        modified = storage.get_modified_time(name)
+    except (NotImplementedError, AttributeError):
+        modified = None
+    last_modified = int(modified.timestamp()) if modified else None
+    etag = '"%s"' % hashlib.md5(f"{name}:{size}:{last_modified}".encode()).hexdigest()
+    return etag, last_modified
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    return last_modified is not None and parse_http_date_safe(if_range) == last_modified
+
+
+def download_mode(storage):
+    mode = getattr(settings, 'FILE_DOWNLOAD_MODE', 'auto')
+    if mode != 'auto':
+        return mode
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return 'redirect'
+    return 'direct'
+
+
+def storage_url(storage, name, parameters=None):
+    """``storage.url(name)``, passing ``parameters`` (SAS overrides on Azure) to storages that accept them."""
+    if parameters and 'parameters' in inspect.signature(storage.url).parameters:
+        return storage.url(name, parameters=parameters)
+    return storage.url(name)
+
+
+def serve_file(request, field_file, filename=None, as_attachment=True, cache_control='private, max-age=3600'):
+    """Response that delivers ``field_file`` (a FieldFile) per FILE_DOWNLOAD_MODE, see the module docstring."""
+    storage, name = field_file.storage, field_file.name
+    filename = filename or os.path.basename(name)
+    mode = download_mode(storage)
+
+    if mode == 'redirect':
+        disposition = content_disposition_header(as_attachment, filename)
+        return HttpResponseRedirect(storage_url(storage, name, {'content_disposition': disposition}))
+
+    if mode == 'accel':
+        response = HttpResponse(content_type='')
+        del response['Content-Type']  # let nginx set it from the file
+        response['X-Accel-Redirect'] = settings.FILE_DOWNLOAD_ACCEL_PREFIX + quote(name)
+        response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+        response['Cache-Control'] = cache_control
+        return response
+
+    size = storage.size(name)
+    etag, last_modified = file_validators(storage, name, size)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    file = storage.open(name, 'rb')
+    if byte_range:
+        start, end = byte_range
+        response = FileResponse(RangeFile(file, start, end - start + 1), as_attachment=as_attachment, filename=filename, status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(file, as_attachment=as_attachment, filename=filename)
+        response['Content-Length'] = size
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control
+    return response
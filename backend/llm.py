@@ -0,0 +1,246 @@
+"""
+One process-wide gateway for chat completions (feedback, lesson summaries, question generation).
+
+The OpenAI client is created lazily on first use and reused, so its HTTP connection
+pool (and TLS sessions) survive between requests. LLM_MAX_CONCURRENCY caps how many
+calls one worker process has in flight at a time. Set LLM_BACKEND = 'stub' (or a
+dotted path to a class with a ``complete(messages, model)`` method) to run offline.
+
+Replies are cached in the 'llm' cache under a hash of the model and messages, so an
+identical prompt (the same lesson summary, a retake with the same answers) is only
+sent once per LLM_CACHE_TTL. Pass ``cache=False`` where a fresh reply is wanted.
+stream() is the token-by-token variant used by the server-sent-event endpoints, and
+astream() is its async twin for requests served under ASGI, where a stream waiting on
+the model should not hold a worker thread.
+"""
+import hashlib
+import json
+import re
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class LLMError(Exception):
+    pass
+
+
+class OpenAIBackend:
+    """Raises LLMError for any OpenAI failure (API errors, timeouts, rate limits), mid-stream too."""
+
+    def __init__(self):
+        import httpx
+        from openai import OpenAI
+
+        self._async_client = None
+        self.client = OpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            timeout=settings.LLM_TIMEOUT,
+            max_retries=settings.LLM_MAX_RETRIES,
+            http_client=httpx.Client(limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+            )),
+        )
+
+    def complete(self, messages, model):
+        from openai import OpenAIError
+
+        try:
+            completion = self.client.chat.completions.create(model=model, messages=messages)
+        except OpenAIError as e:
+            raise LLMError(f'The AI service failed: {e}') from e
+        return completion.choices[0].message.content.strip()
+
+    def stream(self, messages, model):
+        from openai import OpenAIError
+
+        try:
+            for chunk in self.client.chat.completions.create(model=model, messages=messages, stream=True):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except OpenAIError as e:
+            raise LLMError(f'The AI service failed: {e}') from e
+
+    @property
+    def async_client(self):
+        # Created on first async use so WSGI processes never open a second pool.
+        if self._async_client is None:
+            import httpx
+            from openai import AsyncOpenAI
+
+            self._async_client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                timeout=settings.LLM_TIMEOUT,
+                max_retries=settings.LLM_MAX_RETRIES,
+                http_client=httpx.AsyncClient(limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                )),
+            )
+        return self._async_client
+
+    async def astream(self, messages, model):
+        from openai import OpenAIError
+
+        try:
+            chunks = await self.async_client.chat.completions.create(model=model, messages=messages, stream=True)
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except OpenAIError as e:
+            raise LLMError(f'The AI service failed: {e}') from e
+
+
+class StubBackend:
+    """Offline backend for tests and local work: answers every prompt with LLM_STUB_RESPONSE."""
+
+    def complete(self, messages, model):
+        return getattr(settings, 'LLM_STUB_RESPONSE', 'Stub response')
+
+    def stream(self, messages, model):
+        yield from re.findall(r'\S+\s*', self.complete(messages, model))
+
+    async def astream(self, messages, model):
+        for part in self.stream(messages, model):
+            yield part
+
+
+BACKENDS = {
+    'openai': OpenAIBackend,
+    'stub': StubBackend,
+}
+
+_lock = threading.Lock()
+_backend = None
+_slots = None
+
+cache_stats = {'hits': 0, 'misses': 0}
+
+
+def get_backend():
+    global _backend, _slots
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                name = settings.LLM_BACKEND
+                backend_class = BACKENDS[name] if name in BACKENDS else import_string(name)
+                _slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+                _backend = backend_class()
+    return _backend
+
+
+def reset():
+    global _backend
+    with _lock:
+        _backend = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting.startswith('LLM_') or setting == 'OPENAI_API_KEY':
+        reset()
+
+
+def cache_key(messages, model):
+    prompt = json.dumps([model, messages], sort_keys=True, ensure_ascii=False)
+    return 'llm:' + hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def _count(stat):
+    with _lock:
+        cache_stats[stat] += 1
+
+
+def _cached(messages, model):
+    reply = caches['llm'].get(cache_key(messages, model))
+    _count('misses' if reply is None else 'hits')
+    return reply
+
+
+async def _acached(messages, model):
+    reply = await caches['llm'].aget(cache_key(messages, model))
+    _count('misses' if reply is None else 'hits')
+    return reply
+
+
+def _acquire_slot():
+    backend = get_backend()
+    if not _slots.acquire(timeout=settings.LLM_TIMEOUT):
+        raise LLMError('Too many AI requests in progress, please try again.')
+    return backend, _slots
+
+
+def complete(messages, model='gpt-3.5-turbo', cache=True):
+    """Run one chat completion and return the stripped reply text."""
+    if cache:
+        reply = _cached(messages, model)
+        if reply is not None:
+            return reply
+
+    backend, slots = _acquire_slot()
+    try:
+        reply = backend.complete(messages, model)
+    finally:
+        slots.release()
+
+    if cache:
+        caches['llm'].set(cache_key(messages, model), reply)
+    return reply
+
+
+def stream(messages, model='gpt-3.5-turbo', cache=True):
+    """
+    Yield the reply text piece by piece as the model produces it.
+
+    The concurrency slot is held until the stream finishes or is closed. A reply that
+    is already cached comes back as a single piece; a completed stream is cached.
+    """
+    if cache:
+        reply = _cached(messages, model)
+        if reply is not None:
+            yield reply
+            return
+
+    backend, slots = _acquire_slot()
+    parts = []
+    try:
+        for part in backend.stream(messages, model):
+            parts.append(part)
+            yield part
+    finally:
+        slots.release()
+
+    if cache:
+        caches['llm'].set(cache_key(messages, model), ''.join(parts).strip())
+
+
+async def astream(messages, model='gpt-3.5-turbo', cache=True):
+    """
+    Async version of stream(), for ASGI requests; the backend must provide ``astream``.
+
+    It shares the same concurrency slots. Waiting for a free slot happens in a
+    thread, but the stream itself runs on the event loop.
+    """
+    if cache:
+        reply = await _acached(messages, model)
+        if reply is not None:
+            yield reply
+            return
+
+    backend, slots = await sync_to_async(_acquire_slot, thread_sensitive=False)()
+    parts = []
+    try:
+        async for part in backend.astream(messages, model):
+            parts.append(part)
+            yield part
+    finally:
+        slots.release()
+
+    if cache:
+        await caches['llm'].aset(cache_key(messages, model), ''.join(parts).strip())
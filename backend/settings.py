@@ -53,6 +53,9 @@ INSTALLED_APPS = [
     'Discussion',
     'Preassessment',
     'Mocktest',
+    'Jobs',
+    'Search',
+    'Media',
     'rest_framework',
     'storages',
     'django_ckeditor_5',
@@ -96,6 +99,9 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 CKEDITOR_UPLOAD_PATH = 'uploads/'
 CKEDITOR_IMAGE_BACKEND = "pillow"
+# editor uploads are content-addressed and never garbage collected, see Media/storage.py
+CKEDITOR_STORAGE_BACKEND = 'Media.storage.PinnedBlobStorage'
+CKEDITOR_5_FILE_STORAGE = 'Media.storage.PinnedBlobStorage'
 SITE_URL = 'https://' + os.environ.get('WEBSITE_HOSTNAME', 'localhost:8000')
 
 TEMPLATES = [
@@ -134,6 +140,60 @@ DATABASES = {
 
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
 
+# AI features, see backend/llm.py
+OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 60))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+LLM_MAX_CONNECTIONS = int(os.environ.get('LLM_MAX_CONNECTIONS', 20))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+
+# how stored files are downloaded: 'auto', 'direct', 'redirect' or 'accel', see backend/downloads.py
+FILE_DOWNLOAD_MODE = os.environ.get('FILE_DOWNLOAD_MODE', 'auto')
+FILE_DOWNLOAD_ACCEL_PREFIX = os.environ.get('FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+
+# unreferenced media blobs younger than this are kept by gc_media_blobs, see Media/refs.py
+MEDIA_BLOB_GC_GRACE = int(os.environ.get('MEDIA_BLOB_GC_GRACE', 60 * 60 * 24))
+
+# resized copies of course and editor images, see Media/images.py
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '320,640,1280').split(',')]
+IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 80))
+
+# resumable uploads, see Course/uploads.py
+UPLOAD_TEMP_DIR = os.environ.get('UPLOAD_TEMP_DIR', os.path.join(BASE_DIR, 'media', '.upload-sessions'))
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 5 * 1024 * 1024))
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 2 * 1024 * 1024 * 1024))
+UPLOAD_SESSION_TTL = int(os.environ.get('UPLOAD_SESSION_TTL', 60 * 60 * 24))
+UPLOAD_CHUNK_TIMEOUT = int(os.environ.get('UPLOAD_CHUNK_TIMEOUT', 60 * 10))  # seconds before an unfinished chunk write can be taken over
+
+# link attachment previews, see Class/previews.py
+LINK_PREVIEW_TIMEOUT = float(os.environ.get('LINK_PREVIEW_TIMEOUT', 5))
+LINK_PREVIEW_MAX_AGE = int(os.environ.get('LINK_PREVIEW_MAX_AGE', 60 * 60 * 24 * 30))
+
+# 'db' or 'local', see Challenge/leaderboard.py
+LEADERBOARD_BACKEND = os.environ.get('LEADERBOARD_BACKEND', 'db')
+
+# seconds between checks of the question table's watermark by each process's pool, see Question/pool.py
+QUESTION_POOL_CHECK_INTERVAL = float(os.environ.get('QUESTION_POOL_CHECK_INTERVAL', 5))
+
+# near-duplicate questions at ingest: 'flag' keeps them (marked duplicate_of), 'reject' skips them, see Question/dedup.py
+QUESTION_DUPLICATE_MODE = os.environ.get('QUESTION_DUPLICATE_MODE', 'flag')
+QUESTION_DUPLICATE_THRESHOLD = float(os.environ.get('QUESTION_DUPLICATE_THRESHOLD', 0.7))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'llm': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'llm',
+        'TIMEOUT': int(os.environ.get('LLM_CACHE_TTL', 60 * 60 * 24 * 7)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 2000)),
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -0,0 +1,87 @@
+"""
+Helpers for server-sent-event (text/event-stream) endpoints.
+
+relay_llm() picks how a model reply is relayed from the request it serves. Under
+ASGI the events come from an async generator over llm.astream(), so an open stream
+waits on the event loop instead of a worker thread. Under WSGI a sync generator
+over llm.stream() is used, because Django would buffer an async one in full.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from backend import llm
+
+logger = logging.getLogger(__name__)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets DRF accept ``Accept: text/event-stream`` (what EventSource sends) on streaming
+    actions. Plain Responses returned by those actions (validation errors, 404s) are
+    sent as a single ``error`` event.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return event(data, 'error')
+
+
+def event(data, name=None):
+    lines = f"event: {name}\n" if name else ""
+    return f"{lines}data: {json.dumps(data)}\n\n"
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+    return response
+
+
+def relay_llm(request, messages, finish, model='gpt-3.5-turbo'):
+    """
+    Stream a model reply as ``text`` events, then a ``done`` event whose data is
+    ``finish(text)``. ``finish`` is sync and may use the ORM. Any failure of the model
+    call ends the stream with an ``error`` event and ``finish`` is not called.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return event_stream_response(_arelay(messages, finish, model))
+    return event_stream_response(_relay(messages, finish, model))
+
+
+def _relay(messages, finish, model):
+    parts = []
+    try:
+        for part in llm.stream(messages, model=model):
+            parts.append(part)
+            yield event({"text": part})
+    except Exception as e:
+        yield _error_event(e)
+        return
+    yield event(finish(''.join(parts).strip()), 'done')
+
+
+async def _arelay(messages, finish, model):
+    parts = []
+    try:
+        async for part in llm.astream(messages, model=model):
+            parts.append(part)
+            yield event({"text": part})
+    except Exception as e:
+        yield _error_event(e)
+        return
+    yield event(await sync_to_async(finish)(''.join(parts).strip()), 'done')
+
+
+def _error_event(error):
+    if isinstance(error, llm.LLMError):
+        return event({"detail": str(error)}, 'error')
+    logger.exception('LLM stream failed')
+    return event({"detail": "The AI service failed, please try again."}, 'error')
@@ -5,7 +5,7 @@ from django.conf import settings
 from django.conf.urls.static import static
 
 from Challenge.views import ChallengeViewSet, StudentChallengeAttemptViewSet
-from Course.views import CourseViewSet, LearningObjectiveViewSet, StudentCourseProgressViewSet, StudentLessonProgressViewSet, SyllabusViewSet, LessonViewSet, FileUploadViewSet, PageViewSet, ContentBlockViewSet, TopicViewSet, SubtopicViewSet, UploadFileView
+from Course.views import CourseViewSet, LearningObjectiveViewSet, StudentCourseProgressViewSet, StudentLessonProgressViewSet, SyllabusViewSet, LessonViewSet, FileUploadViewSet, PageViewSet, ContentBlockViewSet, TopicViewSet, SubtopicViewSet, UploadFileView, UploadSessionViewSet
 from Class.views import ClassViewSet, PostViewSet, CommentViewSet, JoinRequestViewSet, ActivityViewSet, SubmissionViewSet, AttachmentViewSet
 from Exam.views import ExamViewSet, StudentExamAttemptViewSet
 from Question.views import QuestionViewSet, ChoiceViewSet, StudentAnswerViewSet
@@ -13,6 +13,9 @@ from Quiz.views import QuizViewSet, StudentQuizAttemptViewSet
 from User.views import StudentViewSet, TeacherViewSet, SpecializationViewSet, StudentMasteryView
 from Preassessment.views import PreassessmentViewSet, StudentPreassessmentAttemptViewSet
 from Mocktest.views import MocktestViewSet, StudentMocktestAttemptViewSet, MocktestSetQuestionViewSet, MocktestQuestionViewSet
+from Jobs.views import JobViewSet
+from Search.views import SearchViewSet
+from Media.views import blob_srcset, serve_blob
 from Course import views
 
 
@@ -23,6 +26,7 @@ router.register(r'syllabi', SyllabusViewSet, basename='syllabus')
 router.register(r'lessons', LessonViewSet, basename='lesson')
 router.register(r'pages', PageViewSet, basename='pages')
 router.register(r'file-upload', FileUploadViewSet, basename='fileupload')
+router.register(r'upload-sessions', UploadSessionViewSet, basename='upload-sessions')
 router.register(r'classes', ClassViewSet, basename='class')
 router.register(r'posts', PostViewSet, basename='posts')
 router.register(r'comments', CommentViewSet, basename='comments')
@@ -58,6 +62,8 @@ router.register(r'studentMocktestAttempt', StudentMocktestAttemptViewSet, basena
 router.register(r'mastery', StudentMasteryView, basename='get_student_mastery')
 router.register(r'mocktest-set-questions', MocktestSetQuestionViewSet, basename='mocktest-set-questions')
 router.register(r'mocktest-questions', MocktestQuestionViewSet, basename='mocktest-questions')
+router.register(r'jobs', JobViewSet, basename='jobs')
+router.register(r'search', SearchViewSet, basename='search')
 
 # router.register(r'daily-challenges', DailyChallengeViewSet, basename='daily-challenges')
 # router.register(r'daily-challenge-questions', DailyChallengeQuestionViewSet, basename='daily-challenge-questions')
@@ -94,6 +100,8 @@ urlpatterns = [
     path('exams/<int:pk>/current-attempt-number/', ExamViewSet.as_view({'get': 'get_current_attempt_number'}), name='exam-current-attempt-number'),
     path('api/exams/student-info/', ExamViewSet.as_view({'get': 'get_student_exam_info'}), name='exam-student-info'),
     path('upload_file/', UploadFileView.as_view(), name='upload_file'),
+    path('blobs/<str:key>', serve_blob, name='media-blob'),
+    path('blobs/<str:key>/srcset', blob_srcset, name='media-blob-srcset'),
 ]
 
 
@@ -24,6 +24,9 @@ apps = [
     'User',
     'Preassessment',
     'Mocktest',
+    'Jobs',
+    'Search',
+    'Media',
 ]
 
 for app in apps: